@@ -1 +1,5 @@
 # app package initialization
+import time
+
+# When the app package started importing, for cold-start timing
+IMPORT_STARTED = time.perf_counter()
@@ -1,6 +1,7 @@
-from fastapi import Depends, Request
+from fastapi import Request
 
 from app.services.redis_service import RedisService
+from app.services.subscriptions import SubscriptionHub
 from app.services.weather_service import WeatherService
 
 
@@ -13,12 +14,20 @@ async def get_redis_service(request: Request) -> RedisService:
     return request.app.state.redis
 
 
-async def get_weather_service(
-    redis_service: RedisService = Depends(get_redis_service),
-) -> WeatherService:
+async def get_weather_service(request: Request) -> WeatherService:
     """
     Dependency to get Weather service.
 
-    Creates a new Weather service using the Redis service
+    Uses the singleton service created at startup, which shares the
+    pooled upstream HTTP client across requests
     """
-    return WeatherService(redis_service=redis_service)
+    return request.app.state.weather
+
+
+async def get_subscription_hub(request: Request) -> SubscriptionHub:
+    """
+    Dependency to get the subscription hub.
+
+    Uses the per-worker hub created at startup
+    """
+    return request.app.state.hub
@@ -1,35 +1,162 @@
-from typing import Optional
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple, Type
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    Response,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 
-from app.api.dependencies import get_weather_service
-from app.models.weather import ErrorResponse, ForecastResponse, WeatherResponse
+from app.api.dependencies import get_subscription_hub, get_weather_service
+from app.core.config import settings
+from app.core.metrics import STAGE_SECONDS
+from app.models.weather import (
+    AutocompleteResponse,
+    BatchRequest,
+    CityQuery,
+    CitySuggestion,
+    DailyForecastResponse,
+    ErrorResponse,
+    ForecastBatchItem,
+    ForecastBatchResponse,
+    ForecastResponse,
+    HistoryResponse,
+    WeatherBatchItem,
+    WeatherBatchResponse,
+    WeatherResponse,
+)
+from app.services.cache_service import CacheEntry
+from app.services.codec import dumps_json, loads_json
+from app.services.compression import configured_encodings, negotiate
+from app.services.forecast import parse_fields
+from app.services.subscriptions import Subscriber, SubscriptionHub
 from app.services.weather_service import WeatherService
 
 router = APIRouter()
 
 
+def cache_headers(entry: CacheEntry, encoding: Optional[str]) -> Dict[str, str]:
+    """
+    ETag and a Cache-Control lifetime matching the entry's remaining TTLs.
+
+    Each content encoding is a different representation, so compressed
+    bodies get their own strong ETag.
+    """
+    now = time.time()
+    max_age = max(int(entry.fresh_until - now), 0)
+    stale = max(int(entry.expires_at - max(entry.fresh_until, now)), 0)
+    etag = entry.etag if encoding is None else f'{entry.etag[:-1]}-{encoding}"'
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}, stale-while-revalidate={stale}",
+    }
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Whether If-None-Match names ``etag`` (weak comparison, as for GET)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or etag in (tag.removeprefix("W/") for tag in tags)
+
+
+def cached_response(
+    request: Request, response: Response, result: dict
+) -> Optional[Response]:
+    """
+    Fast path for cache hits.
+
+    Payloads are validated against the response model before they are
+    cached, so a hit can be sent as its stored JSON bytes without another
+    validation and encoding pass, compressed once per entry when the client
+    accepts it. Hits carry the entry's ETag, and a matching If-None-Match
+    gets an empty 304.
+    """
+    entry = getattr(result, "entry", None)
+    if entry is None:
+        return None
+
+    encoding = None
+    if settings.RESPONSE_FAST_PATH:
+        encoding = negotiate(request.headers.get("accept-encoding"), len(entry.body))
+    headers: Dict[str, str] = {}
+    if configured_encodings():
+        headers["Vary"] = "Accept-Encoding"
+    if settings.HTTP_CACHE_ENABLED:
+        headers.update(cache_headers(entry, encoding))
+        if etag_matches(request, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+    if not settings.RESPONSE_FAST_PATH:
+        response.headers.update(headers)
+        return None
+    if encoding is None:
+        body = entry.body
+    else:
+        body = entry.encoded(encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def mark_stale(response: Response, result: dict) -> None:
+    """Flag responses served from stale cache after an upstream refresh failed"""
+    if result.get("stale"):
+        response.headers["X-Cache-Status"] = "stale"
+        response.headers["Warning"] = '110 - "Response is Stale"'
+        if settings.HTTP_CACHE_ENABLED:
+            # Shared caches must not keep serving data we know is stale
+            response.headers["Cache-Control"] = "no-cache"
+
+
+def check_location(
+    city: Optional[str], lat: Optional[float], lon: Optional[float]
+) -> None:
+    """Require a city or a complete pair of coordinates"""
+    if (lat is None) != (lon is None):
+        raise HTTPException(
+            status_code=400, detail="lat and lon must be given together"
+        )
+    if city is None and lat is None:
+        raise HTTPException(
+            status_code=400, detail="Either city or lat and lon are required"
+        )
+
+
 @router.get(
     "/weather",
     response_model=WeatherResponse,
     responses={404: {"model": ErrorResponse}, 400: {"model": ErrorResponse}},
     summary="Get current weather",
-    description="Retrieve current weather data for a specified city",
+    description="Retrieve current weather data for a city or coordinates",
 )
 async def get_weather(
-    city: str = Query(..., description="City name"),
+    request: Request,
+    response: Response,
+    city: Optional[str] = Query(None, description="City name"),
     country_code: Optional[str] = Query(
         None, description="Country code (ISO 3166-1 alpha-2)"
     ),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitude"),
+    lon: Optional[float] = Query(None, ge=-180, le=180, description="Longitude"),
     weather_service: WeatherService = Depends(get_weather_service),
 ):
     """
-    Get current weather for a city.
+    Get current weather for a city or a location.
 
     - **city**: Name of the city
     - **country_code**: Optional ISO 3166-1 alpha-2 country code
+    - **lat**, **lon**: Coordinates, used instead of the city when given
     """
-    result = await weather_service.get_current_weather(city, country_code)
+    check_location(city, lat, lon)
+    result = await weather_service.get_current_weather(city, country_code, lat, lon)
 
     if not result.get("success", True):
         status_code = result.get("status_code", 400)
@@ -38,31 +165,145 @@ async def get_weather(
             detail=result.get("error", "Failed to retrieve weather data"),
         )
 
+    fast_response = cached_response(request, response, result)
+    if fast_response is not None:
+        return fast_response
+
+    mark_stale(response, result)
     return result
 
 
 @router.get(
     "/forecast",
     response_model=ForecastResponse,
+    response_model_exclude_none=True,
     responses={404: {"model": ErrorResponse}, 400: {"model": ErrorResponse}},
     summary="Get 5-day forecast",
-    description="Retrieve 5-day forecast data for a specified city",
+    description="Retrieve 5-day forecast data for a city or coordinates",
 )
 async def get_forecast(
-    city: str = Query(..., description="City name"),
+    request: Request,
+    response: Response,
+    city: Optional[str] = Query(None, description="City name"),
     country_code: Optional[str] = Query(
         None, description="Country code (ISO 3166-1 alpha-2)"
     ),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitude"),
+    lon: Optional[float] = Query(None, ge=-180, le=180, description="Longitude"),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated fields to include, e.g. temperature"
+    ),
     weather_service: WeatherService = Depends(get_weather_service),
 ):
     """
-    Get 5-day weather forecast for a city.
+    Get 5-day weather forecast for a city or a location.
 
     - **city**: Name of the city
     - **country_code**: Optional ISO 3166-1 alpha-2 country code
+    - **lat**, **lon**: Coordinates, used instead of the city when given
+    - **fields**: Optional subset of forecast item fields
     """
-    result = await weather_service.get_forecast(city, country_code)
+    check_location(city, lat, lon)
+    result = await weather_service.get_forecast(
+        city, country_code, lat, lon, fields=check_fields(fields)
+    )
+    return forecast_response(request, response, result)
+
+
+@router.get(
+    "/forecast/daily",
+    response_model=DailyForecastResponse,
+    response_model_exclude_none=True,
+    responses={404: {"model": ErrorResponse}, 400: {"model": ErrorResponse}},
+    summary="Get daily forecast summary",
+    description="Per-day min, max and mean of the 5-day forecast in local time",
+)
+async def get_daily_forecast(
+    request: Request,
+    response: Response,
+    city: Optional[str] = Query(None, description="City name"),
+    country_code: Optional[str] = Query(
+        None, description="Country code (ISO 3166-1 alpha-2)"
+    ),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitude"),
+    lon: Optional[float] = Query(None, ge=-180, le=180, description="Longitude"),
+    fields: Optional[str] = Query(
+        None, description="Comma-separated fields to summarize, e.g. temperature"
+    ),
+    weather_service: WeatherService = Depends(get_weather_service),
+):
+    """
+    Get the forecast summarized per day, in the city's local timezone.
+
+    - **city**: Name of the city
+    - **country_code**: Optional ISO 3166-1 alpha-2 country code
+    - **lat**, **lon**: Coordinates, used instead of the city when given
+    - **fields**: Optional subset of fields to summarize
+    """
+    check_location(city, lat, lon)
+    result = await weather_service.get_daily_forecast(
+        city, country_code, lat, lon, fields=check_fields(fields)
+    )
+    return forecast_response(request, response, result)
+
 
+@router.get(
+    "/history",
+    response_model=HistoryResponse,
+    responses={400: {"model": ErrorResponse}, 503: {"model": ErrorResponse}},
+    summary="Get observed weather history",
+    description="Hourly or daily min, max and mean of recorded observations",
+)
+async def get_history(
+    city: Optional[str] = Query(None, description="City name"),
+    country_code: Optional[str] = Query(
+        None, description="Country code (ISO 3166-1 alpha-2)"
+    ),
+    lat: Optional[float] = Query(None, ge=-90, le=90, description="Latitude"),
+    lon: Optional[float] = Query(None, ge=-180, le=180, description="Longitude"),
+    resolution: str = Query(
+        "hour", pattern="^(hour|day)$", description="Bucket size: hour or day"
+    ),
+    start: Optional[int] = Query(None, ge=0, description="From (Unix, UTC)"),
+    end: Optional[int] = Query(None, ge=0, description="Until (Unix, UTC)"),
+    weather_service: WeatherService = Depends(get_weather_service),
+):
+    """
+    Get the weather observed for a city or a location over time.
+
+    - **city**: Name of the city
+    - **country_code**: Optional ISO 3166-1 alpha-2 country code
+    - **lat**, **lon**: Coordinates, used instead of the city when given
+    - **resolution**: `hour` (default, last day) or `day` (last 30 days)
+    - **start**, **end**: Optional range of bucket start times
+
+    Only observations fetched by this service are recorded; the upstream
+    is never queried for history.
+    """
+    check_location(city, lat, lon)
+    if start is not None and end is not None and start > end:
+        raise HTTPException(status_code=400, detail="start must not be after end")
+    result = await weather_service.get_history(
+        city, country_code, lat, lon, resolution, start, end
+    )
+    if not result.get("success", True):
+        raise HTTPException(
+            status_code=result.get("status_code", 400),
+            detail=result.get("error", "Failed to retrieve history"),
+        )
+    return result
+
+
+def check_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Parse a forecast field selection, rejecting unknown fields"""
+    try:
+        return parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def forecast_response(request: Request, response: Response, result: dict) -> Any:
+    """Raise for errors, else serve the forecast (from bytes when cached)"""
     if not result.get("success", True):
         status_code = result.get("status_code", 400)
         raise HTTPException(
@@ -70,4 +311,440 @@ async def get_forecast(
             detail=result.get("error", "Failed to retrieve forecast data"),
         )
 
+    fast_response = cached_response(request, response, result)
+    if fast_response is not None:
+        return fast_response
+
+    mark_stale(response, result)
     return result
+
+
+def check_batch_size(batch: BatchRequest) -> None:
+    """Reject batches larger than BATCH_MAX_ITEMS"""
+    if len(batch.cities) > settings.BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch size exceeds the maximum of {settings.BATCH_MAX_ITEMS}",
+        )
+
+
+def batch_item(
+    index: int, query: CityQuery, result: Dict[str, Any], error: str
+) -> Dict[str, Any]:
+    """Pair a batch query with its result or error"""
+    if result.get("success", True):
+        return {
+            "index": index,
+            "query": query,
+            "success": True,
+            "stale": result.get("stale", False),
+            "data": result,
+        }
+    return {
+        "index": index,
+        "query": query,
+        "success": False,
+        "error": result.get("error", error),
+        "status_code": result.get("status_code", 400),
+    }
+
+
+def batch_items(
+    cities: List[CityQuery], results: List[Dict[str, Any]], error: str
+) -> List[Dict[str, Any]]:
+    """Pair each batch query with its result or error, in request order"""
+    return [
+        batch_item(index, query, result, error)
+        for index, (query, result) in enumerate(zip(cities, results))
+    ]
+
+
+async def stream_items(
+    cities: List[CityQuery],
+    results: AsyncIterator[Tuple[int, Dict[str, Any]]],
+    item_model: Type[BaseModel],
+    error: str,
+    stream_format: str,
+) -> AsyncIterator[bytes]:
+    """Encode batch items as NDJSON lines or Server-Sent Events as they resolve"""
+    async for index, result in results:
+        item = item_model.model_validate(
+            batch_item(index, cities[index], result, error)
+        )
+        with STAGE_SECONDS.labels("serialize").time():
+            payload = item.model_dump_json()
+        if stream_format == "sse":
+            yield f"event: result\ndata: {payload}\n\n".encode()
+        else:
+            yield f"{payload}\n".encode()
+
+    if stream_format == "sse":
+        yield b"event: end\ndata: {}\n\n"
+
+
+def streaming_response(body: AsyncIterator[bytes], stream_format: str):
+    """Wrap a stream with the media type of the requested format"""
+    # Identity encoding keeps the compression middleware from buffering items
+    if stream_format == "sse":
+        return StreamingResponse(
+            body,
+            media_type="text/event-stream",
+            headers={
+                "Cache-Control": "no-cache",
+                "X-Accel-Buffering": "no",
+                "Content-Encoding": "identity",
+            },
+        )
+    return StreamingResponse(
+        body,
+        media_type="application/x-ndjson",
+        headers={"Content-Encoding": "identity"},
+    )
+
+
+@router.post(
+    "/weather/batch",
+    response_model=WeatherBatchResponse,
+    responses={400: {"model": ErrorResponse}},
+    summary="Get current weather for many cities",
+    description="Retrieve current weather for a list of cities in one request",
+)
+async def get_weather_batch(
+    batch: BatchRequest,
+    weather_service: WeatherService = Depends(get_weather_service),
+):
+    """
+    Get current weather for many cities.
+
+    - **cities**: List of `{city, country_code}` lookups
+
+    Each result carries its own success flag and error, in request order.
+    """
+    check_batch_size(batch)
+    results = await weather_service.get_current_weather_batch(
+        [(query.city, query.country_code) for query in batch.cities]
+    )
+    return {
+        "results": batch_items(batch.cities, results, "Failed to retrieve weather data")
+    }
+
+
+@router.post(
+    "/forecast/batch",
+    response_model=ForecastBatchResponse,
+    responses={400: {"model": ErrorResponse}},
+    summary="Get 5-day forecasts for many cities",
+    description="Retrieve 5-day forecasts for a list of cities in one request",
+)
+async def get_forecast_batch(
+    batch: BatchRequest,
+    weather_service: WeatherService = Depends(get_weather_service),
+):
+    """
+    Get 5-day forecasts for many cities.
+
+    - **cities**: List of `{city, country_code}` lookups
+
+    Each result carries its own success flag and error, in request order.
+    """
+    check_batch_size(batch)
+    results = await weather_service.get_forecast_batch(
+        [(query.city, query.country_code) for query in batch.cities]
+    )
+    return {
+        "results": batch_items(
+            batch.cities, results, "Failed to retrieve forecast data"
+        )
+    }
+
+
+@router.post(
+    "/weather/batch/stream",
+    responses={400: {"model": ErrorResponse}},
+    summary="Stream current weather for many cities",
+    description=(
+        "Stream one batch item per city as NDJSON or Server-Sent Events, "
+        "cached cities first"
+    ),
+)
+async def stream_weather_batch(
+    batch: BatchRequest,
+    stream_format: str = Query(
+        "ndjson", alias="format", pattern="^(ndjson|sse)$", description="Format"
+    ),
+    weather_service: WeatherService = Depends(get_weather_service),
+):
+    """
+    Stream current weather for many cities.
+
+    - **cities**: List of `{city, country_code}` lookups
+    - **format**: `ndjson` (default) or `sse`
+
+    Items arrive as they resolve; use `index` to match them to the request.
+    """
+    check_batch_size(batch)
+    results = weather_service.stream_current_weather_batch(
+        [(query.city, query.country_code) for query in batch.cities]
+    )
+    body = stream_items(
+        batch.cities,
+        results,
+        WeatherBatchItem,
+        "Failed to retrieve weather data",
+        stream_format,
+    )
+    return streaming_response(body, stream_format)
+
+
+@router.post(
+    "/forecast/batch/stream",
+    responses={400: {"model": ErrorResponse}},
+    summary="Stream 5-day forecasts for many cities",
+    description=(
+        "Stream one batch item per city as NDJSON or Server-Sent Events, "
+        "cached cities first"
+    ),
+)
+async def stream_forecast_batch(
+    batch: BatchRequest,
+    stream_format: str = Query(
+        "ndjson", alias="format", pattern="^(ndjson|sse)$", description="Format"
+    ),
+    weather_service: WeatherService = Depends(get_weather_service),
+):
+    """
+    Stream 5-day forecasts for many cities.
+
+    - **cities**: List of `{city, country_code}` lookups
+    - **format**: `ndjson` (default) or `sse`
+
+    Items arrive as they resolve; use `index` to match them to the request.
+    """
+    check_batch_size(batch)
+    results = weather_service.stream_forecast_batch(
+        [(query.city, query.country_code) for query in batch.cities]
+    )
+    body = stream_items(
+        batch.cities,
+        results,
+        ForecastBatchItem,
+        "Failed to retrieve forecast data",
+        stream_format,
+    )
+    return streaming_response(body, stream_format)
+
+
+async def subscribe_city(
+    hub: SubscriptionHub,
+    subscriber: Subscriber,
+    weather_service: WeatherService,
+    city: str,
+) -> Tuple[bytes, bool]:
+    """
+    Subscribe to a city's current weather and return its snapshot.
+
+    The key is subscribed before the snapshot is read, so a refresh landing
+    in between is delivered rather than missed. Returns the message and
+    whether it is an update; errors unsubscribe the city again.
+    """
+    key = weather_service.cache_key("weather", city)
+    hub.subscribe(subscriber, [key])
+    result = await weather_service.get_current_weather(city)
+    if not result.get("success", True):
+        hub.unsubscribe(subscriber, [key])
+        error = {
+            "city": city,
+            "error": result.get("error", "Failed to retrieve weather data"),
+            "status_code": result.get("status_code", 400),
+        }
+        return dumps_json(error), False
+
+    entry = getattr(result, "entry", None)
+    body = entry.body if entry is not None else dumps_json(result)
+    return hub.message(key, body), True
+
+
+async def sse_updates(
+    hub: SubscriptionHub,
+    subscriber: Subscriber,
+    weather_service: WeatherService,
+    cities: List[str],
+) -> AsyncIterator[bytes]:
+    """Snapshots, then updates as they are published, as Server-Sent Events"""
+    try:
+        for city in cities:
+            message, ok = await subscribe_city(hub, subscriber, weather_service, city)
+            event = b"update" if ok else b"error"
+            yield b"event: " + event + b"\ndata: " + message + b"\n\n"
+
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    subscriber.queue.get(), settings.SUBSCRIPTION_KEEPALIVE
+                )
+            except asyncio.TimeoutError:
+                # Keeps proxies from closing an idle stream
+                yield b": keepalive\n\n"
+                continue
+            if message is None:
+                yield b"event: end\ndata: {}\n\n"
+                return
+            yield b"event: update\ndata: " + message + b"\n\n"
+    finally:
+        hub.disconnect(subscriber)
+
+
+def check_subscription_size(count: int) -> None:
+    """Reject subscriptions to more than SUBSCRIPTION_MAX_CITIES cities"""
+    if count > settings.SUBSCRIPTION_MAX_CITIES:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                "Subscriptions exceed the maximum of "
+                f"{settings.SUBSCRIPTION_MAX_CITIES} cities"
+            ),
+        )
+
+
+@router.get(
+    "/weather/subscribe",
+    responses={400: {"model": ErrorResponse}, 503: {"model": ErrorResponse}},
+    summary="Subscribe to current weather",
+    description="Server-Sent Events with each city's weather whenever it changes",
+)
+async def subscribe_weather(
+    city: List[str] = Query(
+        ..., min_length=1, description="City names, optionally 'City,CC'"
+    ),
+    hub: SubscriptionHub = Depends(get_subscription_hub),
+    weather_service: WeatherService = Depends(get_weather_service),
+):
+    """
+    Stream current weather updates instead of polling.
+
+    - **city**: Repeat for each city, e.g. `?city=London,GB&city=Paris`
+
+    Each city's current weather arrives first as an `update` event, then
+    again whenever it is refreshed. Unknown cities get an `error` event.
+    """
+    check_subscription_size(len(city))
+    subscriber = hub.connect()
+    if subscriber is None:
+        raise HTTPException(status_code=503, detail="Too many subscriptions")
+    return streaming_response(
+        sse_updates(hub, subscriber, weather_service, city), "sse"
+    )
+
+
+@router.websocket("/weather/ws")
+async def weather_socket(websocket: WebSocket):
+    """
+    Current weather updates over a WebSocket.
+
+    Send `{"subscribe": [cities]}` or `{"unsubscribe": [cities]}`; the
+    server answers with `{"key", "data"}` updates, starting with a snapshot
+    of each newly subscribed city, and `{"error"}` messages.
+    """
+    await websocket.accept()
+    hub: SubscriptionHub = websocket.app.state.hub
+    weather_service: WeatherService = websocket.app.state.weather
+    subscriber = hub.connect()
+    if subscriber is None:
+        await websocket.close(code=1013, reason="Too many subscriptions")
+        return
+
+    tasks = [
+        asyncio.create_task(
+            receive_subscriptions(websocket, hub, subscriber, weather_service)
+        ),
+        asyncio.create_task(send_updates(websocket, subscriber)),
+    ]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        hub.disconnect(subscriber)
+    if tasks[1] in done:
+        # Dropped for falling behind, or the server is shutting down
+        await websocket.close(code=1013)
+
+
+async def receive_subscriptions(
+    websocket: WebSocket,
+    hub: SubscriptionHub,
+    subscriber: Subscriber,
+    weather_service: WeatherService,
+) -> None:
+    """Apply subscribe and unsubscribe requests until the client leaves"""
+    try:
+        while True:
+            try:
+                request = loads_json((await websocket.receive_text()).encode())
+                subscribe = request.get("subscribe") or []
+                unsubscribe = request.get("unsubscribe") or []
+                if not isinstance(subscribe, list) or not isinstance(unsubscribe, list):
+                    raise ValueError
+                if not all(
+                    isinstance(city, str) and city
+                    for city in [*subscribe, *unsubscribe]
+                ):
+                    raise ValueError
+            except (ValueError, AttributeError):
+                error = {
+                    "error": "Expected subscribe or unsubscribe lists of cities",
+                    "status_code": 400,
+                }
+                await websocket.send_text(dumps_json(error).decode())
+                continue
+
+            hub.unsubscribe(
+                subscriber,
+                [weather_service.cache_key("weather", city) for city in unsubscribe],
+            )
+            if len(subscriber.keys) + len(subscribe) > settings.SUBSCRIPTION_MAX_CITIES:
+                error = {
+                    "error": (
+                        "Subscriptions exceed the maximum of "
+                        f"{settings.SUBSCRIPTION_MAX_CITIES} cities"
+                    ),
+                    "status_code": 400,
+                }
+                await websocket.send_text(dumps_json(error).decode())
+                continue
+            for city in subscribe:
+                message, _ = await subscribe_city(
+                    hub, subscriber, weather_service, city
+                )
+                await websocket.send_text(message.decode())
+    except WebSocketDisconnect:
+        return
+
+
+async def send_updates(websocket: WebSocket, subscriber: Subscriber) -> None:
+    """Forward queued updates until the subscriber is dropped"""
+    while (message := await subscriber.queue.get()) is not None:
+        await websocket.send_text(message.decode())
+
+
+@router.get(
+    "/cities/autocomplete",
+    response_model=AutocompleteResponse,
+    summary="Autocomplete city names",
+    description="Suggest known cities for a name prefix, most populous first",
+)
+async def autocomplete_cities(
+    q: str = Query(..., min_length=1, description="City name prefix"),
+    limit: int = Query(10, ge=1, le=50, description="Maximum suggestions"),
+    weather_service: WeatherService = Depends(get_weather_service),
+):
+    """
+    Suggest cities for a partially typed name.
+
+    Matching ignores case and accents and tolerates small typos.
+    """
+    cities = weather_service.city_index.complete(q, limit)
+    return AutocompleteResponse(
+        query=q, suggestions=[CitySuggestion(**city.to_dict()) for city in cities]
+    )
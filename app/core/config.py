@@ -1,3 +1,4 @@
+from pathlib import Path
 from typing import List, Optional
 
 from pydantic import Field
@@ -18,18 +19,163 @@ class Settings(BaseSettings):
     )
     OPENWEATHER_API_URL: str = "https://api.openweathermap.org/data/2.5"
 
+    # Production server (python -m app.server); each worker has its own pools
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    WEB_WORKERS: int = 1  # 0 starts one worker per CPU
+    SERVER_LOOP: str = "auto"  # auto, asyncio or uvloop (optional package)
+    SERVER_HTTP: str = "auto"  # auto, h11 or httptools (optional package)
+    SERVER_KEEPALIVE_TIMEOUT: int = 5
+    GRACEFUL_SHUTDOWN_TIMEOUT: float = 30.0  # in-flight requests after SIGTERM
+    SHUTDOWN_DRAIN_TIMEOUT: float = 10.0  # then background upstream fetches
+
+    # Upstream HTTP client (shared connection pool)
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 30.0  # seconds an idle connection is kept
+    HTTP_CONNECT_TIMEOUT: float = 3.0
+    HTTP_READ_TIMEOUT: float = 5.0
+    HTTP_WRITE_TIMEOUT: float = 5.0
+    HTTP_POOL_TIMEOUT: float = 2.0  # max wait for a free pooled connection
+    HTTP2_ENABLED: bool = False  # requires the optional 'h2' package
+
+    # Upstream resilience: circuit breaker, retries and hedged requests
+    CIRCUIT_BREAKER_ENABLED: bool = True
+    CIRCUIT_BREAKER_WINDOW: float = 30.0  # seconds of outcomes considered
+    CIRCUIT_BREAKER_MIN_CALLS: int = 10
+    CIRCUIT_BREAKER_FAILURE_RATE: float = 0.5
+    CIRCUIT_BREAKER_OPEN_SECONDS: float = 15.0
+    CIRCUIT_BREAKER_HALF_OPEN_CALLS: int = 3
+    UPSTREAM_RETRIES: int = 2  # extra attempts for timeouts, 429 and 5xx
+    UPSTREAM_RETRY_BACKOFF: float = 0.1  # doubled per attempt, with full jitter
+    UPSTREAM_RETRY_MAX_BACKOFF: float = 1.0
+    UPSTREAM_HEDGE_ENABLED: bool = False
+    UPSTREAM_HEDGE_THRESHOLD: float = 0.5  # hedge after max(this, observed p95)
+    # Concurrent current-weather misses by city id share one group call
+    UPSTREAM_BATCH_ENABLED: bool = True
+    UPSTREAM_BATCH_WINDOW: float = 0.005  # seconds a miss waits for company
+    UPSTREAM_BATCH_MAX_SIZE: int = 20  # ids per group call (upstream max 20)
+
     # Redis Configuration
     REDIS_HOST: str = "localhost"
     REDIS_PORT: int = 6379
     REDIS_PASSWORD: Optional[str] = None  # <-- Make it optional
     REDIS_DB: int = 0
-    REDIS_CACHE_TTL: int = 600  # 10 minutes cache time
+    REDIS_MODE: str = "standalone"  # standalone, sentinel or cluster
+    REDIS_SENTINELS: List[str] = []  # "host:port" of each sentinel
+    REDIS_SENTINEL_MASTER: str = "mymaster"
+    REDIS_MAX_CONNECTIONS: int = 50  # per worker (per node in cluster mode)
+    REDIS_POOL_TIMEOUT: float = 0.1  # max wait for a free pooled connection
+    REDIS_SOCKET_TIMEOUT: float = 0.5
+    REDIS_CONNECT_TIMEOUT: float = 0.5
+    REDIS_HEALTH_CHECK_INTERVAL: int = 15  # ping connections idle this long
+    REDIS_RECONNECT_MIN_DELAY: float = 0.5  # doubled per failed attempt
+    REDIS_RECONNECT_MAX_DELAY: float = 30.0
+    REDIS_OPERATION_DEADLINE: float = 0.1  # cache calls give up and miss after
+    REDIS_CACHE_TTL: int = 600  # 10 minutes cache time (soft TTL: data is fresh)
+    CACHE_STALE_TTL: int = 3600  # extra time stale data may be served (hard TTL)
+    CACHE_STALE_WHILE_REVALIDATE: bool = True  # serve stale, refresh in background
+    CACHE_XFETCH_BETA: float = 1.0  # early refresh eagerness; 0 disables
+    CACHE_CODEC: str = "orjson"  # json, orjson or msgpack
+    CACHE_COMPRESSION_THRESHOLD: int = 4096  # zlib entries at least this big; 0 off
+    RESPONSE_FAST_PATH: bool = True  # serve cache hits as stored JSON bytes
+    NEGATIVE_CACHE_TTL: int = 300  # cache upstream 404s this long; 0 disables
+    # Shared Bloom filter of queries the upstream reported as not found
+    NEGATIVE_FILTER_ENABLED: bool = True
+    NEGATIVE_FILTER_CAPACITY: int = 100000
+    NEGATIVE_FILTER_ERROR_RATE: float = 0.001
+    NEGATIVE_FILTER_SYNC_INTERVAL: float = 30.0
+
+    # Observation history with hourly and daily rollups (retention in seconds)
+    HISTORY_ENABLED: bool = True
+    HISTORY_RAW_RETENTION: int = 7 * 86400
+    HISTORY_HOURLY_RETENTION: int = 90 * 86400
+    HISTORY_DAILY_RETENTION: int = 730 * 86400
+    HISTORY_MAX_POINTS: int = 1000  # per /api/history response
+    HISTORY_MAX_PENDING: int = 1000  # background writes before dropping
+    HTTP_CACHE_ENABLED: bool = True  # ETag/Cache-Control headers, 304 responses
+    COMPRESSION_ENABLED: bool = True
+    # Content encodings in server preference; br and zstd need optional packages
+    COMPRESSION_ENCODINGS: List[str] = ["zstd", "br", "gzip"]
+    COMPRESSION_MIN_SIZE: int = 1024  # smaller bodies are sent uncompressed
+
+    # Upstream rate limiting, shared across workers and replicas through Redis
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_PER_MINUTE: int = 60
+    RATE_LIMIT_PER_DAY: int = 30000
+    RATE_LIMIT_MAX_WAIT: float = 2.0  # seconds a call may queue for budget
+
+    # Cache pre-warming (one leader replica refreshes hot keys before they expire)
+    PREWARM_ENABLED: bool = False
+    PREWARM_CITIES: List[str] = []  # always-hot queries, e.g. ["London,GB"]
+    PREWARM_KINDS: List[str] = ["weather"]  # cache kinds for PREWARM_CITIES
+    PREWARM_TOP_N: int = 2000  # most-requested keys added to the hot set
+    PREWARM_HIT_WINDOW: int = 3600  # seconds of request history used for top-N
+    PREWARM_FLUSH_INTERVAL: float = 30.0  # how often hit counts are shared
+    PREWARM_CONCURRENCY: int = 5
+    PREWARM_LEADER_TTL: float = 30.0
+
+    # City index (gazetteer) used to canonicalize queries and for autocomplete
+    CITY_INDEX_PATH: str = str(
+        Path(__file__).resolve().parent.parent / "data/cities.tsv"
+    )
+
+    # Coordinate lookups: points near a known city share its entry, others
+    # share one entry per geohash cell (precision 5 is about 5 x 5 km)
+    GEO_PRECISION: int = 5
+    GEO_SNAP_RADIUS_KM: float = 10.0
+
+    # Batch endpoints
+    BATCH_MAX_ITEMS: int = 500
+    BATCH_UPSTREAM_CONCURRENCY: int = 10  # concurrent upstream fetches per batch
+    STREAM_BUFFER_SIZE: int = 16  # results buffered ahead of a slow stream consumer
+
+    # In-process (L1) cache in front of Redis
+    MEMORY_CACHE_ENABLED: bool = True
+    MEMORY_CACHE_MAX_ENTRIES: int = 10000
+    MEMORY_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    MEMORY_CACHE_TTL: int = 60  # capped at the remaining Redis TTL
+    CACHE_INVALIDATION_CHANNEL: Optional[str] = "weatherpy:invalidate"
+    ADMIN_TOKEN: Optional[str] = None  # bearer token for DELETE /admin/cache
+
+    # Push updates to subscribers instead of having clients poll
+    SUBSCRIPTIONS_ENABLED: bool = True
+    SUBSCRIPTION_CHANNEL: str = "weatherpy:updates"
+    SUBSCRIPTION_MAX_CONNECTIONS: int = 20000  # per worker
+    SUBSCRIPTION_MAX_CITIES: int = 20  # per connection
+    SUBSCRIPTION_BUFFER: int = 8  # queued updates before a slow client is dropped
+    SUBSCRIPTION_KEEPALIVE: float = 15.0  # SSE comment interval on idle streams
+
+    # On-disk tier: serves when Redis is down and warms L1 on restart
+    DISK_CACHE_ENABLED: bool = False
+    DISK_CACHE_DIR: str = "/var/cache/weatherpy"  # one log file per worker
+    DISK_CACHE_MAX_BYTES: int = 256 * 1024 * 1024  # per worker; compacts past this
+    DISK_CACHE_WARM_ENTRIES: int = 1000
+
+    # Request coalescing across workers/replicas (in-process coalescing is always on)
+    DISTRIBUTED_LOCK_ENABLED: bool = False
+    DISTRIBUTED_LOCK_TTL: float = 10.0  # seconds; upper bound for one upstream fetch
+    DISTRIBUTED_LOCK_WAIT: float = 5.0  # max seconds to wait on another fetcher
+    DISTRIBUTED_LOCK_POLL_INTERVAL: float = 0.05
 
     # CORS
     ALLOWED_ORIGINS: List[str] = ["*"]
 
-    # Logging
+    # Logging (queued; written by a background thread)
     LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # json or text
+    LOG_QUEUE_SIZE: int = 10000  # records waiting to be written before dropping
+    LOG_SAMPLE_RATE: float = 0.01  # share of per-request info messages kept
+
+    # Per-request profiling, retrieved from /debug/profiles
+    PROFILING_ENABLED: bool = False
+    PROFILING_SAMPLE_RATE: float = 0.0  # share of requests profiled
+    PROFILING_SECRET: Optional[str] = None  # signs X-Profile tokens
+    PROFILING_KEEP: int = 100  # recent profiles kept in memory per worker
+    PROFILING_TTL: int = 3600  # seconds profiles are kept in Redis
+
+    # Metrics
+    METRICS_ENABLED: bool = True  # per-route latency middleware; /metrics is always on
 
     # Deployment Mode
     DEBUG: bool = False
@@ -1,26 +1,170 @@
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
+import random
 import sys
+import time
+import uuid
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
 
 from app.core.config import settings
 
+# Id of the request being served, attached to every log record
+REQUEST_ID: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
 
-def setup_logging() -> logging.Logger:
-    """Setup logging configuration"""
+# Per-request messages (cache hits, upstream fetches) go through this child
+# logger and are sampled at LOG_SAMPLE_RATE
+REQUEST_LOGGER = "weatherpy.requests"
 
-    # Log format
-    log_format = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+_handler: Optional["QueueHandler"] = None
 
-    # Get log level from settings
-    log_level = getattr(logging, settings.LOG_LEVEL.upper())
 
-    # Configure logging
-    logging.basicConfig(
-        level=log_level, format=log_format, handlers=[logging.StreamHandler(sys.stdout)]
-    )
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the listener thread without formatting them.
+
+    The message is only built from its arguments when the listener formats
+    it, so callers pay for neither formatting nor a slow stdout. Records
+    are dropped, and counted, when the queue is full.
+    """
+
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Read here, in the caller's context; the listener has none
+        record.request_id = REQUEST_ID.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id is not None:
+            entry["request_id"] = request_id
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+    def formatTime(self, record: logging.LogRecord, datefmt: Optional[str] = None):
+        seconds = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+        return f"{seconds}.{int(record.msecs):03d}Z"
+
+
+class SampleFilter(logging.Filter):
+    """Pass a share of records below WARNING; warnings and errors always pass"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+def setup_logging() -> logging.Logger:
+    """
+    Setup logging configuration.
 
-    # Create and configure logger
+    Records are queued and written to stdout by a listener thread, so a
+    slow log sink never blocks the event loop. Output is JSON lines, or
+    the plain text format with LOG_FORMAT=text.
+    """
+    global _handler
+
+    log_level = getattr(logging, settings.LOG_LEVEL.upper())
     logger = logging.getLogger("weatherpy")
     logger.setLevel(log_level)
+    if _handler is not None:
+        return logger
+
+    stream = logging.StreamHandler(sys.stdout)
+    if settings.LOG_FORMAT == "json":
+        stream.setFormatter(JsonFormatter())
+    else:
+        stream.setFormatter(
+            logging.Formatter("%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+        )
+
+    _handler = QueueHandler(queue.Queue(settings.LOG_QUEUE_SIZE))
+    listener = logging.handlers.QueueListener(_handler.queue, stream)
+    listener.start()
+    atexit.register(listener.stop)
+
+    root = logging.getLogger()
+    root.handlers = [_handler]
+    root.setLevel(log_level)
+    logging.getLogger(REQUEST_LOGGER).addFilter(SampleFilter(settings.LOG_SAMPLE_RATE))
 
-    # Return configured logger
     return logger
+
+
+def logging_stats() -> Dict[str, Any]:
+    """Queue depth and records dropped because the queue was full"""
+    if _handler is None:
+        return {}
+    return {"queued": _handler.queue.qsize(), "dropped": _handler.dropped}
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware giving each request an id for logs and profiles.
+
+    A well-formed X-Request-ID from the client or a proxy is kept, else a
+    new one is generated; either way it is echoed in the response.
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = self._clean(value)
+                break
+        request_id = request_id or uuid.uuid4().hex
+        header = (b"x-request-id", request_id.encode())
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), header]
+            await send(message)
+
+        token = REQUEST_ID.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            REQUEST_ID.reset(token)
+
+    @staticmethod
+    def _clean(value: bytes) -> Optional[str]:
+        """A client-supplied id if it is short and safe to log, else None"""
+        if not 0 < len(value) <= 64:
+            return None
+        text = value.decode("latin-1")
+        if all(c.isalnum() or c in "-_.:" for c in text):
+            return text
+        return None
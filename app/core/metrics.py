@@ -0,0 +1,328 @@
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds, from sub-millisecond cache hits to slow upstreams
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+Sample = Tuple[str, Dict[str, str], float]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(
+        f'{name}="{_escape(str(value))}"' for name, value in labels.items()
+    )
+    return "{" + pairs + "}"
+
+
+class Metric:
+    """
+    Base class for a named metric family with fixed label names.
+
+    Label values must come from small, fixed sets (route templates, status
+    codes, stage names) so the number of series stays bounded.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], Any] = {}
+
+    def labels(self, *values: str) -> Any:
+        """Get the child series for these label values, creating it once"""
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def samples(self) -> List[Sample]:
+        raise NotImplementedError
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def _new_child(self) -> _Value:
+        return _Value()
+
+    def samples(self) -> List[Sample]:
+        return [
+            (f"{self.name}_total", dict(zip(self.labelnames, key)), child.value)
+            for key, child in self._children.items()
+        ]
+
+
+class Gauge(Counter):
+    """Value that can go up and down"""
+
+    kind = "gauge"
+
+    def samples(self) -> List[Sample]:
+        return [
+            (self.name, dict(zip(self.labelnames, key)), child.value)
+            for key, child in self._children.items()
+        ]
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum")
+
+    def __init__(self, upper_bounds: Sequence[float]) -> None:
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the duration of the wrapped block in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class Histogram(Metric):
+    """Distribution of observed values in fixed buckets"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.upper_bounds = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.upper_bounds)
+
+    def samples(self) -> List[Sample]:
+        samples: List[Sample] = []
+        for key, child in self._children.items():
+            labels = dict(zip(self.labelnames, key))
+            cumulative = 0
+            bounds = [str(bound) for bound in self.upper_bounds] + ["+Inf"]
+            for bound, count in zip(bounds, child.counts):
+                cumulative += count
+                samples.append(
+                    (f"{self.name}_bucket", {**labels, "le": bound}, cumulative)
+                )
+            samples.append((f"{self.name}_sum", labels, child.sum))
+            samples.append((f"{self.name}_count", labels, cumulative))
+        return samples
+
+
+Collector = Callable[[], List[Tuple[str, str, str, List[Sample]]]]
+
+
+class Registry:
+    """Holds metric families and renders the Prometheus text format"""
+
+    def __init__(self) -> None:
+        self._metrics: List[Metric] = []
+        self._collectors: List[Collector] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Collector) -> None:
+        """Add a callback returning (name, kind, help, samples) at scrape time"""
+        self._collectors.append(collector)
+
+    def clear_collectors(self) -> None:
+        self._collectors = []
+
+    def render(self) -> str:
+        """All metrics in Prometheus text exposition format (version 0.0.4)"""
+        families = [
+            (metric.name, metric.kind, metric.documentation, metric.samples())
+            for metric in self._metrics
+        ]
+        for collector in self._collectors:
+            families.extend(collector())
+
+        lines = []
+        for name, kind, documentation, samples in families:
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                lines.append(f"{sample_name}{_format_labels(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def stats_collector(prefix: str, stats: Callable[[], Optional[Dict[str, Any]]]):
+    """
+    Export a component's ``stats()`` dict as gauges at scrape time.
+
+    Numeric values become ``weatherpy_<prefix>_<key>``; nested dicts are
+    flattened with underscores and other values are skipped.
+    """
+
+    def collect() -> List[Tuple[str, str, str, List[Sample]]]:
+        families = []
+        for key, value in _flatten(stats() or {}):
+            name = f"weatherpy_{prefix}_{key}"
+            families.append((name, "gauge", f"{prefix} {key}", [(name, {}, value)]))
+        return families
+
+    return collect
+
+
+def _flatten(stats: Dict[str, Any], prefix: str = "") -> List[Tuple[str, float]]:
+    flat: List[Tuple[str, float]] = []
+    for key, value in stats.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.extend(_flatten(value, f"{name}_"))
+        elif isinstance(value, (bool, int, float)):
+            flat.append((name, float(value)))
+    return flat
+
+
+REQUESTS = REGISTRY.register(
+    Counter(
+        "weatherpy_http_requests",
+        "HTTP requests by route template, method and status",
+        ("route", "method", "status"),
+    )
+)
+REQUEST_SECONDS = REGISTRY.register(
+    Histogram(
+        "weatherpy_http_request_duration_seconds",
+        "HTTP request latency by route template",
+        ("route", "method"),
+    )
+)
+IN_FLIGHT = REGISTRY.register(
+    Gauge("weatherpy_http_requests_in_flight", "HTTP requests being served")
+).labels()
+STAGE_SECONDS = REGISTRY.register(
+    Histogram(
+        "weatherpy_stage_duration_seconds",
+        "Latency of request stages (redis_get, upstream, process_forecast, "
+        "serialize)",
+        ("stage",),
+    )
+)
+CACHE_REQUESTS = REGISTRY.register(
+    Counter(
+        "weatherpy_cache_requests",
+        "Cache lookups by tier and result (hit, miss, error)",
+        ("tier", "result"),
+    )
+)
+UPSTREAM_RESPONSES = REGISTRY.register(
+    Counter(
+        "weatherpy_upstream_responses",
+        "OpenWeatherMap responses by endpoint and status code",
+        ("endpoint", "status"),
+    )
+)
+UPSTREAM_BATCH_SIZE = REGISTRY.register(
+    Histogram(
+        "weatherpy_upstream_batch_size",
+        "Distinct city ids per merged current-weather lookup",
+        buckets=(1, 2, 4, 8, 12, 16, 20),
+    )
+).labels()
+UPSTREAM_BATCH_WAIT_SECONDS = REGISTRY.register(
+    Histogram(
+        "weatherpy_upstream_batch_wait_seconds",
+        "Latency added by waiting for a merged current-weather lookup",
+    )
+).labels()
+
+KNOWN_METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE", "HEAD", "OPTIONS"}
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency, status and concurrency"""
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec()
+            # Route templates, never raw paths, keep label cardinality bounded
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"] if scope["method"] in KNOWN_METHODS else "OTHER"
+            REQUEST_SECONDS.labels(path, method).observe(time.perf_counter() - started)
+            REQUESTS.labels(path, method, str(status)).inc()
@@ -0,0 +1,186 @@
+import hashlib
+import hmac
+import logging
+import random
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.logging import REQUEST_ID
+
+logger = logging.getLogger("weatherpy")
+
+PROFILE_HEADER = b"x-profile"
+
+
+class Profile:
+    """Timed spans of one request, relative to when it started"""
+
+    __slots__ = (
+        "profile_id",
+        "request_id",
+        "method",
+        "path",
+        "started",
+        "spans",
+        "status",
+        "done",
+    )
+
+    def __init__(self, request_id: str, method: str, path: str):
+        # Generated here: the request id may come from the client
+        self.profile_id = uuid.uuid4().hex
+        self.request_id = request_id
+        self.method = method
+        self.path = path
+        self.started = time.perf_counter()
+        self.spans: List[Tuple[str, float, float]] = []
+        self.status = 0
+        self.done = False
+
+    def add(self, name: str, started: float) -> None:
+        """Record a span that began at ``started`` (perf_counter) and ends now"""
+        if not self.done:
+            now = time.perf_counter()
+            self.spans.append((name, started - self.started, now - started))
+
+    def finish(self, status: int) -> None:
+        self.add("handler", self.started)
+        self.status = status
+        self.done = True
+
+    def to_dict(self) -> Dict[str, Any]:
+        totals: Dict[str, Dict[str, float]] = {}
+        for name, _, duration in self.spans:
+            total = totals.setdefault(name, {"count": 0, "seconds": 0.0})
+            total["count"] += 1
+            total["seconds"] = round(total["seconds"] + duration, 6)
+        return {
+            "profile_id": self.profile_id,
+            "request_id": self.request_id,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "totals": totals,
+            "spans": [
+                {"name": name, "offset": round(offset, 6), "seconds": round(d, 6)}
+                for name, offset, d in self.spans
+            ],
+        }
+
+
+# Profile of the request being served, if it is being profiled
+PROFILE: ContextVar[Optional[Profile]] = ContextVar("profile", default=None)
+
+
+@contextmanager
+def profiled(name: str) -> Iterator[None]:
+    """Time the wrapped block as a span of the current request's profile"""
+    profile = PROFILE.get()
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add(name, started)
+
+
+def profile_token(secret: str, ttl: float = 300.0) -> str:
+    """An X-Profile header value, valid for ``ttl`` seconds"""
+    expires = str(int(time.time() + ttl))
+    signature = hmac.new(secret.encode(), expires.encode(), hashlib.sha256)
+    return f"{expires}.{signature.hexdigest()}"
+
+
+def verify_token(secret: Optional[str], token: Optional[str]) -> bool:
+    """Whether ``token`` was made by profile_token with ``secret`` and is live"""
+    if not secret or not token:
+        return False
+    expires, _, signature = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    expected = hmac.new(secret.encode(), expires.encode(), hashlib.sha256)
+    return hmac.compare_digest(expected.hexdigest(), signature)
+
+
+class ProfileStore:
+    """
+    Recent profiles of this worker, shared through Redis.
+
+    The last PROFILING_KEEP profiles stay in memory; each one is also kept
+    in Redis for PROFILING_TTL seconds so any worker can return it.
+    """
+
+    def __init__(self, redis_service: Any):
+        self.redis_service = redis_service
+        self.recent: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    async def add(self, profile: Profile) -> None:
+        data = profile.to_dict()
+        self.recent[profile.profile_id] = data
+        while len(self.recent) > settings.PROFILING_KEEP:
+            self.recent.popitem(last=False)
+        await self.redis_service.set(
+            f"profile:{profile.profile_id}", data, ttl=settings.PROFILING_TTL
+        )
+
+    async def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        if profile_id in self.recent:
+            return self.recent[profile_id]
+        return await self.redis_service.get(f"profile:{profile_id}")
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling sampled or explicitly requested requests.
+
+    A request is profiled with probability PROFILING_SAMPLE_RATE, or when
+    its X-Profile header carries a token signed with PROFILING_SECRET (see
+    profile_token). Profiled responses name their profile in X-Profile-Id.
+    """
+
+    def __init__(self, app: Any) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or not self._wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = Profile(REQUEST_ID.get() or "", scope["method"], scope["path"])
+        status = 500
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                header = (b"x-profile-id", profile.profile_id.encode())
+                message["headers"] = [*message.get("headers", []), header]
+            await send(message)
+
+        token = PROFILE.set(profile)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            PROFILE.reset(token)
+            profile.finish(status)
+            store = getattr(scope["app"].state, "profiles", None)
+            if store is not None:
+                await store.add(profile)
+
+    @staticmethod
+    def _wanted(scope: Dict[str, Any]) -> bool:
+        if scope["path"].startswith("/debug/"):
+            return False
+        if random.random() < settings.PROFILING_SAMPLE_RATE:
+            return True
+        for name, value in scope["headers"]:
+            if name == PROFILE_HEADER:
+                return verify_token(settings.PROFILING_SECRET, value.decode("latin-1"))
+        return False
@@ -1,12 +1,32 @@
+import asyncio
+import hmac
+import time
 from contextlib import asynccontextmanager
+from typing import Optional
 
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 
+from app import IMPORT_STARTED
 from app.api.routes import router as api_router
 from app.core.config import settings
-from app.core.logging import setup_logging
+from app.core.logging import RequestIdMiddleware, logging_stats, setup_logging
+from app.core.metrics import REGISTRY, MetricsMiddleware, stats_collector
+from app.core.profiling import (
+    PROFILE_HEADER,
+    ProfileStore,
+    ProfilingMiddleware,
+    verify_token,
+)
+from app.services.cache_service import CacheService
+from app.services.city_index import CityIndex
+from app.services.compression import GZipMiddleware
+from app.services.http_client import HTTPClientService
+from app.services.prewarm import PrewarmScheduler
 from app.services.redis_service import RedisService
+from app.services.subscriptions import SubscriptionHub
+from app.services.weather_service import WeatherService
 
 # Setup logging
 logger = setup_logging()
@@ -16,15 +36,87 @@ logger = setup_logging()
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    started = time.perf_counter()
     logger.info("Starting up WeatherPy service")
+    # Pools are created here, in each worker process, never before a fork
     redis_service = RedisService()
-    await redis_service.connect()
+    http_client = HTTPClientService()
+    # Connect while the city index loads in a thread
+    _, _, city_index = await asyncio.gather(
+        redis_service.connect(),
+        http_client.connect(),
+        asyncio.to_thread(CityIndex.load, settings.CITY_INDEX_PATH),
+    )
     app.state.redis = redis_service
+    app.state.http_client = http_client
+    app.state.profiles = ProfileStore(redis_service)
+
+    cache = CacheService(redis_service)
+    await cache.start()
+
+    hub = SubscriptionHub(redis_service)
+    await hub.start()
+    app.state.hub = hub
+
+    app.state.weather = WeatherService(
+        redis_service=redis_service,
+        http_client=http_client,
+        cache=cache,
+        city_index=city_index,
+        hub=hub,
+    )
+
+    await app.state.weather.negative.start()
+
+    prewarm = PrewarmScheduler(app.state.weather, redis_service)
+    await prewarm.start()
+    app.state.prewarm = prewarm
+
+    # Component counters are read at scrape time
+    REGISTRY.add_collector(stats_collector("redis", redis_service.stats))
+    REGISTRY.add_collector(stats_collector("http_pool", http_client.stats))
+    REGISTRY.add_collector(
+        stats_collector("coalescing", app.state.weather.coalescing_stats)
+    )
+    REGISTRY.add_collector(stats_collector("cache", cache.stats))
+    REGISTRY.add_collector(
+        stats_collector("rate_limit", app.state.weather.rate_limiter.stats)
+    )
+    REGISTRY.add_collector(stats_collector("prewarm", prewarm.stats))
+    REGISTRY.add_collector(
+        stats_collector("negative", app.state.weather.negative_stats)
+    )
+    REGISTRY.add_collector(stats_collector("subscriptions", hub.stats))
+    REGISTRY.add_collector(stats_collector("logging", logging_stats))
+    REGISTRY.add_collector(stats_collector("startup", lambda: app.state.startup))
+    REGISTRY.add_collector(
+        stats_collector("upstream", app.state.weather.upstream.stats)
+    )
+    REGISTRY.add_collector(
+        stats_collector("upstream_batch", app.state.weather.batcher.stats)
+    )
+    REGISTRY.add_collector(stats_collector("history", app.state.weather.history.stats))
+
+    ready = time.perf_counter()
+    app.state.startup = {
+        "import_seconds": round(started - IMPORT_STARTED, 4),
+        "lifespan_seconds": round(ready - started, 4),
+    }
+    logger.info(
+        f"Ready in {(ready - IMPORT_STARTED) * 1000:.0f} ms "
+        f"(imports {(started - IMPORT_STARTED) * 1000:.0f} ms)"
+    )
 
     yield
 
     # Shutdown
     logger.info("Shutting down WeatherPy service")
+    REGISTRY.clear_collectors()
+    await hub.stop()
+    await prewarm.stop()
+    await app.state.weather.close(settings.SHUTDOWN_DRAIN_TIMEOUT)
+    await cache.stop()
+    await http_client.close()
     await redis_service.close()
 
 
@@ -45,17 +137,108 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress dynamic responses; cache hits arrive already compressed
+if settings.COMPRESSION_ENABLED and "gzip" in settings.COMPRESSION_ENCODINGS:
+    app.add_middleware(GZipMiddleware, compresslevel=6)
+
+# Record per-route latency, status codes and in-flight requests
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# Profile sampled or explicitly requested requests
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Outermost, so every log line and profile carries the request id
+app.add_middleware(RequestIdMiddleware)
+
 # Include routers
 app.include_router(api_router, prefix="/api")
 
 
 @app.get("/health")
-async def health_check():
+async def health_check(request: Request):
     """Health check endpoint"""
-    return {"status": "healthy", "version": settings.PROJECT_VERSION}
+    return {
+        "status": "healthy",
+        "version": settings.PROJECT_VERSION,
+        "redis": request.app.state.redis.stats(),
+        "http_pool": request.app.state.http_client.stats(),
+        "coalescing": request.app.state.weather.coalescing_stats(),
+        "cache": request.app.state.weather.cache.stats(),
+        "rate_limit": request.app.state.weather.rate_limiter.stats(),
+        "upstream": request.app.state.weather.upstream.stats(),
+        "upstream_batch": request.app.state.weather.batcher.stats(),
+        "history": request.app.state.weather.history.stats(),
+        "prewarm": request.app.state.prewarm.stats(),
+        "negative": request.app.state.weather.negative_stats(),
+        "subscriptions": request.app.state.hub.stats(),
+        "logging": logging_stats(),
+        "startup": request.app.state.startup,
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics endpoint"""
+    return PlainTextResponse(
+        REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+def check_debug_access(request: Request) -> None:
+    """Debug endpoints need profiling on and a token signed with its secret"""
+    if not settings.PROFILING_ENABLED or not settings.PROFILING_SECRET:
+        raise HTTPException(status_code=404, detail="Not Found")
+    token = request.headers.get(PROFILE_HEADER.decode())
+    if not verify_token(settings.PROFILING_SECRET, token):
+        raise HTTPException(status_code=403, detail="Invalid profiling token")
+
+
+def check_admin_access(request: Request) -> None:
+    """Admin endpoints need ADMIN_TOKEN set and sent as a bearer token"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    header = request.headers.get("authorization", "")
+    expected = f"Bearer {settings.ADMIN_TOKEN}"
+    if not hmac.compare_digest(header.encode(), expected.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@app.delete("/admin/cache", include_in_schema=False)
+async def purge_cache(request: Request, city: str, country_code: Optional[str] = None):
+    """Purge a city's cached weather and forecast on every replica"""
+    check_admin_access(request)
+    keys = await request.app.state.weather.purge(city, country_code)
+    return {"purged": keys}
+
+
+@app.get("/debug/profiles", include_in_schema=False)
+async def list_profiles(request: Request):
+    """Recent profiles captured by this worker"""
+    check_debug_access(request)
+    return {
+        "profiles": [
+            {
+                key: profile[key]
+                for key in ("profile_id", "request_id", "method", "path", "status")
+            }
+            for profile in reversed(request.app.state.profiles.recent.values())
+        ]
+    }
+
+
+@app.get("/debug/profiles/{profile_id}", include_in_schema=False)
+async def get_profile(request: Request, profile_id: str):
+    """One request's profile, from any worker"""
+    check_debug_access(request)
+    profile = await request.app.state.profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return profile
 
 
 if __name__ == "__main__":
-    import uvicorn
+    from app.server import main
 
-    uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
+    main()
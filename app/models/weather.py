@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 
 from pydantic import BaseModel, Field
 
@@ -28,19 +28,21 @@ class WeatherResponse(BaseModel):
 
 
 class ForecastItem(BaseModel):
-    """Forecast item model"""
+    """Forecast item model; fields not selected with ``fields`` are omitted"""
 
     date: str = Field(..., description="Forecast date (YYYY-MM-DD)")
     time: str = Field(..., description="Forecast time (HH:MM:SS)")
     timestamp: int = Field(..., description="Data timestamp (Unix, UTC)")
-    temperature: float = Field(..., description="Temperature in Celsius")
-    feels_like: float = Field(..., description="Feels like temperature in Celsius")
-    humidity: int = Field(..., description="Humidity percentage")
-    pressure: int = Field(..., description="Atmospheric pressure in hPa")
-    description: str = Field(..., description="Weather description")
-    icon: str = Field(..., description="Weather icon code")
-    wind_speed: float = Field(..., description="Wind speed in m/s")
-    clouds: int = Field(..., description="Cloudiness percentage")
+    temperature: Optional[float] = Field(None, description="Temperature in Celsius")
+    feels_like: Optional[float] = Field(
+        None, description="Feels like temperature in Celsius"
+    )
+    humidity: Optional[int] = Field(None, description="Humidity percentage")
+    pressure: Optional[int] = Field(None, description="Atmospheric pressure in hPa")
+    description: Optional[str] = Field(None, description="Weather description")
+    icon: Optional[str] = Field(None, description="Weather icon code")
+    wind_speed: Optional[float] = Field(None, description="Wind speed in m/s")
+    clouds: Optional[int] = Field(None, description="Cloudiness percentage")
 
 
 class ForecastResponse(BaseModel):
@@ -53,6 +55,152 @@ class ForecastResponse(BaseModel):
     timezone: int = Field(..., description="Timezone offset from UTC in seconds")
 
 
+class ForecastColumns(BaseModel):
+    """Forecast stored column-wise, one list per field"""
+
+    timestamp: List[int] = Field(..., description="Data timestamps (Unix, UTC)")
+    temperature: List[float] = Field(..., description="Temperatures in Celsius")
+    feels_like: List[float] = Field(..., description="Feels like temperatures")
+    humidity: List[int] = Field(..., description="Humidity percentages")
+    pressure: List[int] = Field(..., description="Atmospheric pressures in hPa")
+    wind_speed: List[float] = Field(..., description="Wind speeds in m/s")
+    clouds: List[int] = Field(..., description="Cloudiness percentages")
+    description: List[int] = Field(..., description="Codes into descriptions")
+    icon: List[int] = Field(..., description="Codes into icons")
+    descriptions: List[str] = Field(..., description="Distinct descriptions")
+    icons: List[str] = Field(..., description="Distinct icon codes")
+
+
+class ColumnarForecast(BaseModel):
+    """Forecast as cached: city details plus columns"""
+
+    success: bool = Field(True, description="Operation success status")
+    city: str = Field(..., description="City name")
+    country: str = Field(..., description="Country code")
+    columns: ForecastColumns = Field(..., description="Forecast columns")
+    timezone: int = Field(..., description="Timezone offset from UTC in seconds")
+
+
+class DailyStats(BaseModel):
+    """Aggregate of one numeric field over a day"""
+
+    min: float = Field(..., description="Lowest value")
+    max: float = Field(..., description="Highest value")
+    mean: float = Field(..., description="Average value")
+
+
+class DailyForecast(BaseModel):
+    """One local day of the forecast; unselected fields are omitted"""
+
+    date: str = Field(..., description="Local date (YYYY-MM-DD)")
+    samples: int = Field(..., description="Number of 3-hour time steps")
+    temperature: Optional[DailyStats] = Field(None, description="Celsius")
+    feels_like: Optional[DailyStats] = Field(None, description="Celsius")
+    humidity: Optional[DailyStats] = Field(None, description="Percent")
+    pressure: Optional[DailyStats] = Field(None, description="hPa")
+    wind_speed: Optional[DailyStats] = Field(None, description="m/s")
+    clouds: Optional[DailyStats] = Field(None, description="Percent")
+    description: Optional[str] = Field(None, description="Most frequent weather")
+    icon: Optional[str] = Field(None, description="Most frequent icon code")
+
+
+class DailyForecastResponse(BaseModel):
+    """Daily forecast response model"""
+
+    success: bool = Field(True, description="Operation success status")
+    city: str = Field(..., description="City name")
+    country: str = Field(..., description="Country code")
+    days: List[DailyForecast] = Field(..., description="Days in local time")
+    timezone: int = Field(..., description="Timezone offset from UTC in seconds")
+
+
+class HistoryPoint(BaseModel):
+    """Observations recorded in one UTC hour or day"""
+
+    start: int = Field(..., description="Bucket start (Unix, UTC)")
+    samples: int = Field(..., description="Number of observations")
+    temperature: DailyStats = Field(..., description="Celsius")
+    humidity: DailyStats = Field(..., description="Percent")
+    pressure: DailyStats = Field(..., description="hPa")
+    wind_speed: DailyStats = Field(..., description="m/s")
+    clouds: DailyStats = Field(..., description="Percent")
+
+
+class HistoryResponse(BaseModel):
+    """Observation history response model"""
+
+    success: bool = Field(True, description="Operation success status")
+    resolution: str = Field(..., description="Bucket size: hour or day")
+    points: List[HistoryPoint] = Field(..., description="Buckets, oldest first")
+
+
+class CityQuery(BaseModel):
+    """City lookup used in batch requests"""
+
+    city: str = Field(..., description="City name")
+    country_code: Optional[str] = Field(
+        None, description="Country code (ISO 3166-1 alpha-2)"
+    )
+
+
+class BatchRequest(BaseModel):
+    """Batch request model"""
+
+    cities: List[CityQuery] = Field(..., min_length=1, description="Cities to look up")
+
+
+class BatchItem(BaseModel):
+    """Per-city outcome of a batch request"""
+
+    index: int = Field(..., description="Position of the query in the request")
+    query: CityQuery = Field(..., description="City lookup this item answers")
+    success: bool = Field(..., description="Operation success status")
+    stale: bool = Field(False, description="Served from stale cache")
+    error: Optional[str] = Field(None, description="Error message")
+    status_code: Optional[int] = Field(None, description="Error status code")
+
+
+class WeatherBatchItem(BatchItem):
+    """Current weather batch item"""
+
+    data: Optional[WeatherResponse] = Field(None, description="Current weather")
+
+
+class WeatherBatchResponse(BaseModel):
+    """Current weather batch response model"""
+
+    results: List[WeatherBatchItem] = Field(..., description="Results in order")
+
+
+class ForecastBatchItem(BatchItem):
+    """Forecast batch item"""
+
+    data: Optional[ForecastResponse] = Field(None, description="Forecast")
+
+
+class ForecastBatchResponse(BaseModel):
+    """Forecast batch response model"""
+
+    results: List[ForecastBatchItem] = Field(..., description="Results in order")
+
+
+class CitySuggestion(BaseModel):
+    """City matching an autocomplete prefix"""
+
+    id: int = Field(..., description="Gazetteer city id")
+    name: str = Field(..., description="City name")
+    country: str = Field(..., description="Country code")
+    lat: float = Field(..., description="Latitude")
+    lon: float = Field(..., description="Longitude")
+
+
+class AutocompleteResponse(BaseModel):
+    """City autocomplete response model"""
+
+    query: str = Field(..., description="Prefix that was searched")
+    suggestions: List[CitySuggestion] = Field(..., description="Matching cities")
+
+
 class ErrorResponse(BaseModel):
     """Error response model"""
 
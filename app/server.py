@@ -0,0 +1,61 @@
+import importlib.util
+import logging
+import os
+from typing import Any, Dict
+
+from app.core.config import settings
+
+logger = logging.getLogger("weatherpy")
+
+# Optional accelerators for each uvicorn setting, with their fallbacks
+ACCELERATORS = {"uvloop": "asyncio", "httptools": "h11"}
+
+
+def _choose(option: str) -> str:
+    """Use an optional package only if it is installed"""
+    fallback = ACCELERATORS.get(option)
+    if fallback and importlib.util.find_spec(option) is None:
+        logger.warning(f"{option} requested but not installed, using {fallback}")
+        return fallback
+    return option
+
+
+def uvicorn_options() -> Dict[str, Any]:
+    """
+    uvicorn settings for serving the app.
+
+    Workers are separate processes that each import the app and run its
+    lifespan, so Redis and HTTP connection pools are never shared across
+    processes. On SIGTERM uvicorn stops accepting connections, waits up to
+    GRACEFUL_SHUTDOWN_TIMEOUT for in-flight requests, then runs the lifespan
+    shutdown, which lets background upstream fetches drain.
+    """
+    if settings.DEBUG:
+        # Auto-reload for local development; incompatible with workers
+        return {
+            "host": settings.SERVER_HOST,
+            "port": settings.SERVER_PORT,
+            "reload": True,
+        }
+
+    return {
+        "host": settings.SERVER_HOST,
+        "port": settings.SERVER_PORT,
+        "workers": settings.WEB_WORKERS or os.cpu_count() or 1,
+        "loop": _choose(settings.SERVER_LOOP),
+        "http": _choose(settings.SERVER_HTTP),
+        "timeout_keep_alive": settings.SERVER_KEEPALIVE_TIMEOUT,
+        "timeout_graceful_shutdown": int(settings.GRACEFUL_SHUTDOWN_TIMEOUT),
+        "log_level": settings.LOG_LEVEL.lower(),
+    }
+
+
+def main() -> None:
+    """Run the API server"""
+    import uvicorn
+
+    uvicorn.run("app.main:app", **uvicorn_options())
+
+
+if __name__ == "__main__":
+    main()
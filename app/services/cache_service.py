@@ -0,0 +1,465 @@
+import asyncio
+import hashlib
+import logging
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS, STAGE_SECONDS
+from app.services.codec import dumps_json
+from app.services.compression import check_encodings, compress, configured_encodings
+from app.services.disk_cache import DiskCache
+from app.services.memory_cache import MemoryCache
+from app.services.redis_service import RedisService, sibling_key
+
+logger = logging.getLogger("weatherpy")
+
+L1_HITS = CACHE_REQUESTS.labels("l1", "hit")
+L1_MISSES = CACHE_REQUESTS.labels("l1", "miss")
+L2_HITS = CACHE_REQUESTS.labels("l2", "hit")
+L2_MISSES = CACHE_REQUESTS.labels("l2", "miss")
+SERIALIZE_SECONDS = STAGE_SECONDS.labels("serialize")
+COMPRESS_SECONDS = STAGE_SECONDS.labels("compress")
+# Derived views memoized per entry (e.g. forecast rows, daily summaries)
+MAX_VIEWS = 8
+
+
+class CachedData(dict):
+    """A cached payload that remembers the entry it was served from"""
+
+    __slots__ = ("entry",)
+
+
+@dataclass
+class CacheEntry:
+    """A cached payload with its soft (fresh) and hard (expiry) deadlines"""
+
+    data: Dict[str, Any]
+    fresh_until: float  # Unix time after which the entry is stale
+    expires_at: float  # Unix time after which the entry must not be served
+    delta: float = 0.0  # seconds the upstream fetch took
+    _body: Optional[bytes] = field(default=None, repr=False, compare=False)
+    _etag: Optional[str] = field(default=None, repr=False, compare=False)
+    _encoded: Dict[str, bytes] = field(default_factory=dict, repr=False, compare=False)
+    _views: Dict[str, "CacheEntry"] = field(
+        default_factory=dict, repr=False, compare=False
+    )
+
+    def __post_init__(self) -> None:
+        if not isinstance(self.data, CachedData):
+            self.data = CachedData(self.data)
+        self.data.entry = self
+
+    @property
+    def body(self) -> bytes:
+        """The payload as JSON response bytes, encoded once per entry"""
+        if self._body is None:
+            with SERIALIZE_SECONDS.time():
+                self._body = dumps_json(self.data)
+        return self._body
+
+    @property
+    def etag(self) -> str:
+        """
+        Strong HTTP entity tag: a hash of ``body``.
+
+        Stored in the envelope, so entries read back from Redis keep the tag
+        they were written with and hits do not rehash the payload.
+        """
+        if self._etag is None:
+            digest = hashlib.blake2b(self.body, digest_size=16).hexdigest()
+            self._etag = f'"{digest}"'
+        return self._etag
+
+    def encoded(self, encoding: str) -> bytes:
+        """``body`` compressed with ``encoding``, compressed once per entry"""
+        body = self._encoded.get(encoding)
+        if body is None:
+            with COMPRESS_SECONDS.time():
+                body = self._encoded[encoding] = compress(self.body, encoding)
+        return body
+
+    def precompressed(self, encodings: List[str]) -> Dict[str, Optional[bytes]]:
+        """
+        Compressed bodies to store in Redis, each prefixed with the ETag.
+
+        The prefix lets readers reject bodies left over from an earlier
+        payload. Bodies under COMPRESSION_MIN_SIZE map to None so any old
+        sibling is deleted rather than kept.
+        """
+        if len(self.body) < settings.COMPRESSION_MIN_SIZE:
+            return {encoding: None for encoding in encodings}
+        tag = self.etag.encode()
+        return {encoding: tag + self.encoded(encoding) for encoding in encodings}
+
+    def adopt_compressed(self, stored: Dict[str, bytes]) -> None:
+        """Use compressed bodies read from Redis that match this entry"""
+        tag = self.etag.encode()
+        for encoding, value in stored.items():
+            if value.startswith(tag):
+                self._encoded[encoding] = value[len(tag) :]
+
+    def view(
+        self, name: str, build: Callable[[Dict[str, Any]], Dict[str, Any]]
+    ) -> "CachedData":
+        """
+        A payload derived from this entry, built once per entry.
+
+        The view shares the entry's deadlines and has its own ``body``, so
+        derived responses get the same fast path as the cached payload.
+        """
+        view = self._views.get(name)
+        if view is None:
+            view = CacheEntry(build(self.data), self.fresh_until, self.expires_at)
+            if len(self._views) < MAX_VIEWS:
+                self._views[name] = view
+        return view.data
+
+    def is_fresh(self, now: float) -> bool:
+        """Whether the entry is within its soft TTL"""
+        return now < self.fresh_until
+
+    def should_refresh_early(self, now: float, beta: float) -> bool:
+        """
+        Probabilistic early expiration (XFetch).
+
+        The closer the entry is to going stale, and the slower it was to
+        fetch, the more likely a read is to trigger a refresh ahead of time.
+        """
+        if beta <= 0:
+            return False
+        return now - self.delta * beta * math.log(1.0 - random.random()) >= (
+            self.fresh_until
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Envelope stored in Redis"""
+        return {
+            "data": self.data,
+            "fresh_until": self.fresh_until,
+            "expires_at": self.expires_at,
+            "delta": self.delta,
+            "etag": self.etag,
+        }
+
+    @classmethod
+    def from_dict(cls, value: Dict[str, Any]) -> "CacheEntry":
+        """Read an envelope, treating pre-envelope payloads as already stale"""
+        if "fresh_until" not in value:
+            now = time.time()
+            return cls(data=value, fresh_until=now, expires_at=now + 1)
+        return cls(
+            data=value["data"],
+            fresh_until=value["fresh_until"],
+            expires_at=value["expires_at"],
+            delta=value.get("delta", 0.0),
+            _etag=value.get("etag"),
+        )
+
+
+class CacheService:
+    """
+    Two-tier cache: in-process LRU (L1) in front of Redis (L2).
+
+    An optional disk tier keeps a copy of every write, serves reads while
+    Redis is unreachable and warms L1 when a worker starts.
+    """
+
+    def __init__(self, redis_service: RedisService):
+        """Initialize both cache tiers"""
+        self.redis_service = redis_service
+        self.memory: Optional[MemoryCache] = None
+        if settings.MEMORY_CACHE_ENABLED:
+            self.memory = MemoryCache(
+                max_entries=settings.MEMORY_CACHE_MAX_ENTRIES,
+                max_bytes=settings.MEMORY_CACHE_MAX_BYTES,
+                ttl=min(settings.MEMORY_CACHE_TTL, settings.REDIS_CACHE_TTL),
+            )
+        self.soft_ttl = settings.REDIS_CACHE_TTL
+        self.hard_ttl = settings.REDIS_CACHE_TTL + settings.CACHE_STALE_TTL
+        self.channel = settings.CACHE_INVALIDATION_CHANNEL
+        self.disk: Optional[DiskCache] = None
+        if settings.DISK_CACHE_ENABLED:
+            self.disk = DiskCache(
+                settings.DISK_CACHE_DIR,
+                settings.DISK_CACHE_MAX_BYTES,
+                redis_service.codec,
+            )
+        # Stored next to each payload so hits are not compressed per worker
+        check_encodings()
+        self.encodings = configured_encodings()
+        self.l2_hits = 0
+        self.l2_misses = 0
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """
+        Open the disk tier, warm L1 from it and start listening for
+        invalidations published by other replicas.
+        """
+        if self.disk is not None:
+            if await self.disk.open():
+                await self._warm_from_disk()
+            else:
+                self.disk = None
+
+        if self.memory is None or not self.channel:
+            return
+        if self.redis_service.mode == "cluster":
+            # Cluster pub/sub is not supported by the async client; L1 entries
+            # then expire by TTL alone
+            logger.warning("Cache invalidation disabled in Redis cluster mode")
+            return
+        self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """Stop the invalidation listener and flush the disk tier"""
+        if self._listener:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self.disk is not None:
+            await self.disk.close()
+
+    async def _warm_from_disk(self) -> None:
+        """Load the latest-expiring disk entries into L1"""
+        assert self.disk is not None
+        if self.memory is None:
+            return
+        now = time.time()
+        for key, value in await self.disk.recent(settings.DISK_CACHE_WARM_ENTRIES):
+            self._remember(key, CacheEntry.from_dict(value), now)
+        logger.info(f"Warmed {len(self.memory)} cache entries from disk")
+
+    def _redis_down(self) -> bool:
+        """Whether reads should go to the disk tier instead of Redis"""
+        return self.disk is not None and self.redis_service.redis_client is None
+
+    async def _get_disk(self, key: str, now: float) -> Optional[CacheEntry]:
+        assert self.disk is not None
+        value = await self.disk.get(key)
+        if value is None:
+            return None
+        entry = CacheEntry.from_dict(value)
+        self._remember(key, entry, now)
+        return entry
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        """
+        Get an entry from L1, falling back to Redis.
+
+        A stale L1 entry is re-checked against Redis in case another worker
+        has already refreshed it. The returned entry may be stale; callers
+        decide how to treat it.
+        """
+        now = time.time()
+        local = self._get_local(key, now)
+        if local is not None and local.is_fresh(now):
+            return local
+        if self._redis_down():
+            return await self._get_disk(key, now) or local
+
+        if self.encodings:
+            [(value, compressed)] = await self.redis_service.get_with_siblings(
+                [key], self.encodings
+            )
+        else:
+            value, compressed = await self.redis_service.get(key), {}
+        if value is None:
+            self._count_l2(hit=False)
+            return local
+
+        self._count_l2(hit=True)
+        entry = CacheEntry.from_dict(value)
+        entry.adopt_compressed(compressed)
+        self._remember(key, entry, now)
+        return entry
+
+    async def peek(self, key: str) -> Optional[CacheEntry]:
+        """
+        Look an entry up for housekeeping, such as pre-warm scans.
+
+        Unlike get, nothing is counted as a cache hit or miss and Redis
+        entries are not copied into L1.
+        """
+        local = self.memory.peek(key) if self.memory is not None else None
+        if local is not None and local.is_fresh(time.time()):
+            return local
+        if self.redis_service.redis_client is None:
+            return local
+        value = await self.redis_service.get(key)
+        return local if value is None else CacheEntry.from_dict(value)
+
+    async def set(
+        self,
+        key: str,
+        data: Dict[str, Any],
+        delta: float = 0.0,
+        ttl: Optional[int] = None,
+    ) -> CacheEntry:
+        """
+        Store a fresh payload in every tier; returns the new entry.
+
+        ``ttl`` replaces both the soft and hard TTL, for entries that must
+        never be served stale.
+        """
+        now = time.time()
+        hard_ttl = self.hard_ttl if ttl is None else ttl
+        entry = CacheEntry(
+            data=data,
+            fresh_until=now + (self.soft_ttl if ttl is None else ttl),
+            expires_at=now + hard_ttl,
+            delta=delta,
+        )
+        self._remember(key, entry, now)
+        if self.disk is not None:
+            self.disk.put(key, entry.to_dict(), entry.expires_at)
+        if self.encodings:
+            await self.redis_service.set_many(
+                {key: entry.to_dict()},
+                ttl=hard_ttl,
+                siblings={key: entry.precompressed(self.encodings)},
+            )
+        else:
+            await self.redis_service.set(key, entry.to_dict(), ttl=hard_ttl)
+        return entry
+
+    async def get_many(self, keys: List[str]) -> List[Optional[CacheEntry]]:
+        """Get many entries, reading everything L1 cannot serve in one MGET"""
+        now = time.time()
+        entries: List[Optional[CacheEntry]] = []
+        remote: List[int] = []
+        for index, key in enumerate(keys):
+            local = self._get_local(key, now)
+            entries.append(local)
+            if local is None or not local.is_fresh(now):
+                remote.append(index)
+
+        if not remote:
+            return entries
+        if self._redis_down():
+            for index in remote:
+                entries[index] = (
+                    await self._get_disk(keys[index], now) or entries[index]
+                )
+            return entries
+
+        values = await self.redis_service.get_with_siblings(
+            [keys[i] for i in remote], self.encodings
+        )
+        for index, (value, compressed) in zip(remote, values):
+            if value is None:
+                self._count_l2(hit=False)
+                continue
+            self._count_l2(hit=True)
+            entry = CacheEntry.from_dict(value)
+            entry.adopt_compressed(compressed)
+            self._remember(keys[index], entry, now)
+            entries[index] = entry
+        return entries
+
+    async def set_many(
+        self, items: List[Tuple[str, Dict[str, Any], float]]
+    ) -> List[CacheEntry]:
+        """Store many fresh payloads, given as (key, data, delta), in one pipeline"""
+        now = time.time()
+        entries = []
+        mapping = {}
+        siblings = {}
+        for key, data, delta in items:
+            entry = CacheEntry(
+                data=data,
+                fresh_until=now + self.soft_ttl,
+                expires_at=now + self.hard_ttl,
+                delta=delta,
+            )
+            entries.append(entry)
+            self._remember(key, entry, now)
+            mapping[key] = entry.to_dict()
+            if self.disk is not None:
+                self.disk.put(key, mapping[key], entry.expires_at)
+            if self.encodings:
+                siblings[key] = entry.precompressed(self.encodings)
+        await self.redis_service.set_many(mapping, ttl=self.hard_ttl, siblings=siblings)
+        return entries
+
+    def _get_local(self, key: str, now: float) -> Optional[CacheEntry]:
+        """L1 lookup; only fresh entries count as L1 hits in metrics"""
+        if self.memory is None:
+            return None
+        entry = self.memory.get(key)
+        if entry is not None and entry.is_fresh(now):
+            L1_HITS.inc()
+        else:
+            L1_MISSES.inc()
+        return entry
+
+    def _count_l2(self, hit: bool) -> None:
+        if hit:
+            self.l2_hits += 1
+            L2_HITS.inc()
+        else:
+            self.l2_misses += 1
+            L2_MISSES.inc()
+
+    def _remember(self, key: str, entry: CacheEntry, now: float) -> None:
+        """Keep an entry in L1 no longer than its hard expiry"""
+        if self.memory is not None:
+            size = len(entry.body) + sum(map(len, entry._encoded.values()))
+            self.memory.set(key, entry, size, ttl=entry.expires_at - now)
+
+    async def invalidate(self, key: str) -> None:
+        """Remove a key from every tier on every replica"""
+        if self.memory is not None:
+            self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+        await self.redis_service.delete(
+            key, *(sibling_key(key, encoding) for encoding in self.encodings)
+        )
+        if self.channel:
+            await self.redis_service.publish(self.channel, key)
+
+    async def _listen(self) -> None:
+        """
+        Drop L1 entries for keys invalidated elsewhere.
+
+        Subscribes whenever Redis is available and resubscribes after the
+        connection drops.
+        """
+        assert self.channel is not None
+        while True:
+            await self.redis_service.available.wait()
+            client = self.redis_service.redis_client
+            if client is None:
+                continue
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message["type"] == "message" and self.memory is not None:
+                        key = message["data"].decode()
+                        self.memory.delete(key)
+                        if self.disk is not None:
+                            self.disk.delete(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cache invalidation listener lost Redis: {e}")
+            finally:
+                await pubsub.aclose()
+            await asyncio.sleep(settings.REDIS_RECONNECT_MIN_DELAY)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per-tier hit, miss and eviction counters"""
+        return {
+            "l1": self.memory.stats() if self.memory is not None else None,
+            "l2": {"hits": self.l2_hits, "misses": self.l2_misses},
+            "disk": self.disk.stats() if self.disk is not None else None,
+        }
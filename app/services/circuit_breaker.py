@@ -0,0 +1,144 @@
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List
+
+logger = logging.getLogger("weatherpy")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Failure-rate circuit breaker.
+
+    Closed: calls flow and outcomes are counted in one-second buckets over
+    a sliding window. Once the window holds at least ``min_calls`` outcomes
+    and the failure rate reaches ``failure_rate``, the breaker opens and
+    rejects calls for ``open_seconds``. It then goes half-open and lets
+    ``half_open_calls`` probes through: if they all succeed it closes,
+    and any failure opens it again.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window: float = 30.0,
+        min_calls: int = 10,
+        failure_rate: float = 0.5,
+        open_seconds: float = 15.0,
+        half_open_calls: int = 3,
+        enabled: bool = True,
+    ):
+        """Initialize a closed breaker"""
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.enabled = enabled
+        self.state = CLOSED
+        self.opened = 0
+        self.rejected = 0
+        self._opened_at = 0.0
+        self._probes = 0  # half-open calls allowed but not yet recorded
+        self._probe_successes = 0
+        # [second, calls, failures] per second, oldest first
+        self._buckets: Deque[List[int]] = deque()
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead; allowed calls must be recorded"""
+        if not self.enabled:
+            return True
+
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.open_seconds:
+                self.rejected += 1
+                return False
+            self.state = HALF_OPEN
+            self._probes = 0
+            self._probe_successes = 0
+            logger.info(f"Circuit breaker {self.name} half-open")
+
+        if self.state == HALF_OPEN:
+            if self._probes + self._probe_successes >= self.half_open_calls:
+                self.rejected += 1
+                return False
+            self._probes += 1
+        return True
+
+    def cancel(self) -> None:
+        """Give back a call allowed by ``allow`` that was never made"""
+        if self.state == HALF_OPEN and self._probes:
+            self._probes -= 1
+
+    def record_success(self) -> None:
+        """Record a call that reached a healthy upstream"""
+        if not self.enabled:
+            return
+        if self.state == HALF_OPEN:
+            self._probes = max(self._probes - 1, 0)
+            self._probe_successes += 1
+            if self._probe_successes >= self.half_open_calls:
+                self._close()
+            return
+        self._count(failed=False)
+
+    def record_failure(self) -> None:
+        """Record a call that failed because of the upstream"""
+        if not self.enabled:
+            return
+        if self.state == HALF_OPEN:
+            self._open()
+            return
+        if self.state == CLOSED:
+            self._count(failed=True)
+            calls, failures = self._totals()
+            if calls >= self.min_calls and failures / calls >= self.failure_rate:
+                self._open()
+
+    def _count(self, failed: bool) -> None:
+        second = int(time.monotonic())
+        if self._buckets and self._buckets[-1][0] == second:
+            bucket = self._buckets[-1]
+        else:
+            bucket = [second, 0, 0]
+            self._buckets.append(bucket)
+        bucket[1] += 1
+        bucket[2] += failed
+
+    def _totals(self) -> tuple:
+        """Calls and failures within the window"""
+        horizon = time.monotonic() - self.window
+        while self._buckets and self._buckets[0][0] < horizon:
+            self._buckets.popleft()
+        calls = sum(bucket[1] for bucket in self._buckets)
+        failures = sum(bucket[2] for bucket in self._buckets)
+        return calls, failures
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened += 1
+        self._opened_at = time.monotonic()
+        logger.warning(f"Circuit breaker {self.name} open")
+
+    def _close(self) -> None:
+        self.state = CLOSED
+        self._buckets.clear()
+        logger.info(f"Circuit breaker {self.name} closed")
+
+    def stats(self) -> Dict[str, Any]:
+        """Breaker state and window counters"""
+        calls, failures = self._totals()
+        return {
+            "enabled": self.enabled,
+            "state": self.state,
+            "open": self.state == OPEN,
+            "window_calls": calls,
+            "window_failure_rate": round(failures / calls, 4) if calls else 0.0,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
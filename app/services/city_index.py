@@ -0,0 +1,238 @@
+import logging
+import math
+import unicodedata
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.geo import haversine_km
+
+logger = logging.getLogger("weatherpy")
+
+# Common non-ISO spellings of country codes
+COUNTRY_ALIASES = {"UK": "GB", "EL": "GR"}
+# Kilometres per degree of latitude
+KM_PER_DEGREE = 111.2
+
+
+def normalize_text(value: str) -> str:
+    """
+    Canonical form of a place name for lookups and cache keys.
+
+    Applies NFKC, strips diacritics, case-folds and collapses whitespace, so
+    " São  Paulo", "sao paulo" and "SAO PAULO" all normalize the same.
+    """
+    value = unicodedata.normalize("NFKC", value)
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return " ".join(stripped.casefold().split())
+
+
+def normalize_country(code: Optional[str]) -> Optional[str]:
+    """Upper-case ISO 3166-1 alpha-2 code, with common aliases mapped"""
+    if not code:
+        return None
+    code = unicodedata.normalize("NFKC", code).strip().upper()
+    if not code:
+        return None
+    return COUNTRY_ALIASES.get(code, code)
+
+
+def split_query(
+    city: str, country_code: Optional[str] = None
+) -> Tuple[str, Optional[str]]:
+    """Split "London,GB" style input when no separate country code is given"""
+    city = " ".join(unicodedata.normalize("NFKC", city).split())
+    if country_code is None and "," in city:
+        name, _, suffix = city.rpartition(",")
+        if len(suffix.strip()) == 2 and name.strip():
+            return name.strip(), suffix
+    return city, country_code
+
+
+class City:
+    """A gazetteer entry"""
+
+    __slots__ = ("id", "name", "country", "lat", "lon", "population")
+
+    def __init__(
+        self,
+        city_id: int,
+        name: str,
+        country: str,
+        lat: float,
+        lon: float,
+        population: int,
+    ):
+        self.id = city_id
+        self.name = name
+        self.country = country
+        self.lat = lat
+        self.lon = lon
+        self.population = population
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "country": self.country,
+            "lat": self.lat,
+            "lon": self.lon,
+        }
+
+
+class CityIndex:
+    """
+    In-memory gazetteer with exact, prefix and fuzzy name lookup.
+
+    Cities are kept in parallel arrays and names in one sorted list of
+    normalized names (primary and alternate) that points back into them,
+    so lookups are a binary search and memory stays close to the raw data.
+    Coordinates are also bucketed into one-degree cells for nearest-city
+    lookups.
+    """
+
+    def __init__(self) -> None:
+        self.ids = array("q")
+        self.names: List[str] = []
+        self.countries: List[str] = []
+        self.lats = array("d")
+        self.lons = array("d")
+        self.populations = array("q")
+        self._keys: List[str] = []  # sorted normalized names
+        self._rows = array("l")  # city row for each entry in _keys
+        self._by_id: Dict[int, int] = {}
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+
+    @classmethod
+    def load(cls, path: str) -> "CityIndex":
+        """Load a tab-separated gazetteer (optionally gzipped)"""
+        index = cls()
+        file_path = Path(path)
+        if not file_path.exists():
+            logger.warning(f"City index file not found: {path}")
+            return index
+
+        opener: Any = open
+        if file_path.suffix == ".gz":
+            import gzip
+
+            opener = gzip.open
+        entries: List[Tuple[str, int]] = []
+        with opener(file_path, "rt", encoding="utf-8") as handle:
+            for line in handle:
+                if not line.strip() or line.startswith("#"):
+                    continue
+                fields = line.rstrip("\n").split("\t")
+                city_id, name, alternates, country, lat, lon, population = fields
+                row = len(index.ids)
+                index.ids.append(int(city_id))
+                index.names.append(name)
+                index.countries.append(country.upper())
+                index.lats.append(float(lat))
+                index.lons.append(float(lon))
+                index.populations.append(int(population or 0))
+                index._by_id[int(city_id)] = row
+                index._cells.setdefault(
+                    (math.floor(float(lat)), math.floor(float(lon))), []
+                ).append(row)
+
+                spellings = {normalize_text(name)}
+                spellings.update(
+                    normalize_text(alt) for alt in alternates.split(",") if alt.strip()
+                )
+                entries.extend((spelling, row) for spelling in spellings)
+
+        entries.sort()
+        index._keys = [key for key, _ in entries]
+        index._rows = array("l", (row for _, row in entries))
+        logger.info(f"Loaded {len(index)} cities into the city index")
+        return index
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def city(self, row: int) -> City:
+        return City(
+            self.ids[row],
+            self.names[row],
+            self.countries[row],
+            self.lats[row],
+            self.lons[row],
+            self.populations[row],
+        )
+
+    def get(self, city_id: int) -> Optional[City]:
+        """Look a city up by id"""
+        row = self._by_id.get(city_id)
+        return None if row is None else self.city(row)
+
+    def resolve(self, name: str, country: Optional[str] = None) -> Optional[City]:
+        """Exact match on a normalized name; the most populous city wins"""
+        key = normalize_text(name)
+        start = bisect_left(self._keys, key)
+        best: Optional[int] = None
+        for position in range(start, len(self._keys)):
+            if self._keys[position] != key:
+                break
+            row = self._rows[position]
+            if country and self.countries[row] != country:
+                continue
+            if best is None or self.populations[row] > self.populations[best]:
+                best = row
+        return None if best is None else self.city(best)
+
+    def nearest(self, lat: float, lon: float, max_km: float) -> Optional[City]:
+        """Closest city within ``max_km`` of a point, if any"""
+        lat_span = math.ceil(max_km / KM_PER_DEGREE)
+        # Degrees of longitude shrink towards the poles
+        width = KM_PER_DEGREE * max(math.cos(math.radians(abs(lat) + lat_span)), 0)
+        lon_span = min(180, math.ceil(max_km / width)) if width else 180
+
+        cell_lat, cell_lon = math.floor(lat), math.floor(lon)
+        best: Optional[int] = None
+        best_km = max_km
+        for d_lat in range(-lat_span, lat_span + 1):
+            for d_lon in range(-lon_span, lon_span + 1):
+                wrapped = (cell_lon + d_lon + 180) % 360 - 180
+                for row in self._cells.get((cell_lat + d_lat, wrapped), ()):
+                    km = haversine_km(lat, lon, self.lats[row], self.lons[row])
+                    if km <= best_km:
+                        best, best_km = row, km
+        return None if best is None else self.city(best)
+
+    def complete(self, prefix: str, limit: int = 10) -> List[City]:
+        """Cities whose name starts with ``prefix``, most populous first"""
+        key = normalize_text(prefix)
+        if not key:
+            return []
+
+        rows = set()
+        for position in range(bisect_left(self._keys, key), len(self._keys)):
+            if not self._keys[position].startswith(key):
+                break
+            rows.add(self._rows[position])
+
+        if len(rows) < limit:
+            rows.update(self._fuzzy_rows(key, limit - len(rows)))
+
+        ranked = sorted(rows, key=lambda row: -self.populations[row])
+        return [self.city(row) for row in ranked[:limit]]
+
+    def _fuzzy_rows(self, key: str, limit: int) -> List[int]:
+        """Close spellings among names sharing the first letter"""
+        import difflib  # only needed for fuzzy autocomplete
+
+        start = bisect_left(self._keys, key[0])
+        end = bisect_left(self._keys, chr(ord(key[0]) + 1))
+        candidates = self._keys[start:end]
+        matches = difflib.get_close_matches(
+            key, [c[: len(key)] for c in candidates], n=limit * 4, cutoff=0.75
+        )
+        wanted = set(matches)
+        rows: List[int] = []
+        for position, candidate in enumerate(candidates, start):
+            if candidate[: len(key)] in wanted and self._rows[position] not in rows:
+                rows.append(self._rows[position])
+        return rows[:limit]
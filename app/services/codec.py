@@ -0,0 +1,120 @@
+import json
+import logging
+import zlib
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+logger = logging.getLogger("weatherpy")
+
+# Framed entries start with MAGIC, a codec id byte and a flags byte.
+# Entries written before framing are plain JSON text and start with "{".
+MAGIC = b"\x00WP"
+FLAG_ZLIB = 0x01
+
+
+def dumps_json(value: Any) -> bytes:
+    """Compact JSON bytes, using orjson when installed"""
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, separators=(",", ":")).encode()
+
+
+def loads_json(data: bytes) -> Any:
+    """Parse JSON bytes, using orjson when installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class Codec:
+    """A named serializer identified by one byte in framed entries"""
+
+    def __init__(
+        self,
+        name: str,
+        codec_id: bytes,
+        dumps: Callable[[Any], bytes],
+        loads: Callable[[bytes], Any],
+    ):
+        self.name = name
+        self.codec_id = codec_id
+        self.dumps = dumps
+        self.loads = loads
+
+
+def _available_codecs() -> Dict[str, Codec]:
+    codecs = {
+        "json": Codec(
+            "json",
+            b"j",
+            lambda value: json.dumps(value, separators=(",", ":")).encode(),
+            json.loads,
+        )
+    }
+    if orjson is not None:
+        codecs["orjson"] = Codec("orjson", b"o", orjson.dumps, orjson.loads)
+    if msgpack is not None:
+        codecs["msgpack"] = Codec(
+            "msgpack",
+            b"m",
+            lambda value: msgpack.packb(value, use_bin_type=True),
+            lambda data: msgpack.unpackb(data, raw=False),
+        )
+    return codecs
+
+
+CODECS = _available_codecs()
+CODECS_BY_ID = {codec.codec_id: codec for codec in CODECS.values()}
+
+
+class CacheCodec:
+    """
+    Encode cache values with a configurable codec and optional zlib.
+
+    Decoding looks at the frame header rather than the configured codec, so
+    entries written by other codecs (or before framing) stay readable while
+    a new codec rolls out.
+    """
+
+    def __init__(self, name: str = "orjson", compress_threshold: Optional[int] = 0):
+        """Select the codec used for writes, falling back to json"""
+        codec = CODECS.get(name)
+        if codec is None:
+            logger.warning(f"Cache codec '{name}' is not available, using json")
+            codec = CODECS["json"]
+        self.codec = codec
+        self.compress_threshold = compress_threshold or 0
+
+    def encode(self, value: Any) -> bytes:
+        """Serialize a value into a framed entry"""
+        payload = self.codec.dumps(value)
+        flags = 0
+        if self.compress_threshold and len(payload) >= self.compress_threshold:
+            payload = zlib.compress(payload)
+            flags |= FLAG_ZLIB
+        return MAGIC + self.codec.codec_id + bytes([flags]) + payload
+
+    def decode(self, data: bytes) -> Any:
+        """Deserialize a framed or legacy JSON entry"""
+        if not data.startswith(MAGIC):
+            return loads_json(data)
+
+        header = len(MAGIC)
+        codec = CODECS_BY_ID.get(data[header : header + 1])
+        if codec is None:
+            raise ValueError(f"Unsupported cache codec id {data[header:header + 1]!r}")
+
+        flags = data[header + 1]
+        payload = data[header + 2 :]
+        if flags & FLAG_ZLIB:
+            payload = zlib.decompress(payload)
+        return codec.loads(payload)
@@ -0,0 +1,132 @@
+import gzip
+import logging
+from typing import Any, Callable, Dict, List, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipResponder
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+logger = logging.getLogger("weatherpy")
+
+
+def _available_encoders() -> Dict[str, Callable[[bytes], bytes]]:
+    # Cached bodies are compressed once per entry, so favor ratio over speed
+    encoders: Dict[str, Callable[[bytes], bytes]] = {
+        "gzip": lambda body: gzip.compress(body, compresslevel=9, mtime=0)
+    }
+    if brotli is not None:
+        encoders["br"] = lambda body: brotli.compress(body, quality=9)
+    if zstandard is not None:
+        encoders["zstd"] = zstandard.ZstdCompressor(level=10).compress
+    return encoders
+
+
+ENCODERS = _available_encoders()
+
+
+def configured_encodings() -> List[str]:
+    """COMPRESSION_ENCODINGS that are installed, in server preference order"""
+    if not settings.COMPRESSION_ENABLED:
+        return []
+    return [name for name in settings.COMPRESSION_ENCODINGS if name in ENCODERS]
+
+
+def check_encodings() -> None:
+    """Log configured encodings whose optional package is missing"""
+    for name in settings.COMPRESSION_ENCODINGS:
+        if name not in ENCODERS:
+            logger.info(f"Compression '{name}' is not installed, skipping it")
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    return ENCODERS[encoding](body)
+
+
+def negotiate(
+    accept_encoding: Optional[str],
+    size: int,
+    encodings: Optional[List[str]] = None,
+) -> Optional[str]:
+    """
+    Pick the encoding for a body of ``size`` bytes from Accept-Encoding.
+
+    Returns None for identity: when the body is under COMPRESSION_MIN_SIZE
+    or the client accepts none of ``encodings`` (by default the configured
+    ones). Ties in q-value go to the server's preference order.
+    """
+    if not accept_encoding or size < settings.COMPRESSION_MIN_SIZE:
+        return None
+
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    if encodings is None:
+        encodings = configured_encodings()
+    for name in encodings:
+        quality = accepted.get(name, accepted.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = name, quality
+    return best
+
+
+class GZipMiddleware:
+    """
+    ASGI middleware gzipping dynamic responses.
+
+    Unlike Starlette's, gzip is only used when negotiate() picks it, so
+    ``gzip;q=0`` is honored, and a strong ETag on a gzipped body gets a
+    ``-gzip`` suffix, as on precompressed cache hits. Responses that already
+    carry a Content-Encoding pass through untouched.
+    """
+
+    def __init__(self, app: Any, compresslevel: int = 6) -> None:
+        self.app = app
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope: Dict[str, Any], receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept_encoding = Headers(scope=scope).get("accept-encoding")
+        if negotiate(accept_encoding, settings.COMPRESSION_MIN_SIZE, ["gzip"]) is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                etag = headers.get("etag")
+                if (
+                    headers.get("content-encoding") == "gzip"
+                    and etag
+                    and not etag.startswith("W/")
+                    and not etag.endswith('-gzip"')
+                ):
+                    headers["etag"] = f'{etag[:-1]}-gzip"'
+            await send(message)
+
+        responder = GZipResponder(
+            self.app, settings.COMPRESSION_MIN_SIZE, compresslevel=self.compresslevel
+        )
+        await responder(scope, receive, send_wrapper)
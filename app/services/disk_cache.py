@@ -0,0 +1,273 @@
+import asyncio
+import fcntl
+import heapq
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.services.codec import CacheCodec
+
+logger = logging.getLogger("weatherpy")
+
+# Record header: crc32 of the rest of the record, key length, value length
+# and expiry as Unix time. A value length of 0 is a tombstone.
+HEADER = struct.Struct(">IHId")
+# Log files tried per directory; each worker process locks one
+MAX_SLOTS = 64
+# Write is a (key, encoded value or None for delete, expires_at) tuple
+Write = Tuple[str, Optional[bytes], float]
+
+
+class DiskCache:
+    """
+    Append-only on-disk cache tier, one log file per worker process.
+
+    Every write appends a checksummed record and updates an in-memory index
+    of ``key -> (offset, size, expires_at)``; reads look up the index and
+    read a single record. File I/O runs in a worker thread fed by a bounded
+    queue, so callers never wait on the disk and writes are dropped rather
+    than queued without bound. Once the log outgrows ``max_bytes`` it is
+    compacted to its live records, keeping the latest-expiring ones if they
+    alone exceed half the budget. Records after a torn write are discarded
+    when the log is opened.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        codec: CacheCodec,
+        queue_size: int = 10000,
+    ):
+        """Initialize a closed cache; call ``open`` before use"""
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.codec = codec
+        self.path: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.dropped = 0
+        self.compactions = 0
+        self._file: Optional[Any] = None
+        self._size = 0
+        self._index: Dict[str, Tuple[int, int, float]] = {}
+        # Values queued but not yet on disk, so reads see their own writes
+        self._pending: Dict[str, Optional[bytes]] = {}
+        self._queue: "asyncio.Queue[Write]" = asyncio.Queue(queue_size)
+        self._lock = threading.Lock()
+        self._writer: Optional[asyncio.Task] = None
+
+    async def open(self) -> bool:
+        """Lock a log file and index it; False if the tier is unusable"""
+        try:
+            await asyncio.to_thread(self._open)
+        except OSError as e:
+            logger.error(f"Disk cache unavailable: {e}")
+            return False
+        if self._file is None:
+            logger.warning(f"No free disk cache slot in {self.directory}")
+            return False
+        self._writer = asyncio.create_task(self._write_loop())
+        logger.info(f"Disk cache {self.path}: {len(self._index)} entries loaded")
+        return True
+
+    async def close(self) -> None:
+        """Write out queued records and release the log"""
+        if self._writer is not None:
+            await self._queue.join()
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+        if self._file is not None:
+            await asyncio.to_thread(self._file.close)
+            self._file = None
+
+    def put(self, key: str, value: Any, expires_at: float) -> None:
+        """Queue a value for writing"""
+        self._enqueue(key, self.codec.encode(value), expires_at)
+
+    def delete(self, key: str) -> None:
+        """Queue a tombstone for ``key``"""
+        self._enqueue(key, None, 0.0)
+
+    def _enqueue(self, key: str, data: Optional[bytes], expires_at: float) -> None:
+        if self._writer is None:
+            return
+        try:
+            self._queue.put_nowait((key, data, expires_at))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return
+        self._pending[key] = data
+
+    async def get(self, key: str) -> Optional[Any]:
+        """Read an unexpired value, or None"""
+        if key in self._pending:
+            data = self._pending[key]
+        else:
+            location = self._index.get(key)
+            if location is None or location[2] <= time.time():
+                self.misses += 1
+                return None
+            data = await asyncio.to_thread(self._read, key)
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self.codec.decode(data)
+
+    async def recent(self, limit: int) -> List[Tuple[str, Any]]:
+        """Up to ``limit`` unexpired values, latest-expiring first"""
+        records = await asyncio.to_thread(self._recent, limit)
+        return [(key, self.codec.decode(data)) for key, data in records]
+
+    async def _write_loop(self) -> None:
+        """Append queued records in batches, compacting when over budget"""
+        while True:
+            batch = [await self._queue.get()]
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await asyncio.to_thread(self._append, batch)
+                self.writes += len(batch)
+            except OSError as e:
+                logger.error(f"Disk cache write failed: {e}")
+            finally:
+                for key, data, _ in batch:
+                    # A newer write to the key may be queued behind this one
+                    if key in self._pending and self._pending[key] is data:
+                        del self._pending[key]
+                for _ in batch:
+                    self._queue.task_done()
+
+    # The methods below run in worker threads
+
+    def _open(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        for slot in range(MAX_SLOTS):
+            path = os.path.join(self.directory, f"cache.{slot}.log")
+            file = open(path, "a+b")
+            try:
+                fcntl.flock(file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                file.close()
+                continue
+            self.path, self._file = path, file
+            self._load()
+            return
+
+    def _load(self) -> None:
+        """Index the log, truncating it after the last intact record"""
+        assert self._file is not None
+        self._file.seek(0)
+        offset = 0
+        while True:
+            header = self._file.read(HEADER.size)
+            if len(header) < HEADER.size:
+                break
+            crc, key_len, value_len, expires_at = HEADER.unpack(header)
+            body = self._file.read(key_len + value_len)
+            if len(body) < key_len + value_len or zlib.crc32(header[4:] + body) != crc:
+                logger.warning(f"Disk cache {self.path} truncated at {offset}")
+                break
+            key = body[:key_len].decode()
+            size = HEADER.size + key_len + value_len
+            if value_len:
+                self._index[key] = (offset, size, expires_at)
+            else:
+                self._index.pop(key, None)
+            offset += size
+        self._file.truncate(offset)
+        self._size = offset
+
+    def _append(self, batch: List[Write]) -> None:
+        assert self._file is not None
+        with self._lock:
+            self._file.seek(0, os.SEEK_END)
+            chunks = []
+            for key, data, expires_at in batch:
+                record = self._record(key, data or b"", expires_at)
+                if data is None:
+                    self._index.pop(key, None)
+                else:
+                    self._index[key] = (self._size, len(record), expires_at)
+                chunks.append(record)
+                self._size += len(record)
+            self._file.write(b"".join(chunks))
+            self._file.flush()
+            if self._size > self.max_bytes:
+                self._compact()
+
+    @staticmethod
+    def _record(key: str, data: bytes, expires_at: float) -> bytes:
+        encoded_key = key.encode()
+        rest = HEADER.pack(0, len(encoded_key), len(data), expires_at)[4:]
+        rest += encoded_key + data
+        return struct.pack(">I", zlib.crc32(rest)) + rest
+
+    def _read(self, key: str) -> Optional[bytes]:
+        assert self._file is not None
+        with self._lock:
+            location = self._index.get(key)
+            if location is None:
+                return None
+            offset, size, _ = location
+            record = os.pread(self._file.fileno(), size, offset)
+        key_len = HEADER.unpack_from(record)[1]
+        return record[HEADER.size + key_len :]
+
+    def _recent(self, limit: int) -> List[Tuple[str, bytes]]:
+        with self._lock:
+            now = time.time()
+            live = [(loc[2], key) for key, loc in self._index.items() if loc[2] > now]
+            keys = [key for _, key in heapq.nlargest(limit, live)]
+        records = [(key, self._read(key)) for key in keys]
+        return [(key, data) for key, data in records if data is not None]
+
+    def _compact(self) -> None:
+        """Rewrite the log with live records only (called under the lock)"""
+        assert self._file is not None and self.path is not None
+        now = time.time()
+        live = sorted(
+            (item for item in self._index.items() if item[1][2] > now),
+            key=lambda item: item[1][2],
+            reverse=True,
+        )
+        budget = self.max_bytes // 2
+        temp_path = f"{self.path}.compact"
+        index: Dict[str, Tuple[int, int, float]] = {}
+        offset = 0
+        with open(temp_path, "wb") as temp:
+            for key, (old_offset, size, expires_at) in live:
+                if offset + size > budget:
+                    break
+                temp.write(os.pread(self._file.fileno(), size, old_offset))
+                index[key] = (offset, size, expires_at)
+                offset += size
+            temp.flush()
+            os.fsync(temp.fileno())
+
+        # Lock the new file before it replaces the old one
+        new_file = open(temp_path, "a+b")
+        fcntl.flock(new_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        os.replace(temp_path, self.path)
+        self._file.close()
+        self._file, self._index, self._size = new_file, index, offset
+        self.compactions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Size, hit and write counters"""
+        return {
+            "entries": len(self._index),
+            "bytes": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "dropped": self.dropped,
+            "compactions": self.compactions,
+        }
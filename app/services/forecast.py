@@ -0,0 +1,176 @@
+import time
+from collections import Counter
+from itertools import groupby
+from typing import Any, Dict, List, Optional, Sequence
+
+# Numeric columns, in response order
+NUMERIC_FIELDS = (
+    "temperature",
+    "feels_like",
+    "humidity",
+    "pressure",
+    "wind_speed",
+    "clouds",
+)
+# Columns stored as codes into an interned string table
+CODED_FIELDS = {"description": "descriptions", "icon": "icons"}
+FIELDS = NUMERIC_FIELDS + tuple(CODED_FIELDS)
+SECONDS_PER_DAY = 86400
+
+
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """
+    Parse a ``fields=temperature,humidity`` selection.
+
+    Returns None for "all fields" and raises ValueError on unknown names.
+    """
+    if not fields:
+        return None
+    selected = list(dict.fromkeys(name.strip() for name in fields.split(",")))
+    unknown = [name for name in selected if name not in FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown forecast fields: {', '.join(unknown)}")
+    return selected
+
+
+def _intern(values: Sequence[str]) -> tuple:
+    """Codes into a table of distinct values, in first-seen order"""
+    table: Dict[str, int] = {}
+    codes = [table.setdefault(value, len(table)) for value in values]
+    return codes, list(table)
+
+
+def build_columns(items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Columnar form of the OpenWeatherMap 3-hourly forecast list.
+
+    One list per field instead of one dict per time step; descriptions and
+    icons repeat heavily, so they are stored as codes into small tables.
+    """
+    mains = [item["main"] for item in items]
+    weathers = [item["weather"][0] for item in items]
+    descriptions, description_table = _intern([w["description"] for w in weathers])
+    icons, icon_table = _intern([w["icon"] for w in weathers])
+    return {
+        "timestamp": [item["dt"] for item in items],
+        "temperature": [main["temp"] for main in mains],
+        "feels_like": [main["feels_like"] for main in mains],
+        "humidity": [main["humidity"] for main in mains],
+        "pressure": [main["pressure"] for main in mains],
+        "wind_speed": [item["wind"]["speed"] for item in items],
+        "clouds": [item["clouds"]["all"] for item in items],
+        "description": descriptions,
+        "icon": icons,
+        "descriptions": description_table,
+        "icons": icon_table,
+    }
+
+
+def columns_from_rows(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Columnar form of forecast items cached before columns were introduced"""
+    columns: Dict[str, Any] = {
+        name: [row[name] for row in rows] for name in ("timestamp",) + NUMERIC_FIELDS
+    }
+    for name, table in CODED_FIELDS.items():
+        columns[name], columns[table] = _intern([row[name] for row in rows])
+    return columns
+
+
+def select_columns(
+    columns: Dict[str, Any], fields: Optional[List[str]]
+) -> Dict[str, List[Any]]:
+    """Requested columns (all if ``fields`` is None) with codes decoded"""
+    selected: Dict[str, List[Any]] = {}
+    for name in fields or FIELDS:
+        if name in CODED_FIELDS:
+            table = columns[CODED_FIELDS[name]]
+            selected[name] = [table[code] for code in columns[name]]
+        else:
+            selected[name] = columns[name]
+    return selected
+
+
+def to_rows(
+    columns: Dict[str, Any], fields: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """Forecast items as served by /forecast, one dict per time step"""
+    selected = select_columns(columns, fields)
+    names = list(selected)
+    rows = []
+    for timestamp, *values in zip(columns["timestamp"], *selected.values()):
+        # dt_txt is the UTC timestamp, so derive it instead of storing it
+        date, clock = time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(timestamp)).split()
+        row = {"date": date, "time": clock, "timestamp": timestamp}
+        row.update(zip(names, values))
+        rows.append(row)
+    return rows
+
+
+def daily(
+    columns: Dict[str, Any], offset: int, fields: Optional[List[str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Per-day summaries in the city's local time (UTC + ``offset`` seconds).
+
+    Numeric fields get min, max and mean over each day's time steps; coded
+    fields get the most frequent value. Time steps are in timestamp order,
+    so each day is a contiguous slice of every column.
+    """
+    fields = fields or list(FIELDS)
+    timestamps = columns["timestamp"]
+    local_days = [(timestamp + offset) // SECONDS_PER_DAY for timestamp in timestamps]
+
+    days = []
+    start = 0
+    for day, group in groupby(local_days):
+        end = start + sum(1 for _ in group)
+        summary: Dict[str, Any] = {
+            "date": time.strftime("%Y-%m-%d", time.gmtime(day * SECONDS_PER_DAY)),
+            "samples": end - start,
+        }
+        for name in fields:
+            values = columns[name][start:end]
+            if name in CODED_FIELDS:
+                code = Counter(values).most_common(1)[0][0]
+                summary[name] = columns[CODED_FIELDS[name]][code]
+            else:
+                summary[name] = {
+                    "min": min(values),
+                    "max": max(values),
+                    "mean": round(sum(values) / len(values), 2),
+                }
+        days.append(summary)
+        start = end
+    return days
+
+
+def _columns(data: Dict[str, Any]) -> Dict[str, Any]:
+    if "columns" in data:
+        return data["columns"]
+    return columns_from_rows(data["forecast"])
+
+
+def rows_payload(
+    data: Dict[str, Any], fields: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """/forecast response body for a cached columnar forecast"""
+    return {
+        "success": True,
+        "city": data["city"],
+        "country": data["country"],
+        "forecast": to_rows(_columns(data), fields),
+        "timezone": data["timezone"],
+    }
+
+
+def daily_payload(
+    data: Dict[str, Any], fields: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """/forecast/daily response body for a cached columnar forecast"""
+    return {
+        "success": True,
+        "city": data["city"],
+        "country": data["country"],
+        "days": daily(_columns(data), data["timezone"], fields),
+        "timezone": data["timezone"],
+    }
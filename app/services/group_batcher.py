@@ -0,0 +1,175 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.core.metrics import UPSTREAM_BATCH_SIZE, UPSTREAM_BATCH_WAIT_SECONDS
+from app.services.upstream import Result, UpstreamClient
+
+logger = logging.getLogger("weatherpy")
+
+# Most city ids OpenWeatherMap accepts in one group call
+GROUP_MAX_IDS = 20
+# Group call rejections that mean the endpoint is not usable with our key
+GROUP_REJECTED = {400, 401, 403, 404}
+
+
+class _Lookup:
+    """Callers waiting on one city id in the next group call"""
+
+    __slots__ = ("country", "location", "queued", "futures")
+
+    def __init__(self, country: str, location: Dict[str, Any]):
+        self.country = country
+        self.location = location
+        self.queued = time.monotonic()
+        self.futures: List["asyncio.Future[Result]"] = []
+
+
+class GroupBatcher:
+    """
+    Merges concurrent current-weather misses into OpenWeatherMap group calls.
+
+    Lookups by gazetteer id wait up to UPSTREAM_BATCH_WINDOW seconds, or
+    until UPSTREAM_BATCH_MAX_SIZE distinct ids are queued, and are then
+    fetched with one ``group`` request that costs one call of the rate
+    budget. A lone id is fetched with a normal single call. Gazetteer ids
+    are GeoNames ids, which OpenWeatherMap mostly shares: ids missing from
+    the group response, or answered with a different country, are looked
+    up singly by name. If the group endpoint rejects our key outright,
+    batching is switched off for the rest of the process.
+    """
+
+    def __init__(self, upstream: UpstreamClient, params: Dict[str, Any]):
+        """Initialize with the query parameters common to every call"""
+        self.upstream = upstream
+        self.params = params
+        self.enabled = settings.UPSTREAM_BATCH_ENABLED
+        self.window = settings.UPSTREAM_BATCH_WINDOW
+        self.max_size = min(settings.UPSTREAM_BATCH_MAX_SIZE, GROUP_MAX_IDS)
+        self.batches = 0
+        self.batched = 0
+        self.singles = 0
+        self.fallbacks = 0
+        self._pending: Dict[int, _Lookup] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flushes: Set[asyncio.Task] = set()
+
+    async def get(self, city_id: int, country: str, location: Dict[str, Any]) -> Result:
+        """Current weather for a gazetteer city, as ``(data, error)``"""
+        if not self.enabled:
+            return await self._single(location)
+
+        loop = asyncio.get_running_loop()
+        lookup = self._pending.get(city_id)
+        if lookup is None:
+            lookup = self._pending[city_id] = _Lookup(country, location)
+        future: "asyncio.Future[Result]" = loop.create_future()
+        lookup.futures.append(future)
+
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    async def close(self) -> None:
+        """Send anything still queued and wait for in-flight group calls"""
+        self._flush()
+        await asyncio.gather(*self._flushes, return_exceptions=True)
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, {}
+        task = asyncio.create_task(self._run(batch))
+        self._flushes.add(task)
+        task.add_done_callback(self._flushes.discard)
+
+    async def _run(self, batch: Dict[int, _Lookup]) -> None:
+        """Fetch a batch and resolve every waiting caller"""
+        started = time.monotonic()
+        UPSTREAM_BATCH_SIZE.observe(len(batch))
+        for lookup in batch.values():
+            UPSTREAM_BATCH_WAIT_SECONDS.observe(started - lookup.queued)
+        try:
+            if len(batch) == 1:
+                self.singles += 1
+                await self._resolve_singly(batch)
+            else:
+                await self._resolve_group(batch)
+        except asyncio.CancelledError:
+            for lookup in batch.values():
+                for future in lookup.futures:
+                    future.cancel()
+            raise
+        except Exception as e:
+            logger.exception("Group lookup failed")
+            for lookup in batch.values():
+                for future in lookup.futures:
+                    if not future.done():
+                        future.set_exception(e)
+
+    async def _resolve_group(self, batch: Dict[int, _Lookup]) -> None:
+        params = {**self.params, "id": ",".join(str(city_id) for city_id in batch)}
+        data, error = await self.upstream.get_json("group", params)
+        if error is not None:
+            if error["status_code"] in GROUP_REJECTED:
+                logger.warning(
+                    f"Group lookups rejected ({error['error']}), using single calls"
+                )
+                self.enabled = False
+                await self._resolve_singly(batch)
+                return
+            for lookup in batch.values():
+                self._set(lookup, (None, error))
+            return
+
+        self.batches += 1
+        items = {item.get("id"): item for item in (data or {}).get("list", [])}
+        unmatched: Dict[int, _Lookup] = {}
+        for city_id, lookup in batch.items():
+            item = items.get(city_id)
+            if item is None or item.get("sys", {}).get("country") != lookup.country:
+                unmatched[city_id] = lookup
+                continue
+            # Group items carry the UTC offset under sys rather than top level
+            item.setdefault("timezone", item["sys"].get("timezone", 0))
+            self.batched += 1
+            self._set(lookup, (item, None))
+
+        if unmatched:
+            self.fallbacks += len(unmatched)
+            await self._resolve_singly(unmatched)
+
+    async def _resolve_singly(self, batch: Dict[int, _Lookup]) -> None:
+        lookups = list(batch.values())
+        results = await asyncio.gather(
+            *(self._single(lookup.location) for lookup in lookups)
+        )
+        for lookup, result in zip(lookups, results):
+            self._set(lookup, result)
+
+    async def _single(self, location: Dict[str, Any]) -> Result:
+        return await self.upstream.get_json("weather", {**location, **self.params})
+
+    @staticmethod
+    def _set(lookup: _Lookup, result: Result) -> None:
+        for future in lookup.futures:
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        """Group call counters"""
+        return {
+            "enabled": self.enabled,
+            "batches": self.batches,
+            "batched": self.batched,
+            "singles": self.singles,
+            "fallbacks": self.fallbacks,
+            "queued": len(self._pending),
+        }
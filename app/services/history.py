@@ -0,0 +1,199 @@
+import asyncio
+import logging
+import struct
+import time
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from app.core.config import settings
+from app.services.redis_service import RedisService
+
+logger = logging.getLogger("weatherpy")
+
+# Observed WeatherDetail fields, in packing order
+FIELDS = ("temperature", "humidity", "pressure", "wind_speed", "clouds")
+# Raw point: observation time, then one value per field
+POINT = struct.Struct(">I5f")
+# Rollup: bucket start, observation count, then min, max, mean per field
+ROLLUP = struct.Struct(">II15f")
+# Rollup bucket sizes in seconds, aligned to UTC
+RESOLUTIONS = {"hour": 3600, "day": 86400}
+
+# (count, mins, maxes, means) for one bucket
+Aggregate = Tuple[int, Sequence[float], Sequence[float], Sequence[float]]
+
+
+def _combine(parts: Sequence[Aggregate]) -> Aggregate:
+    """Merge aggregates; means are weighted by observation count"""
+    count = sum(part[0] for part in parts)
+    mins = [min(part[1][i] for part in parts) for i in range(len(FIELDS))]
+    maxes = [max(part[2][i] for part in parts) for i in range(len(FIELDS))]
+    means = [
+        sum(part[0] * part[3][i] for part in parts) / count for i in range(len(FIELDS))
+    ]
+    return count, mins, maxes, means
+
+
+def _pack_rollup(start: int, aggregate: Aggregate) -> bytes:
+    count, mins, maxes, means = aggregate
+    values = [v for i in range(len(FIELDS)) for v in (mins[i], maxes[i], means[i])]
+    return ROLLUP.pack(start, count, *values)
+
+
+def _unpack_rollup(data: bytes) -> Tuple[int, Aggregate]:
+    start, count, *values = ROLLUP.unpack(data)
+    return start, (count, values[0::3], values[1::3], values[2::3])
+
+
+def _point_aggregate(data: bytes) -> Aggregate:
+    values = POINT.unpack(data)[1:]
+    return 1, values, values, values
+
+
+class HistoryStore:
+    """
+    Per-city observation history in Redis with hourly and daily rollups.
+
+    Each fresh current-weather result is packed into 24 bytes and added to
+    a sorted set scored by observation time; ``ZADD NX`` drops the copies
+    other workers fetch of the same observation. The hour bucket the point
+    falls in is then recomputed from its raw points, and the day bucket
+    from its hours, so rollups stay current without rescanning history and
+    a recomputation racing another only ever rewrites a bucket from the
+    data. Every set is trimmed to its retention on write. A city's keys
+    share a hash tag, so each step is one round trip to one node (a MULTI
+    transaction outside cluster mode). Writes run in the background, off
+    the request path.
+    """
+
+    def __init__(self, redis_service: RedisService, prefix: str = "history"):
+        """Initialize from settings"""
+        self.redis_service = redis_service
+        self.prefix = prefix
+        self.enabled = settings.HISTORY_ENABLED
+        self.retention = {
+            "raw": settings.HISTORY_RAW_RETENTION,
+            "hour": settings.HISTORY_HOURLY_RETENTION,
+            "day": settings.HISTORY_DAILY_RETENTION,
+        }
+        self.recorded = 0
+        self.duplicates = 0
+        self.dropped = 0
+        self.errors = 0
+        self._writes: Set[asyncio.Task] = set()
+        # Cluster pipelines cannot be transactions
+        self._transaction = redis_service.mode != "cluster"
+
+    def _key(self, key_part: str, series: str) -> str:
+        return f"{self.prefix}:{{{key_part}}}:{series}"
+
+    def record(self, key_part: str, result: Dict[str, Any]) -> None:
+        """Schedule a current-weather result to be appended to its city"""
+        if not self.enabled or self.redis_service.redis_client is None:
+            return
+        if len(self._writes) >= settings.HISTORY_MAX_PENDING:
+            self.dropped += 1
+            return
+        weather = result["weather"]
+        point = POINT.pack(result["timestamp"], *(weather[f] for f in FIELDS))
+        task = asyncio.create_task(self._append(key_part, result["timestamp"], point))
+        self._writes.add(task)
+        task.add_done_callback(self._writes.discard)
+
+    async def close(self) -> None:
+        """Wait for pending writes"""
+        await asyncio.gather(*self._writes, return_exceptions=True)
+
+    async def _append(self, key_part: str, timestamp: int, point: bytes) -> None:
+        client = self.redis_service.redis_client
+        if client is None:
+            return
+        raw, hourly, daily = (self._key(key_part, s) for s in ("raw", "hour", "day"))
+        hour = timestamp - timestamp % RESOLUTIONS["hour"]
+        day = timestamp - timestamp % RESOLUTIONS["day"]
+        now = time.time()
+        try:
+            async with client.pipeline(transaction=self._transaction) as pipe:
+                pipe.zadd(raw, {point: timestamp}, nx=True)
+                pipe.zrangebyscore(raw, hour, hour + RESOLUTIONS["hour"] - 1)
+                pipe.zremrangebyscore(raw, "-inf", now - self.retention["raw"])
+                pipe.expire(raw, self.retention["raw"])
+                added, points, *_ = await self.redis_service._call(pipe.execute())
+            if not added:
+                self.duplicates += 1
+                return
+
+            hour_rollup = _combine([_point_aggregate(p) for p in points])
+            async with client.pipeline(transaction=self._transaction) as pipe:
+                self._replace(pipe, hourly, hour, hour_rollup, now)
+                pipe.zrangebyscore(hourly, day, day + RESOLUTIONS["day"] - 1)
+                hours = (await self.redis_service._call(pipe.execute()))[-1]
+
+            day_rollup = _combine([_unpack_rollup(h)[1] for h in hours])
+            async with client.pipeline(transaction=self._transaction) as pipe:
+                self._replace(pipe, daily, day, day_rollup, now)
+                await self.redis_service._call(pipe.execute())
+        except Exception as e:
+            self.errors += 1
+            self.redis_service._failed(f"recording history for {key_part} in", e)
+            return
+        self.recorded += 1
+
+    def _replace(
+        self, pipe: Any, key: str, start: int, aggregate: Aggregate, now: float
+    ) -> None:
+        """Queue commands swapping in a bucket's rollup and trimming the set"""
+        resolution = key.rsplit(":", 1)[1]
+        pipe.zremrangebyscore(key, start, start)
+        pipe.zadd(key, {_pack_rollup(start, aggregate): start})
+        pipe.zremrangebyscore(key, "-inf", now - self.retention[resolution])
+        pipe.expire(key, self.retention[resolution])
+
+    async def query(
+        self,
+        key_part: str,
+        resolution: str,
+        start: float,
+        end: float,
+        limit: Optional[int] = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """Rollups with bucket starts in [start, end], or None without Redis"""
+        client = self.redis_service.redis_client
+        if client is None:
+            return None
+        try:
+            rows = await self.redis_service._call(
+                client.zrangebyscore(
+                    self._key(key_part, resolution),
+                    start,
+                    end,
+                    start=0,
+                    num=limit or settings.HISTORY_MAX_POINTS,
+                )
+            )
+        except Exception as e:
+            self.redis_service._failed(f"reading history for {key_part} from", e)
+            return None
+        return [self._point(row) for row in rows]
+
+    @staticmethod
+    def _point(row: bytes) -> Dict[str, Any]:
+        start, (count, mins, maxes, means) = _unpack_rollup(row)
+        point: Dict[str, Any] = {"start": start, "samples": count}
+        for i, name in enumerate(FIELDS):
+            point[name] = {
+                "min": round(mins[i], 2),
+                "max": round(maxes[i], 2),
+                "mean": round(means[i], 2),
+            }
+        return point
+
+    def stats(self) -> Dict[str, Any]:
+        """Write counters"""
+        return {
+            "enabled": self.enabled,
+            "recorded": self.recorded,
+            "duplicates": self.duplicates,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "pending": len(self._writes),
+        }
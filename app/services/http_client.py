@@ -0,0 +1,111 @@
+import importlib.util
+import logging
+from typing import Any, Dict, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import STAGE_SECONDS, UPSTREAM_RESPONSES
+from app.core.profiling import profiled
+
+logger = logging.getLogger("weatherpy")
+
+UPSTREAM_SECONDS = STAGE_SECONDS.labels("upstream")
+
+
+class HTTPClientService:
+    """Shared, pooled HTTP client for upstream API calls"""
+
+    def __init__(self):
+        """Initialize client settings"""
+        self.client: Optional[httpx.AsyncClient] = None
+        self.http2 = settings.HTTP2_ENABLED
+        self.limits = httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY,
+        )
+        self.timeout = httpx.Timeout(
+            connect=settings.HTTP_CONNECT_TIMEOUT,
+            read=settings.HTTP_READ_TIMEOUT,
+            write=settings.HTTP_WRITE_TIMEOUT,
+            pool=settings.HTTP_POOL_TIMEOUT,
+        )
+        self.requests_sent = 0
+        self.connections_opened = 0
+
+    async def connect(self) -> None:
+        """Create the long-lived client and its connection pool"""
+        http2 = self.http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 requested but 'h2' is not installed")
+            http2 = False
+
+        self.client = httpx.AsyncClient(
+            limits=self.limits,
+            timeout=self.timeout,
+            http2=http2,
+            event_hooks={"request": [self._on_request]},
+        )
+        logger.info(
+            f"Upstream HTTP client ready "
+            f"(max_connections={self.limits.max_connections}, http2={http2})"
+        )
+
+    async def close(self) -> None:
+        """Close the client and release pooled connections"""
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+            logger.info("Upstream HTTP client closed")
+
+    async def get(
+        self, url: str, params: Optional[Dict[str, Any]] = None
+    ) -> httpx.Response:
+        """Send a GET request through the shared pool"""
+        if self.client is None:
+            await self.connect()
+        assert self.client is not None
+        endpoint = url.rsplit("/", 1)[-1]
+        try:
+            with UPSTREAM_SECONDS.time(), profiled("upstream"):
+                response = await self.client.get(url, params=params)
+        except httpx.HTTPError as e:
+            UPSTREAM_RESPONSES.labels(endpoint, type(e).__name__).inc()
+            raise
+        UPSTREAM_RESPONSES.labels(endpoint, str(response.status_code)).inc()
+        return response
+
+    async def _on_request(self, request: httpx.Request) -> None:
+        """Count requests and attach a trace hook to observe new connections"""
+        self.requests_sent += 1
+        request.extensions["trace"] = self._trace
+
+    async def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        """httpcore trace callback, called for each connection lifecycle event"""
+        if event_name == "connection.connect_tcp.complete":
+            self.connections_opened += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Connection pool statistics for operators"""
+        idle = active = 0
+        if self.client is not None:
+            pool = getattr(self.client._transport, "_pool", None)
+            for connection in getattr(pool, "connections", []):
+                if connection.is_closed():
+                    continue
+                if connection.is_idle():
+                    idle += 1
+                else:
+                    active += 1
+
+        reused = max(self.requests_sent - self.connections_opened, 0)
+        return {
+            "idle_connections": idle,
+            "active_connections": active,
+            "requests_sent": self.requests_sent,
+            "connections_opened": self.connections_opened,
+            "reuse_ratio": (
+                round(reused / self.requests_sent, 4) if self.requests_sent else 0.0
+            ),
+        }
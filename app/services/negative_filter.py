@@ -0,0 +1,169 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.redis_service import RedisService
+
+logger = logging.getLogger("weatherpy")
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings.
+
+    Bits are numbered like Redis SETBIT (most significant bit of byte 0
+    first), so a bitmap built with SETBIT can be merged in directly.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        """Size the filter for ``capacity`` items at ``error_rate``"""
+        bits = -capacity * math.log(error_rate) / math.log(2) ** 2
+        self.size = max(64, math.ceil(bits / 8) * 8)
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray(self.size // 8)
+
+    def positions(self, item: str) -> List[int]:
+        """Bit positions of ``item`` (double hashing)"""
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "big")
+        step = int.from_bytes(digest[8:], "big") | 1
+        return [(first + i * step) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> List[int]:
+        """Add ``item``; returns the positions set"""
+        positions = self.positions(item)
+        for position in positions:
+            self.bits[position >> 3] |= 0x80 >> (position & 7)
+        return positions
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[position >> 3] & (0x80 >> (position & 7))
+            for position in self.positions(item)
+        )
+
+    def merge(self, bitmap: bytes) -> None:
+        """OR in a bitmap built with the same size and hashes"""
+        # One big-integer OR is far cheaper than a Python loop over bytes
+        size = len(self.bits)
+        merged = int.from_bytes(self.bits, "big") | int.from_bytes(
+            bitmap[:size].ljust(size, b"\0"), "big"
+        )
+        self.bits[:] = merged.to_bytes(size, "big")
+
+
+class NegativeFilter:
+    """
+    Cache keys known to be invalid, shared by every worker through Redis.
+
+    Each worker keeps Bloom filters in memory and checks them before any
+    Redis or upstream work. New keys are set in a Redis bitmap with SETBIT,
+    so concurrent workers never overwrite each other's bits, and the shared
+    bitmap is merged back in every NEGATIVE_FILTER_SYNC_INTERVAL. A new
+    generation starts every NEGATIVE_CACHE_TTL seconds and the previous one
+    is still consulted, so entries age out after one to two TTLs, close to
+    the cached 404 they stand in front of.
+    """
+
+    def __init__(self, redis_service: RedisService, prefix: str = "negative"):
+        """Initialize empty filters from settings"""
+        self.redis_service = redis_service
+        self.prefix = prefix
+        self.enabled = settings.NEGATIVE_FILTER_ENABLED
+        self.rotate = max(settings.NEGATIVE_CACHE_TTL, 1)
+        self.filters: Dict[int, BloomFilter] = {}
+        self.added = 0
+        self.syncs = 0
+        self._pending: List[Tuple[int, List[int]]] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Load the shared filters and keep them in sync"""
+        if not self.enabled:
+            return
+        await self.sync()
+        self._task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self) -> None:
+        """Stop syncing, pushing any keys not yet shared"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self.sync()
+
+    def __contains__(self, key: str) -> bool:
+        return self.enabled and any(key in bloom for bloom in self.filters.values())
+
+    def add(self, key: str) -> None:
+        """Remember ``key`` as invalid here and, at the next sync, everywhere"""
+        if not self.enabled:
+            return
+        generation = self._rotate()
+        self._pending.append((generation, self.filters[generation].add(key)))
+        self.added += 1
+
+    def _rotate(self) -> int:
+        """Current generation; keeps filters for it and the previous one only"""
+        generation = int(time.time() // self.rotate)
+        if generation not in self.filters:
+            for g in (generation - 1, generation):
+                if g not in self.filters:
+                    self.filters[g] = BloomFilter(
+                        settings.NEGATIVE_FILTER_CAPACITY,
+                        settings.NEGATIVE_FILTER_ERROR_RATE,
+                    )
+            for old in [g for g in self.filters if g < generation - 1]:
+                del self.filters[old]
+        return generation
+
+    def _key(self, generation: int) -> str:
+        return f"{self.prefix}:filter:{generation}"
+
+    async def sync(self) -> None:
+        """Push locally added bits and merge in the shared bitmaps"""
+        client = self.redis_service.redis_client
+        if client is None:
+            return
+        generation = self._rotate()
+        pending, self._pending = self._pending, []
+        generations = [generation, generation - 1]
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                for pending_generation, positions in pending:
+                    key = self._key(pending_generation)
+                    for position in positions:
+                        pipe.setbit(key, position, 1)
+                    pipe.expire(key, self.rotate * 2)
+                for g in generations:
+                    pipe.get(self._key(g))
+                results = await self.redis_service._call(pipe.execute())
+        except Exception as e:
+            self.redis_service._failed("syncing negative filter with", e)
+            self._pending = pending + self._pending
+            return
+
+        for g, bitmap in zip(generations, results[len(results) - len(generations) :]):
+            if bitmap:
+                self.filters[g].merge(bitmap)
+        self.syncs += 1
+
+    async def _sync_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.NEGATIVE_FILTER_SYNC_INTERVAL)
+            await self.sync()
+
+    def stats(self) -> Dict[str, Any]:
+        """Filter size and sync counters"""
+        return {
+            "enabled": self.enabled,
+            "generations": len(self.filters),
+            "added": self.added,
+            "pending": len(self._pending),
+            "syncs": self.syncs,
+        }
@@ -0,0 +1,224 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set
+
+from app.core.config import settings
+from app.services.redis_service import RedisService
+from app.services.weather_service import WeatherService
+
+logger = logging.getLogger("weatherpy")
+
+LEADER_LOCK = "prewarm:leader"
+HITS_KEY = "prewarm:hits"
+# Visit each hot key a little more often than the soft TTL, so every entry
+# is refreshed before it goes stale
+CYCLE_FRACTION = 0.8
+
+
+class PrewarmScheduler:
+    """
+    Keeps hot cache keys warm by refreshing them ahead of expiry.
+
+    The hot set is the configured PREWARM_CITIES plus the PREWARM_TOP_N most
+    requested keys, learned from hit counts every replica flushes to Redis.
+    Only the replica holding the leader lock refreshes; it visits each hot
+    key once per cycle at an even interval, so refreshes never burst.
+    """
+
+    def __init__(self, weather_service: WeatherService, redis_service: RedisService):
+        """Initialize the scheduler"""
+        self.weather_service = weather_service
+        self.redis_service = redis_service
+        self.enabled = settings.PREWARM_ENABLED
+        self.lease = settings.PREWARM_LEADER_TTL
+        self.is_leader = False
+        self.refreshed = 0
+        self.skipped = 0
+        self.failed = 0
+        self._token: Optional[str] = None
+        self._renewed = 0.0
+        self._tasks: List[asyncio.Task] = []
+        self._refreshes: Set[asyncio.Task] = set()
+
+    async def start(self) -> None:
+        """Start flushing hit counts and competing for leadership"""
+        if not self.enabled:
+            return
+        self._tasks = [
+            asyncio.create_task(self._flush_loop()),
+            asyncio.create_task(self._leader_loop()),
+        ]
+        logger.info("Cache pre-warm scheduler started")
+
+    async def stop(self) -> None:
+        """Stop the scheduler and give up leadership"""
+        tasks = self._tasks + list(self._refreshes)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        if self._token is not None:
+            await self.redis_service.release_lock(LEADER_LOCK, self._token)
+            self._token = None
+        self.is_leader = False
+
+    async def hot_keys(self) -> List[str]:
+        """Configured keys first, then the most requested ones"""
+        configured = [
+            self.weather_service.cache_key(kind, city)
+            for kind in settings.PREWARM_KINDS
+            for city in settings.PREWARM_CITIES
+        ]
+        learned = await self._top_keys(settings.PREWARM_TOP_N)
+        return list(dict.fromkeys(configured + learned))
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.PREWARM_FLUSH_INTERVAL)
+            await self.flush_hits()
+
+    async def flush_hits(self) -> None:
+        """Add this worker's hit counts to the shared per-window counts"""
+        hits: Counter = self.weather_service.key_hits
+        self.weather_service.key_hits = Counter()
+        hub = self.weather_service.hub
+        if hub is not None:
+            # Subscribers are waiting on these keys, so keep them refreshed
+            hits.update(hub.counts())
+        client = self.redis_service.redis_client
+        if not hits or client is None:
+            return
+
+        key = self._window_key(0)
+        try:
+            async with client.pipeline(transaction=False) as pipe:
+                for cache_key, count in hits.items():
+                    pipe.zincrby(key, count, cache_key)
+                pipe.expire(key, settings.PREWARM_HIT_WINDOW * 2)
+                await self.redis_service._call(pipe.execute())
+        except Exception as e:
+            self.redis_service._failed("flushing pre-warm hit counts to", e)
+
+    async def _top_keys(self, limit: int) -> List[str]:
+        """Most requested keys over the current and previous windows"""
+        client = self.redis_service.redis_client
+        if limit <= 0 or client is None:
+            return []
+
+        totals: Counter = Counter()
+        try:
+            for window in (0, -1):
+                ranked = await self.redis_service._call(
+                    client.zrevrange(
+                        self._window_key(window), 0, limit - 1, withscores=True
+                    )
+                )
+                for member, score in ranked:
+                    totals[member.decode()] += score
+        except Exception as e:
+            self.redis_service._failed("reading pre-warm hit counts from", e)
+        return [cache_key for cache_key, _ in totals.most_common(limit)]
+
+    @staticmethod
+    def _window_key(offset: int) -> str:
+        window = int(time.time() // settings.PREWARM_HIT_WINDOW) + offset
+        return f"{HITS_KEY}:{window}"
+
+    async def _leader_loop(self) -> None:
+        while True:
+            # Strict: with Redis down every replica would otherwise lead
+            token = await self.redis_service.acquire_lock(
+                LEADER_LOCK, self.lease, fail_open=False
+            )
+            if token is None:
+                await asyncio.sleep(self.lease / 2)
+                continue
+
+            self._token = token
+            self.is_leader = True
+            logger.info("Acquired pre-warm leadership")
+            try:
+                await self._lead()
+            except Exception:
+                logger.exception("Pre-warm cycle failed")
+            finally:
+                self.is_leader = False
+                self._token = None
+                await self.redis_service.release_lock(LEADER_LOCK, token)
+            await asyncio.sleep(self.lease / 2)
+
+    async def _lead(self) -> None:
+        """Refresh hot keys, one every cycle/len(hot) seconds, while leader"""
+        semaphore = asyncio.Semaphore(settings.PREWARM_CONCURRENCY)
+        cycle = settings.REDIS_CACHE_TTL * CYCLE_FRACTION
+        self._renewed = asyncio.get_running_loop().time()
+
+        while True:
+            hot = await self.hot_keys()
+            if not hot:
+                if not await self._hold_leadership(cycle):
+                    return
+                continue
+
+            interval = cycle / len(hot)
+            for cache_key in hot:
+                if await self._needs_refresh(cache_key, cycle):
+                    await semaphore.acquire()
+                    task = asyncio.create_task(self._refresh(cache_key))
+                    self._refreshes.add(task)
+                    task.add_done_callback(self._refreshes.discard)
+                    task.add_done_callback(lambda _: semaphore.release())
+
+                if not await self._hold_leadership(interval):
+                    return
+
+    async def _hold_leadership(self, seconds: float) -> bool:
+        """Wait ``seconds`` while renewing the leader lease; False if lost"""
+        loop = asyncio.get_running_loop()
+        end = loop.time() + seconds
+        while True:
+            if loop.time() - self._renewed >= self.lease / 3:
+                assert self._token is not None
+                if not await self.redis_service.extend_lock(
+                    LEADER_LOCK, self._token, self.lease, fail_open=False
+                ):
+                    logger.info("Lost pre-warm leadership")
+                    return False
+                self._renewed = loop.time()
+
+            remaining = end - loop.time()
+            if remaining <= 0:
+                return True
+            await asyncio.sleep(min(remaining, self.lease / 3))
+
+    async def _needs_refresh(self, cache_key: str, horizon: float) -> bool:
+        """Whether the entry is missing or goes stale before the next visit"""
+        entry = await self.weather_service.cache.peek(cache_key)
+        if entry is not None and entry.fresh_until - time.time() > horizon:
+            self.skipped += 1
+            return False
+        return True
+
+    async def _refresh(self, cache_key: str) -> None:
+        try:
+            result = await self.weather_service.refresh(cache_key)
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"Pre-warm refresh failed for {cache_key}: {e}")
+            return
+        if result.get("success", True):
+            self.refreshed += 1
+        else:
+            self.failed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Scheduler counters"""
+        return {
+            "enabled": self.enabled,
+            "leader": self.is_leader,
+            "refreshed": self.refreshed,
+            "skipped": self.skipped,
+            "failed": self.failed,
+        }
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.redis_service import RedisService
+
+logger = logging.getLogger("weatherpy")
+
+# Atomically refill and take one token from every bucket, or none at all.
+# KEYS: bucket hashes. ARGV[1]: now in ms, then capacity and refill rate
+# (tokens per ms) for each bucket. Returns {allowed, wait_ms, remaining...}.
+TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local wait = 0
+local tokens = {}
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    local state = redis.call("HMGET", KEYS[i], "tokens", "ts")
+    local available = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    available = math.min(capacity, available + math.max(now - ts, 0) * rate)
+    tokens[i] = available
+    if available < 1 then
+        wait = math.max(wait, math.ceil((1 - available) / rate))
+    end
+end
+
+local result = {0, wait}
+if wait == 0 then
+    result[1] = 1
+end
+for i = 1, #KEYS do
+    local capacity = tonumber(ARGV[i * 2])
+    local rate = tonumber(ARGV[i * 2 + 1])
+    if wait == 0 then
+        tokens[i] = tokens[i] - 1
+        redis.call("HSET", KEYS[i], "tokens", tokens[i], "ts", now)
+        redis.call("PEXPIRE", KEYS[i], math.ceil(capacity / rate))
+    end
+    result[i + 2] = math.floor(tokens[i])
+end
+return result
+"""
+
+
+class TokenBucket:
+    """In-process token bucket, used when Redis is unavailable"""
+
+    def __init__(self, capacity: int, period: float):
+        """Allow ``capacity`` calls per ``period`` seconds"""
+        self.capacity = capacity
+        self.rate = capacity / period  # tokens per second
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def refill(self) -> float:
+        """Add tokens earned since the last call and return the balance"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+    def wait_time(self) -> float:
+        """Seconds until one token is available"""
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """
+    Quota governor for upstream API calls.
+
+    Enforces a calls-per-minute and a calls-per-day budget as token buckets
+    shared by every worker and replica through Redis. The daily budget
+    refills continuously rather than resetting at midnight. If Redis is
+    unreachable each worker falls back to its own buckets.
+    """
+
+    def __init__(self, redis_service: RedisService, prefix: str = "{ratelimit:owm}"):
+        """
+        Initialize budgets from settings.
+
+        The braces in ``prefix`` are a Redis Cluster hash tag: both bucket
+        keys hash to one slot, so the script can update them atomically.
+        """
+        self.redis_service = redis_service
+        self.enabled = settings.RATE_LIMIT_ENABLED
+        self.max_wait = settings.RATE_LIMIT_MAX_WAIT
+        self.buckets: List[Tuple[str, int, float]] = [
+            (f"{prefix}:minute", settings.RATE_LIMIT_PER_MINUTE, 60.0),
+            (f"{prefix}:day", settings.RATE_LIMIT_PER_DAY, 86400.0),
+        ]
+        self.local = [TokenBucket(limit, period) for _, limit, period in self.buckets]
+        self.remaining: List[Optional[int]] = [None] * len(self.buckets)
+        self.allowed = 0
+        self.queued = 0
+        self.rejected = 0
+        self.local_fallback = False
+
+    async def acquire(self, max_wait: Optional[float] = None) -> bool:
+        """
+        Take one call from every budget, queueing up to ``max_wait`` seconds.
+
+        Returns False if the budget does not free up before the deadline.
+        """
+        if not self.enabled:
+            return True
+
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+        waited = False
+        while True:
+            wait = await self._try_acquire()
+            if wait == 0:
+                self.allowed += 1
+                return True
+            if time.monotonic() + wait > deadline:
+                self.rejected += 1
+                logger.warning("Upstream rate limit reached")
+                return False
+            if not waited:
+                self.queued += 1
+                waited = True
+            await asyncio.sleep(wait)
+
+    async def _try_acquire(self) -> float:
+        """Try to take a token; return 0 on success or seconds to wait"""
+        client = self.redis_service.redis_client
+        if client is not None:
+            args: List[Any] = [int(time.time() * 1000)]
+            for _, limit, period in self.buckets:
+                args.extend([limit, limit / (period * 1000)])
+            try:
+                result = await self.redis_service._call(
+                    client.eval(
+                        TOKEN_BUCKET_SCRIPT,
+                        len(self.buckets),
+                        *(key for key, _, _ in self.buckets),
+                        *args,
+                    )
+                )
+            except Exception as e:
+                self.redis_service._failed("running rate limiter in", e)
+            else:
+                if self.local_fallback:
+                    self.local_fallback = False
+                    logger.info("Rate limiter is using the shared buckets again")
+                self.remaining = [int(tokens) for tokens in result[2:]]
+                return 0.0 if result[0] == 1 else int(result[1]) / 1000
+
+        if not self.local_fallback:
+            # Once per outage, not on every upstream call
+            self.local_fallback = True
+            logger.warning("Rate limiter unavailable, using local buckets")
+        return self._try_acquire_local()
+
+    def _try_acquire_local(self) -> float:
+        tokens = [bucket.refill() for bucket in self.local]
+        if all(balance >= 1 for balance in tokens):
+            for bucket in self.local:
+                bucket.tokens -= 1
+            self.remaining = [int(bucket.tokens) for bucket in self.local]
+            return 0.0
+        self.remaining = [int(balance) for balance in tokens]
+        return max(bucket.wait_time() for bucket in self.local)
+
+    def stats(self) -> Dict[str, Any]:
+        """Remaining quota and throttling counters"""
+        return {
+            "enabled": self.enabled,
+            "minute_remaining": self.remaining[0],
+            "day_remaining": self.remaining[1],
+            "allowed": self.allowed,
+            "queued": self.queued,
+            "rejected": self.rejected,
+        }
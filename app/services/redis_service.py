@@ -1,76 +1,436 @@
-import json
+import asyncio
 import logging
-from typing import Any, Optional
+import random
+import uuid
+from typing import (
+    Any,
+    Awaitable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 import redis.asyncio as redis
+from redis.asyncio.cluster import RedisCluster
+from redis.asyncio.sentinel import Sentinel
 
 from app.core.config import settings
+from app.core.metrics import CACHE_REQUESTS, STAGE_SECONDS
+from app.core.profiling import profiled
+from app.services.codec import CacheCodec
 
 logger = logging.getLogger("weatherpy")
 
+REDIS_GET_SECONDS = STAGE_SECONDS.labels("redis_get")
+REDIS_ERRORS = CACHE_REQUESTS.labels("l2", "error")
+
+T = TypeVar("T")
+
+
+def sibling_key(key: str, suffix: str) -> str:
+    """Key of raw bytes stored next to ``key``, e.g. a compressed body"""
+    return f"{key}|{suffix}"
+
+
+# Delete a lock only if it is still held by the caller's token
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+# Extend a lock only if it is still held by the caller's token
+EXTEND_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
 
 class RedisService:
-    """Service for interacting with Redis cache"""
+    """
+    Service for interacting with Redis cache.
+
+    ``redis_client`` is None whenever Redis is unreachable, so callers skip
+    it instead of waiting on timeouts; a background task reconnects with
+    exponential backoff. Cache calls are bounded by
+    REDIS_OPERATION_DEADLINE and count as misses when it passes, so a slow
+    Redis costs less than going straight to the upstream.
+    """
 
     def __init__(self):
         """Initialize Redis connection"""
-        self.redis_client = None
+        self.redis_client: Optional[Any] = None
         self.host = settings.REDIS_HOST
         self.port = settings.REDIS_PORT
         self.password = settings.REDIS_PASSWORD
         self.db = settings.REDIS_DB
+        self.mode = settings.REDIS_MODE
         self.ttl = settings.REDIS_CACHE_TTL
+        self.deadline = settings.REDIS_OPERATION_DEADLINE
+        self.codec = CacheCodec(
+            settings.CACHE_CODEC, settings.CACHE_COMPRESSION_THRESHOLD
+        )
+        self.available = asyncio.Event()
+        self.reconnects = 0
+        self.errors = 0
+        self.deadline_exceeded = 0
+        self._client: Optional[Any] = None
+        self._reconnect_task: Optional[asyncio.Task] = None
 
-    async def connect(self) -> None:
-        """Connect to Redis server"""
-        try:
-            logger.info(f"Connecting to Redis at {self.host}:{self.port}")
-            self.redis_client = redis.Redis(
+    def _create_client(self) -> Any:
+        """Build the client for the configured mode; connects lazily"""
+        options: Dict[str, Any] = {
+            "password": self.password,
+            "socket_timeout": settings.REDIS_SOCKET_TIMEOUT,
+            "socket_connect_timeout": settings.REDIS_CONNECT_TIMEOUT,
+            "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL,
+            "decode_responses": False,  # values are codec-framed bytes
+        }
+        if self.mode == "cluster":
+            return RedisCluster(
                 host=self.host,
                 port=self.port,
-                password=self.password,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                **options,
+            )
+        if self.mode == "sentinel":
+            sentinels = []
+            for address in settings.REDIS_SENTINELS:
+                host, _, port = address.rpartition(":")
+                sentinels.append((host, int(port)))
+            sentinel = Sentinel(
+                sentinels,
+                socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+            )
+            return sentinel.master_for(
+                settings.REDIS_SENTINEL_MASTER,
                 db=self.db,
-                decode_responses=True,
+                max_connections=settings.REDIS_MAX_CONNECTIONS,
+                **options,
             )
+        pool = redis.BlockingConnectionPool(
+            host=self.host,
+            port=self.port,
+            db=self.db,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            timeout=settings.REDIS_POOL_TIMEOUT,
+            **options,
+        )
+        return redis.Redis(connection_pool=pool)
+
+    async def connect(self) -> None:
+        """Connect to Redis server"""
+        logger.info(f"Connecting to Redis ({self.mode}) at {self.host}:{self.port}")
+        self._client = self._create_client()
+        try:
             # Test connection
-            await self.redis_client.ping()
-            logger.info("Successfully connected to Redis")
-        except redis.ConnectionError as e:
+            await asyncio.wait_for(
+                self._client.ping(), settings.REDIS_CONNECT_TIMEOUT * 2
+            )
+        except Exception as e:
             logger.error(f"Failed to connect to Redis: {e}")
             # Don't raise here - service should work without cache
+            self._mark_down()
+            return
+        self.redis_client = self._client
+        self.available.set()
+        logger.info("Successfully connected to Redis")
 
     async def close(self) -> None:
         """Close Redis connection"""
-        if self.redis_client:
-            await self.redis_client.close()
+        if self._reconnect_task is not None:
+            self._reconnect_task.cancel()
+            await asyncio.gather(self._reconnect_task, return_exceptions=True)
+            self._reconnect_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = self.redis_client = None
+            self.available.clear()
             logger.info("Redis connection closed")
 
+    def _mark_down(self) -> None:
+        """Stop using Redis and reconnect in the background"""
+        self.redis_client = None
+        self.available.clear()
+        if self._reconnect_task is None or self._reconnect_task.done():
+            self._reconnect_task = asyncio.create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        """Ping with jittered exponential backoff until Redis answers"""
+        assert self._client is not None
+        delay = settings.REDIS_RECONNECT_MIN_DELAY
+        while True:
+            await asyncio.sleep(random.uniform(delay / 2, delay))
+            try:
+                await asyncio.wait_for(
+                    self._client.ping(), settings.REDIS_CONNECT_TIMEOUT * 2
+                )
+            except Exception as e:
+                logger.debug("Redis reconnect failed: %s", e)
+                delay = min(delay * 2, settings.REDIS_RECONNECT_MAX_DELAY)
+                continue
+            self.reconnects += 1
+            self.redis_client = self._client
+            self.available.set()
+            logger.info("Reconnected to Redis")
+            return
+
+    async def _call(self, operation: Awaitable[T]) -> T:
+        """Run a cache operation within the operation deadline"""
+        with profiled("redis"):
+            return await asyncio.wait_for(operation, self.deadline)
+
+    def _failed(self, action: str, error: Exception) -> None:
+        """Count a failed call; connection errors take Redis out of use"""
+        self.errors += 1
+        if isinstance(error, asyncio.TimeoutError):
+            self.deadline_exceeded += 1
+            logger.warning(f"Redis {action} exceeded {self.deadline}s deadline")
+            return
+        logger.error(f"Error {action} Redis cache: {error}")
+        if isinstance(error, redis.ConnectionError) and self.redis_client is not None:
+            logger.warning("Redis connection lost, reconnecting in the background")
+            self._mark_down()
+
     async def get(self, key: str) -> Optional[Any]:
         """Get value from Redis cache"""
         if not self.redis_client:
             return None
 
         try:
-            value = await self.redis_client.get(key)
+            with REDIS_GET_SECONDS.time():
+                value = await self._call(self.redis_client.get(key))
             if value:
-                logger.debug(f"Cache hit for key: {key}")
-                return json.loads(value)
-            logger.debug(f"Cache miss for key: {key}")
+                logger.debug("Cache hit for key: %s", key)
+                return self._decode(key, value)
+            logger.debug("Cache miss for key: %s", key)
             return None
         except Exception as e:
-            logger.error(f"Error getting from Redis cache: {e}")
+            REDIS_ERRORS.inc()
+            self._failed("getting from", e)
             return None
 
-    async def set(self, key: str, value: Any) -> bool:
-        """Set value in Redis cache with TTL"""
+    def _decode(self, key: str, value: bytes) -> Optional[Any]:
+        """Decode a stored value, treating unreadable entries as misses"""
+        try:
+            return self.codec.decode(value)
+        except Exception as e:
+            logger.error(f"Error decoding cached key {key}: {e}")
+            return None
+
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """Set value in Redis cache with TTL (defaults to REDIS_CACHE_TTL)"""
+        if not self.redis_client:
+            return False
+
+        ttl = ttl or self.ttl
+        try:
+            serialized_value = self.codec.encode(value)
+            await self._call(self.redis_client.set(key, serialized_value, ex=ttl))
+            logger.debug("Cached key: %s with TTL: %ss", key, ttl)
+            return True
+        except Exception as e:
+            self._failed("setting", e)
+            return False
+
+    async def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get many values from Redis cache in one round trip"""
+        if not self.redis_client or not keys:
+            return [None] * len(keys)
+
+        try:
+            values = await self._mget(keys)
+            return [
+                self._decode(key, value) if value else None
+                for key, value in zip(keys, values)
+            ]
+        except Exception as e:
+            REDIS_ERRORS.inc()
+            self._failed("getting many from", e)
+            return [None] * len(keys)
+
+    async def get_with_siblings(
+        self, keys: List[str], suffixes: Sequence[str]
+    ) -> List[Tuple[Optional[Any], Dict[str, bytes]]]:
+        """
+        Get many values together with their sibling keys, in one round trip.
+
+        Each result pairs the decoded value with the raw bytes found under
+        ``sibling_key(key, suffix)`` for each suffix.
+        """
+        empty: List[Tuple[Optional[Any], Dict[str, bytes]]] = [(None, {})] * len(keys)
+        if not self.redis_client or not keys:
+            return empty
+
+        stride = len(suffixes) + 1
+        wanted = []
+        for key in keys:
+            wanted.append(key)
+            wanted.extend(sibling_key(key, suffix) for suffix in suffixes)
+        try:
+            values = await self._mget(wanted)
+        except Exception as e:
+            REDIS_ERRORS.inc()
+            self._failed("getting many from", e)
+            return empty
+
+        results = []
+        for index, key in enumerate(keys):
+            value, *siblings = values[index * stride : (index + 1) * stride]
+            results.append(
+                (
+                    self._decode(key, value) if value else None,
+                    {s: raw for s, raw in zip(suffixes, siblings) if raw is not None},
+                )
+            )
+        return results
+
+    async def _mget(self, keys: List[str]) -> List[Optional[bytes]]:
+        """
+        Raw values of ``keys`` in one round trip.
+
+        Uses MGET, or per-slot MGETs in cluster mode where keys may live on
+        different nodes.
+        """
+        with REDIS_GET_SECONDS.time():
+            if self.mode == "cluster":
+                return await self._call(self.redis_client.mget_nonatomic(keys))
+            return await self._call(self.redis_client.mget(keys))
+
+    async def set_many(
+        self,
+        mapping: Dict[str, Any],
+        ttl: Optional[int] = None,
+        siblings: Optional[Dict[str, Dict[str, Optional[bytes]]]] = None,
+    ) -> bool:
+        """
+        Set many values with TTL in one pipelined round trip.
+
+        ``siblings`` maps a key to raw bytes stored under its sibling keys
+        with the same TTL; a None value deletes that sibling.
+        """
+        if not self.redis_client or not mapping:
+            return False
+
+        ttl = ttl or self.ttl
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for key, value in mapping.items():
+                    pipe.set(key, self.codec.encode(value), ex=ttl)
+                for key, raw_values in (siblings or {}).items():
+                    for suffix, raw in raw_values.items():
+                        if raw is None:
+                            pipe.delete(sibling_key(key, suffix))
+                        else:
+                            pipe.set(sibling_key(key, suffix), raw, ex=ttl)
+                await self._call(pipe.execute())
+            logger.debug("Cached %d keys with TTL: %ss", len(mapping), ttl)
+            return True
+        except Exception as e:
+            self._failed("setting many in", e)
+            return False
+
+    async def delete(self, *keys: str) -> bool:
+        """Delete keys from Redis cache"""
+        if not self.redis_client:
+            return False
+
+        try:
+            await self._call(self.redis_client.delete(*keys))
+            return True
+        except Exception as e:
+            self._failed("deleting from", e)
+            return False
+
+    async def publish(self, channel: str, message: Union[str, bytes]) -> bool:
+        """Publish a message on a Redis pub/sub channel"""
         if not self.redis_client:
             return False
 
         try:
-            serialized_value = json.dumps(value)
-            await self.redis_client.set(key, serialized_value, ex=self.ttl)
-            logger.debug(f"Cached key: {key} with TTL: {self.ttl}s")
+            await self._call(self.redis_client.publish(channel, message))
             return True
         except Exception as e:
-            logger.error(f"Error setting Redis cache: {e}")
+            self._failed(f"publishing to channel {channel} of", e)
             return False
+
+    async def acquire_lock(
+        self, name: str, ttl: float, fail_open: bool = True
+    ) -> Optional[str]:
+        """
+        Try to take a short-lived lock.
+
+        Returns the lock token when acquired, or None if another holder has
+        it. By default fails open: if Redis is down or errors, a token is
+        returned so the caller proceeds as if it held the lock. Callers that
+        must never run concurrently pass ``fail_open=False`` to get None.
+        """
+        token = uuid.uuid4().hex
+        if not self.redis_client:
+            return token if fail_open else None
+
+        try:
+            acquired = await self._call(
+                self.redis_client.set(name, token, nx=True, px=int(ttl * 1000))
+            )
+            return token if acquired else None
+        except Exception as e:
+            self._failed("acquiring lock in", e)
+            return token if fail_open else None
+
+    async def release_lock(self, name: str, token: str) -> None:
+        """Release a lock taken with acquire_lock"""
+        if not self.redis_client:
+            return
+
+        try:
+            await self._call(
+                self.redis_client.eval(RELEASE_LOCK_SCRIPT, 1, name, token)
+            )
+        except Exception as e:
+            self._failed("releasing lock in", e)
+
+    async def extend_lock(
+        self, name: str, token: str, ttl: float, fail_open: bool = True
+    ) -> bool:
+        """
+        Renew a lock taken with acquire_lock; False if it is no longer held.
+
+        Like acquire_lock, an unreachable Redis counts as still held unless
+        ``fail_open`` is False.
+        """
+        if not self.redis_client:
+            return fail_open
+
+        try:
+            extended = await self._call(
+                self.redis_client.eval(
+                    EXTEND_LOCK_SCRIPT, 1, name, token, int(ttl * 1000)
+                )
+            )
+            return bool(extended)
+        except Exception as e:
+            self._failed("extending lock in", e)
+            return fail_open
+
+    def stats(self) -> Dict[str, Any]:
+        """Connection state, pool usage and error counters"""
+        pool = getattr(self._client, "connection_pool", None)
+        return {
+            "mode": self.mode,
+            "available": self.redis_client is not None,
+            "idle_connections": len(getattr(pool, "_available_connections", ())),
+            "active_connections": len(getattr(pool, "_in_use_connections", ())),
+            "reconnects": self.reconnects,
+            "errors": self.errors,
+            "deadline_exceeded": self.deadline_exceeded,
+        }
@@ -0,0 +1,59 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List
+
+logger = logging.getLogger("weatherpy")
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into one in-flight call"""
+
+    def __init__(self):
+        """Initialize the in-flight call table"""
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run ``fn`` once per key at a time.
+
+        Callers arriving while a call for ``key`` is running wait for that
+        call's result instead of starting their own. The call runs in its own
+        task, so a cancelled caller does not cancel it for the others.
+        """
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            logger.debug("Coalesced request for key: %s", key)
+        else:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+
+        return await asyncio.shield(task)
+
+    def is_running(self, key: str) -> bool:
+        """Whether a call for ``key`` is in flight"""
+        return key in self._inflight
+
+    def tasks(self) -> List[asyncio.Task]:
+        """Calls currently in flight"""
+        return list(self._inflight.values())
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        """Drop a finished call so the next caller starts a fresh one"""
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> Dict[str, int]:
+        """Coalescing counters"""
+        return {
+            "in_flight": len(self._inflight),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional, Set
+
+from app.core.config import settings
+from app.services.codec import dumps_json
+from app.services.redis_service import RedisService
+
+logger = logging.getLogger("weatherpy")
+
+
+class Subscriber:
+    """
+    One connection's interest in a set of cache keys.
+
+    Updates wait in a bounded queue; a subscriber that lets it fill up is
+    dropped rather than buffered without limit. ``None`` in the queue tells
+    the connection it was dropped.
+    """
+
+    __slots__ = ("keys", "queue", "dropped")
+
+    def __init__(self, buffer: int):
+        self.keys: Set[str] = set()
+        self.queue: "asyncio.Queue[Optional[bytes]]" = asyncio.Queue(buffer + 1)
+        self.dropped = False
+
+    def offer(self, message: bytes) -> bool:
+        """Queue a message; False if the subscriber is too slow and dropped"""
+        if self.dropped:
+            return False
+        if self.queue.qsize() >= self.queue.maxsize - 1:
+            self.dropped = True
+            self.queue.put_nowait(None)
+            return False
+        self.queue.put_nowait(message)
+        return True
+
+
+class SubscriptionHub:
+    """
+    Fans refreshed cache entries out to subscribed connections.
+
+    A refresh is published once on SUBSCRIPTION_CHANNEL as the cache key
+    and the entry's stored JSON body. Every worker on every replica listens
+    and encodes the update once for all of its local subscribers to that
+    key, so idle connections cost a queue and a set entry each. Without
+    Redis pub/sub (outage or cluster mode) updates are delivered to this
+    worker's subscribers only.
+    """
+
+    def __init__(self, redis_service: RedisService):
+        """Initialize an empty hub"""
+        self.redis_service = redis_service
+        self.enabled = settings.SUBSCRIPTIONS_ENABLED
+        self.channel = settings.SUBSCRIPTION_CHANNEL
+        self.max_connections = settings.SUBSCRIPTION_MAX_CONNECTIONS
+        self.connections: Set[Subscriber] = set()
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        self._subscribers: Dict[str, Set[Subscriber]] = {}
+        self._listener: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Start listening for updates published by any worker"""
+        if self.enabled and self.redis_service.mode != "cluster":
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        """Stop listening and end every subscription"""
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+        for subscriber in list(self.connections):
+            subscriber.dropped = True
+            subscriber.queue.put_nowait(None)
+
+    def connect(self) -> Optional[Subscriber]:
+        """A new subscriber, or None when this worker is at its limit"""
+        if not self.enabled or len(self.connections) >= self.max_connections:
+            return None
+        subscriber = Subscriber(settings.SUBSCRIPTION_BUFFER)
+        self.connections.add(subscriber)
+        return subscriber
+
+    def disconnect(self, subscriber: Subscriber) -> None:
+        self.unsubscribe(subscriber, list(subscriber.keys))
+        self.connections.discard(subscriber)
+
+    def subscribe(self, subscriber: Subscriber, keys: Iterable[str]) -> None:
+        for key in keys:
+            subscriber.keys.add(key)
+            self._subscribers.setdefault(key, set()).add(subscriber)
+
+    def unsubscribe(self, subscriber: Subscriber, keys: Iterable[str]) -> None:
+        for key in keys:
+            subscriber.keys.discard(key)
+            subscribers = self._subscribers.get(key)
+            if subscribers is not None:
+                subscribers.discard(subscriber)
+                if not subscribers:
+                    del self._subscribers[key]
+
+    def counts(self) -> Counter:
+        """Subscribers per key, so pre-warming keeps these keys refreshed"""
+        return Counter({key: len(subs) for key, subs in self._subscribers.items()})
+
+    @staticmethod
+    def message(key: str, body: bytes) -> bytes:
+        """``{"key": .., "data": ..}`` built around already encoded JSON"""
+        return b'{"key":' + dumps_json(key) + b',"data":' + body + b"}"
+
+    async def publish(self, key: str, body: bytes) -> None:
+        """Announce a refreshed entry to subscribers on every replica"""
+        if not self.enabled:
+            return
+        self.published += 1
+        if self._listener is None or not await self.redis_service.publish(
+            self.channel, key.encode() + b"\n" + body
+        ):
+            self._deliver(key, body)
+
+    def _deliver(self, key: str, body: bytes) -> None:
+        """Hand an update to this worker's subscribers of ``key``"""
+        subscribers = self._subscribers.get(key)
+        if not subscribers:
+            return
+        message = self.message(key, body)
+        for subscriber in list(subscribers):
+            if subscriber.offer(message):
+                self.delivered += 1
+            else:
+                self.dropped += 1
+                logger.warning("Dropping slow subscriber")
+                self.disconnect(subscriber)
+
+    async def _listen(self) -> None:
+        """Deliver updates from the channel, resubscribing after Redis drops"""
+        while True:
+            await self.redis_service.available.wait()
+            client = self.redis_service.redis_client
+            if client is None:
+                continue
+            pubsub = client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        key, _, body = message["data"].partition(b"\n")
+                        self._deliver(key.decode(), body)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Subscription listener lost Redis: {e}")
+            finally:
+                await pubsub.aclose()
+            await asyncio.sleep(settings.REDIS_RECONNECT_MIN_DELAY)
+
+    def stats(self) -> Dict[str, Any]:
+        """Connection and delivery counters"""
+        return {
+            "connections": len(self.connections),
+            "keys": len(self._subscribers),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+        }
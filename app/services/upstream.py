@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.http_client import HTTPClientService
+from app.services.rate_limiter import RateLimiter
+
+logger = logging.getLogger("weatherpy")
+
+# Upstream statuses worth another attempt; other errors are the caller's
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+# Successful call latencies kept for the hedging percentile
+LATENCY_SAMPLES = 256
+
+Result = Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]
+
+
+class UpstreamClient:
+    """
+    OpenWeatherMap calls with budget, circuit breaker, retries and hedging.
+
+    Every attempt, including retries and hedges, takes a call from the rate
+    budget; only the first attempt may queue for it. Timeouts, 429 and 5xx
+    count as failures for the breaker and are retried with jittered
+    exponential backoff. While the breaker is open calls fail immediately,
+    so callers fall back to stale cache instead of waiting on timeouts.
+    """
+
+    def __init__(self, http_client: HTTPClientService, rate_limiter: RateLimiter):
+        """Initialize from settings"""
+        self.http_client = http_client
+        self.rate_limiter = rate_limiter
+        self.api_url = settings.OPENWEATHER_API_URL
+        self.breaker = CircuitBreaker(
+            "openweathermap",
+            window=settings.CIRCUIT_BREAKER_WINDOW,
+            min_calls=settings.CIRCUIT_BREAKER_MIN_CALLS,
+            failure_rate=settings.CIRCUIT_BREAKER_FAILURE_RATE,
+            open_seconds=settings.CIRCUIT_BREAKER_OPEN_SECONDS,
+            half_open_calls=settings.CIRCUIT_BREAKER_HALF_OPEN_CALLS,
+            enabled=settings.CIRCUIT_BREAKER_ENABLED,
+        )
+        self.retries = settings.UPSTREAM_RETRIES
+        self.hedge_enabled = settings.UPSTREAM_HEDGE_ENABLED
+        self.hedge_threshold = settings.UPSTREAM_HEDGE_THRESHOLD
+        self.retried = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self._p95 = 0.0
+
+    async def get_json(self, endpoint: str, params: Dict[str, Any]) -> Result:
+        """
+        GET ``endpoint`` and decode its JSON body.
+
+        Returns ``(data, None)`` on success or ``(None, error)`` with an
+        error dict in the usual ``success``/``error``/``status_code`` shape.
+        """
+        url = f"{self.api_url}/{endpoint}"
+        error: Dict[str, Any] = {}
+        for attempt in range(self.retries + 1):
+            if attempt:
+                self.retried += 1
+                await asyncio.sleep(self._backoff(attempt))
+
+            if not self.breaker.allow():
+                return None, error or self._unavailable()
+            try:
+                if not await self.rate_limiter.acquire(None if attempt == 0 else 0):
+                    self.breaker.cancel()
+                    return None, error or self._rate_limited()
+                response = await self._send(url, params)
+            except httpx.HTTPError as e:
+                logger.warning(f"Upstream {endpoint} attempt {attempt + 1} failed: {e}")
+                self.breaker.record_failure()
+                error = self._transport_error(e)
+                continue
+            except BaseException:
+                # Cancelled or failed without an outcome: give the call back,
+                # or a half-open breaker would be left waiting on its probe
+                self.breaker.cancel()
+                raise
+
+            if response.status_code == 200:
+                try:
+                    data = response.json()
+                except ValueError:
+                    logger.error(f"OpenWeatherMap returned invalid JSON for {endpoint}")
+                    self.breaker.record_failure()
+                    error = self._error(502, "Invalid response from upstream")
+                    continue
+                self.breaker.record_success()
+                return data, None
+
+            logger.error(f"OpenWeatherMap API error: {response.text}")
+            error = self._error_result(response)
+            if response.status_code not in RETRYABLE_STATUS:
+                # The upstream is healthy; the request itself was rejected
+                self.breaker.record_success()
+                return None, error
+            self.breaker.record_failure()
+
+        return None, error
+
+    async def _send(self, url: str, params: Dict[str, Any]) -> httpx.Response:
+        """One attempt, hedged with a second request if it is slow"""
+        started = time.monotonic()
+        if not self.hedge_enabled:
+            response = await self.http_client.get(url, params=params)
+            self._observe(time.monotonic() - started)
+            return response
+
+        first = asyncio.create_task(self.http_client.get(url, params=params))
+        done, _ = await asyncio.wait({first}, timeout=self._hedge_delay())
+        if done or not await self.rate_limiter.acquire(0):
+            response = await first
+            self._observe(time.monotonic() - started)
+            return response
+
+        self.hedged += 1
+        hedge = asyncio.create_task(self.http_client.get(url, params=params))
+        pending = {first, hedge}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        self._observe(time.monotonic() - started)
+                        return task.result()
+            # Both attempts failed; surface the last error
+            raise done.pop().exception()  # type: ignore[misc]
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _hedge_delay(self) -> float:
+        """Hedge once a call outlasts the threshold and the observed p95"""
+        return max(self.hedge_threshold, self._p95)
+
+    def _observe(self, seconds: float) -> None:
+        self._latencies.append(seconds)
+        # Recompute the percentile every few samples rather than every call
+        if len(self._latencies) % 16 == 0 or not self._p95:
+            ranked = sorted(self._latencies)
+            self._p95 = ranked[int(len(ranked) * 0.95) - 1 if len(ranked) > 1 else 0]
+
+    @staticmethod
+    def _backoff(attempt: int) -> float:
+        """Full-jitter exponential backoff before retry ``attempt``"""
+        ceiling = min(
+            settings.UPSTREAM_RETRY_MAX_BACKOFF,
+            settings.UPSTREAM_RETRY_BACKOFF * 2 ** (attempt - 1),
+        )
+        return random.uniform(0, ceiling)
+
+    @staticmethod
+    def _error(status_code: int, message: str) -> Dict[str, Any]:
+        return {"success": False, "error": message, "status_code": status_code}
+
+    def _error_result(self, response: httpx.Response) -> Dict[str, Any]:
+        """Error dict for a non-200 response, whether or not its body is JSON"""
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+        if isinstance(body, dict) and body.get("message"):
+            message = str(body["message"])
+        else:
+            message = response.text[:200].strip() or response.reason_phrase
+        return self._error(response.status_code, message or "Unknown error")
+
+    def _transport_error(self, error: httpx.HTTPError) -> Dict[str, Any]:
+        if isinstance(error, httpx.TimeoutException):
+            return self._error(504, "Upstream request timed out")
+        return self._error(502, "Upstream request failed")
+
+    def _rate_limited(self) -> Dict[str, Any]:
+        """Error result when the upstream call budget is spent"""
+        return self._error(503, "Upstream rate limit reached, try again later")
+
+    def _unavailable(self) -> Dict[str, Any]:
+        """Error result while the circuit breaker is open"""
+        return self._error(503, "Upstream temporarily unavailable, try again later")
+
+    def stats(self) -> Dict[str, Any]:
+        """Breaker state plus retry and hedging counters"""
+        return {
+            "breaker": self.breaker.stats(),
+            "retried": self.retried,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "p95_seconds": round(self._p95, 4),
+        }
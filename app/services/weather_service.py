@@ -1,164 +1,792 @@
+import asyncio
+import functools
 import logging
-from typing import Any, Dict, Optional
+import time
+from collections import Counter
+from typing import (
+    Any,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
 
 import httpx
 
 from app.core.config import settings
+from app.core.logging import REQUEST_LOGGER
+from app.core.metrics import STAGE_SECONDS
+from app.models.weather import ColumnarForecast, WeatherResponse
+from app.services.cache_service import CacheEntry, CacheService
+from app.services.city_index import (
+    City,
+    CityIndex,
+    normalize_country,
+    normalize_text,
+    split_query,
+)
+from app.services.forecast import build_columns, daily_payload, rows_payload
+from app.services.geo import geohash_decode, geohash_encode
+from app.services.group_batcher import GroupBatcher
+from app.services.history import HistoryStore
+from app.services.http_client import HTTPClientService
+from app.services.negative_filter import NegativeFilter
+from app.services.rate_limiter import RateLimiter
 from app.services.redis_service import RedisService
+from app.services.singleflight import SingleFlight
+from app.services.subscriptions import SubscriptionHub
+from app.services.upstream import UpstreamClient
 
 logger = logging.getLogger("weatherpy")
+# Logged on every request: sampled, and formatted only if kept
+request_logger = logging.getLogger(REQUEST_LOGGER)
+
+PROCESS_FORECAST_SECONDS = STAGE_SECONDS.labels("process_forecast")
+
+# Distinct keys counted between pre-warm flushes, as a multiple of
+# PREWARM_TOP_N; past it only the most requested half is kept
+KEY_HITS_LIMIT = 4
+
+# Upstream location parameters: {"q": "London,GB"} or {"lat": .., "lon": ..}
+Location = Dict[str, Any]
 
 
 class WeatherService:
     """Service for retrieving weather data from OpenWeatherMap API"""
 
-    def __init__(self, redis_service: RedisService):
-        """Initialize weather service with Redis cache"""
+    def __init__(
+        self,
+        redis_service: RedisService,
+        http_client: HTTPClientService,
+        cache: Optional[CacheService] = None,
+        rate_limiter: Optional[RateLimiter] = None,
+        city_index: Optional[CityIndex] = None,
+        hub: Optional[SubscriptionHub] = None,
+    ):
+        """Initialize weather service with two-tier cache and shared HTTP client"""
         self.api_key = settings.OPENWEATHER_API_KEY
-        self.api_url = settings.OPENWEATHER_API_URL
         self.redis_service = redis_service
+        self.cache = cache or CacheService(redis_service)
+        self.http_client = http_client
+        self.rate_limiter = rate_limiter or RateLimiter(redis_service)
+        self.upstream = UpstreamClient(http_client, self.rate_limiter)
+        self.batcher = GroupBatcher(
+            self.upstream, {"appid": self.api_key, "units": "metric"}
+        )
+        self.city_index = city_index or CityIndex()
+        self.singleflight = SingleFlight()
+        self.negative = NegativeFilter(redis_service)
+        self.hub = hub
+        self.history = HistoryStore(redis_service)
+        self.negative_cached = 0
+        self.negative_cache_hits = 0
+        self.negative_filter_hits = 0
+        self.lock_waits = 0
+        self.lock_wait_hits = 0
+        self.stale_served = 0
+        self.background_refreshes = 0
+        self._background: Set[asyncio.Task] = set()
+        # Lookups per cache key since the pre-warm scheduler last collected
+        # them; only counted when pre-warming is on
+        self.key_hits: Counter = Counter()
+        self._fetchers = {
+            "weather": self._fetch_current_weather,
+            "forecast": self._fetch_forecast,
+        }
 
     async def get_current_weather(
-        self, city: str, country_code: Optional[str] = None
+        self,
+        city: Optional[str] = None,
+        country_code: Optional[str] = None,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None,
     ) -> Dict[str, Any]:
-        """Get current weather for a city"""
+        """Get current weather for a city or a pair of coordinates"""
         # Create cache key
-        query = city
-        if country_code:
-            query = f"{city},{country_code}"
-
-        cache_key = f"weather:{query}"
-
-        # Try to get from cache first
-        cached_data = await self.redis_service.get(cache_key)
-        if cached_data:
-            logger.info(f"Retrieved weather for {query} from cache")
-            return cached_data
+        key_part, location = self._locate(city, country_code, lat, lon)
+        cache_key = f"weather:{key_part}"
+
+        return await self._get_cached(
+            cache_key, lambda: self._fetch_current_weather(location, cache_key)
+        )
+
+    async def get_current_weather_batch(
+        self, cities: List[Tuple[str, Optional[str]]]
+    ) -> List[Dict[str, Any]]:
+        """Get current weather for many cities, in request order"""
+        lookups = [self._resolve(city, code) for city, code in cities]
+        return await self._get_many_cached(
+            "weather", lookups, self._fetch_current_weather
+        )
+
+    def stream_current_weather_batch(
+        self, cities: List[Tuple[str, Optional[str]]]
+    ) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """Yield ``(index, result)`` per city as soon as each one resolves"""
+        lookups = [self._resolve(city, code) for city, code in cities]
+        return self._iter_many_cached("weather", lookups, self._fetch_current_weather)
+
+    async def _fetch_current_weather(
+        self,
+        location: Location,
+        cache_key: str,
+        pending_writes: Optional[List[Tuple[str, Dict[str, Any], float]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Fetch current weather from OpenWeatherMap and cache it.
 
-        # Not in cache, fetch from API
-        logger.info(f"Fetching current weather for {query} from OpenWeatherMap")
+        Batch callers pass ``pending_writes`` to collect the result and
+        store it together with the rest of the batch.
+        """
+        request_logger.info(
+            "Fetching current weather for %s from OpenWeatherMap", cache_key
+        )
 
         params = {
-            "q": query,
+            **location,
             "appid": self.api_key,
             "units": "metric",  # Use metric units (Celsius)
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{self.api_url}/weather", params=params)
-
-            if response.status_code != 200:
-                logger.error(f"OpenWeatherMap API error: {response.text}")
-                error_data = response.json()
-                return {
-                    "success": False,
-                    "error": error_data.get("message", "Unknown error"),
-                    "status_code": response.status_code,
-                }
-
-            data = response.json()
-
-            # Process/transform the data
-            result = {
-                "success": True,
-                "city": data["name"],
-                "country": data["sys"]["country"],
-                "weather": {
-                    "description": data["weather"][0]["description"],
-                    "icon": data["weather"][0]["icon"],
-                    "temperature": data["main"]["temp"],
-                    "feels_like": data["main"]["feels_like"],
-                    "humidity": data["main"]["humidity"],
-                    "pressure": data["main"]["pressure"],
-                    "wind_speed": data["wind"]["speed"],
-                    "clouds": data["clouds"]["all"],
-                },
-                "timestamp": data["dt"],
-                "timezone": data["timezone"],
-            }
+        started = time.monotonic()
+        city = self._gazetteer_city(cache_key)
+        if city is not None:
+            # Merged with concurrent misses into one group call
+            data, error = await self.batcher.get(city.id, city.country, location)
+        else:
+            data, error = await self.upstream.get_json("weather", params)
+        if error is not None:
+            return await self._not_found(cache_key, error)
+        assert data is not None
+
+        # Process/transform the data
+        result = {
+            "success": True,
+            "city": data["name"],
+            "country": data["sys"]["country"],
+            "weather": {
+                "description": data["weather"][0]["description"],
+                "icon": data["weather"][0]["icon"],
+                "temperature": data["main"]["temp"],
+                "feels_like": data["main"]["feels_like"],
+                "humidity": data["main"]["humidity"],
+                "pressure": data["main"]["pressure"],
+                "wind_speed": data["wind"]["speed"],
+                "clouds": data["clouds"]["all"],
+            },
+            "timestamp": data["dt"],
+            "timezone": data["timezone"],
+        }
+        # Validate once here so cache hits can skip response validation
+        result = WeatherResponse.model_validate(result).model_dump()
 
-            # Store in cache
-            await self.redis_service.set(cache_key, result)
+        # Store in cache, or leave it to the batch caller
+        delta = time.monotonic() - started
+        if pending_writes is not None:
+            pending_writes.append((cache_key, result, delta))
             return result
+        # Served as the cached entry, so the response gets its body and ETag
+        return await self._store(cache_key, result, delta)
 
     async def get_forecast(
-        self, city: str, country_code: Optional[str] = None
+        self,
+        city: Optional[str] = None,
+        country_code: Optional[str] = None,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Get 5-day weather forecast for a city or a pair of coordinates.
+
+        ``fields`` limits each forecast item to the named columns.
+        """
+        result = await self._get_columnar_forecast(city, country_code, lat, lon)
+        name = f"rows:{','.join(fields)}" if fields else "rows"
+        return self._forecast_view(
+            result, name, functools.partial(rows_payload, fields=fields)
+        )
+
+    async def get_daily_forecast(
+        self,
+        city: Optional[str] = None,
+        country_code: Optional[str] = None,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None,
+        fields: Optional[List[str]] = None,
+    ) -> Dict[str, Any]:
+        """Per-day min/max/mean of the forecast in the city's local time"""
+        result = await self._get_columnar_forecast(city, country_code, lat, lon)
+        name = f"daily:{','.join(fields)}" if fields else "daily"
+        return self._forecast_view(
+            result, name, functools.partial(daily_payload, fields=fields)
+        )
+
+    async def get_history(
+        self,
+        city: Optional[str] = None,
+        country_code: Optional[str] = None,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None,
+        resolution: str = "hour",
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Recorded observations rolled up per hour or day (UTC).
+
+        Served from the rollups only; nothing is fetched upstream. Defaults
+        to the last day of hours or the last 30 days.
+        """
+        key_part, _ = self._locate(city, country_code, lat, lon)
+        end = int(time.time()) if end is None else end
+        if start is None:
+            start = end - (86400 if resolution == "hour" else 30 * 86400)
+        points = await self.history.query(key_part, resolution, start, end)
+        if points is None:
+            return {
+                "success": False,
+                "error": "History is temporarily unavailable",
+                "status_code": 503,
+            }
+        return {"success": True, "resolution": resolution, "points": points}
+
+    async def _get_columnar_forecast(
+        self,
+        city: Optional[str],
+        country_code: Optional[str],
+        lat: Optional[float],
+        lon: Optional[float],
     ) -> Dict[str, Any]:
-        """Get 5-day weather forecast for a city"""
         # Create cache key
-        query = city
-        if country_code:
-            query = f"{city},{country_code}"
-
-        cache_key = f"forecast:{query}"
+        key_part, location = self._locate(city, country_code, lat, lon)
+        cache_key = f"forecast:{key_part}"
+
+        return await self._get_cached(
+            cache_key, lambda: self._fetch_forecast(location, cache_key)
+        )
+
+    async def get_forecast_batch(
+        self, cities: List[Tuple[str, Optional[str]]]
+    ) -> List[Dict[str, Any]]:
+        """Get 5-day forecasts for many cities, in request order"""
+        lookups = [self._resolve(city, code) for city, code in cities]
+        results = await self._get_many_cached("forecast", lookups, self._fetch_forecast)
+        return [self._forecast_view(result, "rows", rows_payload) for result in results]
+
+    async def stream_forecast_batch(
+        self, cities: List[Tuple[str, Optional[str]]]
+    ) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """Yield ``(index, result)`` per city as soon as each one resolves"""
+        lookups = [self._resolve(city, code) for city, code in cities]
+        async for index, result in self._iter_many_cached(
+            "forecast", lookups, self._fetch_forecast
+        ):
+            yield index, self._forecast_view(result, "rows", rows_payload)
+
+    def _forecast_view(
+        self,
+        result: Dict[str, Any],
+        name: str,
+        build: Callable[[Dict[str, Any]], Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        """
+        Derive a response from a cached columnar forecast.
 
-        # Try to get from cache first
-        cached_data = await self.redis_service.get(cache_key)
-        if cached_data:
-            logger.info(f"Retrieved forecast for {query} from cache")
-            return cached_data
+        Views of cache hits are memoized on the cache entry, so repeated
+        requests are served from already encoded bytes.
+        """
+        if not result.get("success", True):
+            return result
+        entry = getattr(result, "entry", None)
+        if entry is not None:
+            return entry.view(name, build)
+        view = build(result)
+        if result.get("stale"):
+            view["stale"] = True
+        return view
+
+    async def _fetch_forecast(
+        self,
+        location: Location,
+        cache_key: str,
+        pending_writes: Optional[List[Tuple[str, Dict[str, Any], float]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Fetch the forecast from OpenWeatherMap and cache it in columnar form.
 
-        # Not in cache, fetch from API
-        logger.info(f"Fetching forecast for {query} from OpenWeatherMap")
+        ``pending_writes`` works as in _fetch_current_weather.
+        """
+        request_logger.info("Fetching forecast for %s from OpenWeatherMap", cache_key)
 
         params = {
-            "q": query,
+            **location,
             "appid": self.api_key,
             "units": "metric",  # Use metric units (Celsius)
         }
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{self.api_url}/forecast", params=params)
-
-            if response.status_code != 200:
-                logger.error(f"OpenWeatherMap API error: {response.text}")
-                error_data = response.json()
-                return {
-                    "success": False,
-                    "error": error_data.get("message", "Unknown error"),
-                    "status_code": response.status_code,
-                }
-
-            data = response.json()
-
-            # Process the data to group by days and simplify
-            result = {
-                "success": True,
-                "city": data["city"]["name"],
-                "country": data["city"]["country"],
-                "forecast": self._process_forecast(data["list"]),
-                "timezone": data["city"]["timezone"],
-            }
+        started = time.monotonic()
+        data, error = await self.upstream.get_json("forecast", params)
+        if error is not None:
+            return await self._not_found(cache_key, error)
+        assert data is not None
+
+        # Store the time steps column-wise rather than as one dict each
+        with PROCESS_FORECAST_SECONDS.time():
+            columns = build_columns(data["list"])
+        result = {
+            "success": True,
+            "city": data["city"]["name"],
+            "country": data["city"]["country"],
+            "columns": columns,
+            "timezone": data["city"]["timezone"],
+        }
+        # Validate once here so cache hits can skip validation
+        result = ColumnarForecast.model_validate(result).model_dump()
 
-            # Store in cache
-            await self.redis_service.set(cache_key, result)
+        # Store in cache, or leave it to the batch caller
+        delta = time.monotonic() - started
+        if pending_writes is not None:
+            pending_writes.append((cache_key, result, delta))
             return result
+        return await self._store(cache_key, result, delta)
 
-    def _process_forecast(self, forecast_data: list) -> list:
-        """Process the raw forecast data into a more usable format"""
-        results = []
-
-        for item in forecast_data:
-            # Extract date (YYYY-MM-DD) from dt_txt
-            date = item["dt_txt"].split(" ")[0]
-
-            # Extract time (HH:MM:SS) from dt_txt
-            time = item["dt_txt"].split(" ")[1]
-
-            forecast_item = {
-                "date": date,
-                "time": time,
-                "timestamp": item["dt"],
-                "temperature": item["main"]["temp"],
-                "feels_like": item["main"]["feels_like"],
-                "humidity": item["main"]["humidity"],
-                "pressure": item["main"]["pressure"],
-                "description": item["weather"][0]["description"],
-                "icon": item["weather"][0]["icon"],
-                "wind_speed": item["wind"]["speed"],
-                "clouds": item["clouds"]["all"],
-            }
+    async def _get_cached(
+        self, cache_key: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Serve from cache, refreshing stale or nearly stale entries.
+
+        Fresh entries are served as-is, occasionally triggering an early
+        background refresh (XFetch). Stale entries are served immediately
+        while a background task refreshes them; with stale-while-revalidate
+        off, the refresh is awaited and stale data is only a fallback for
+        upstream errors. Misses wait for the upstream fetch.
+        """
+        if self._known_invalid(cache_key):
+            return self._not_found_error()
+        entry = await self.cache.get(cache_key)
+        now = time.time()
+        if entry is not None and self._is_negative(entry, now):
+            return entry.data
+        self._count_hit(cache_key)
+        if entry is None:
+            # Not in cache, fetch from API (once, however many callers are waiting)
+            return await self._coalesce(cache_key, fetch)
+
+        if entry.is_fresh(now):
+            if entry.should_refresh_early(now, settings.CACHE_XFETCH_BETA):
+                self._refresh_in_background(cache_key, fetch)
+            request_logger.info("Retrieved %s from cache", cache_key)
+            return entry.data
+
+        if settings.CACHE_STALE_WHILE_REVALIDATE:
+            self._refresh_in_background(cache_key, fetch)
+            return self._mark_stale(entry.data)
+
+        try:
+            result = await self._coalesce(cache_key, fetch)
+        except httpx.HTTPError as e:
+            logger.warning(f"Upstream failed for {cache_key}, serving stale: {e}")
+            return self._mark_stale(entry.data)
+
+        if not result.get("success", True):
+            return self._mark_stale(entry.data)
+        return result
+
+    async def _get_many_cached(
+        self,
+        kind: str,
+        lookups: List[Tuple[str, Location]],
+        fetch_one: Callable[..., Awaitable[Dict[str, Any]]],
+    ) -> List[Dict[str, Any]]:
+        """
+        Batch version of _get_cached.
+
+        Fetched results are written back in one pipeline once the whole
+        batch has resolved.
+        """
+        results: List[Dict[str, Any]] = [{} for _ in lookups]
+        pending_writes: List[Tuple[str, Dict[str, Any], float]] = []
+        async for index, result in self._iter_many_cached(
+            kind, lookups, fetch_one, pending_writes
+        ):
+            results[index] = result
+
+        if pending_writes:
+            entries = await self.cache.set_many(pending_writes)
+            for (key, _, _), entry in zip(pending_writes, entries):
+                await self._announce(key, entry)
+        return results
 
-            results.append(forecast_item)
+    async def _store(
+        self, cache_key: str, result: Dict[str, Any], delta: float
+    ) -> Dict[str, Any]:
+        """Cache a fetched result and push it to subscribers"""
+        entry = await self.cache.set(cache_key, result, delta=delta)
+        await self._announce(cache_key, entry)
+        return entry.data
+
+    async def _announce(self, cache_key: str, entry: CacheEntry) -> None:
+        """Record a refreshed current-weather entry and push it to subscribers"""
+        kind, _, key_part = cache_key.partition(":")
+        if kind != "weather":
+            return
+        self.history.record(key_part, entry.data)
+        if self.hub is not None:
+            await self.hub.publish(cache_key, entry.body)
+
+    async def _iter_many_cached(
+        self,
+        kind: str,
+        lookups: List[Tuple[str, Location]],
+        fetch_one: Callable[..., Awaitable[Dict[str, Any]]],
+        pending_writes: Optional[List[Tuple[str, Dict[str, Any], float]]] = None,
+    ) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+        """
+        Yield ``(index, result)`` for many lookups as each one resolves.
+
+        ``lookups`` are ``(cache key suffix, upstream location)`` pairs from
+        _resolve.
+        All keys are read in one round trip and cache hits are yielded
+        first. Misses are fetched upstream by a bounded pool of workers that
+        hand results over through a bounded queue, so a slow consumer stops
+        new upstream fetches from starting. Stale entries are always served
+        while refreshing, and failures become per-item error results.
+        """
+        keys = [f"{kind}:{key_part}" for key_part, _ in lookups]
+        locations = [location for _, location in lookups]
+        lookup: List[int] = []
+        for index, key in enumerate(keys):
+            if self._known_invalid(key):
+                yield index, self._not_found_error()
+            else:
+                lookup.append(index)
+        entries = await self.cache.get_many([keys[index] for index in lookup])
+        missing: Dict[str, List[int]] = {}
+
+        now = time.time()
+        for index, entry in zip(lookup, entries):
+            key, location = keys[index], locations[index]
+            if entry is not None and self._is_negative(entry, now):
+                yield index, entry.data
+                continue
+            self._count_hit(key)
+            if entry is None:
+                missing.setdefault(key, []).append(index)
+                continue
+
+            refresh = functools.partial(fetch_one, location, key)
+            if entry.is_fresh(now):
+                if entry.should_refresh_early(now, settings.CACHE_XFETCH_BETA):
+                    self._refresh_in_background(key, refresh)
+                yield index, entry.data
+            else:
+                self._refresh_in_background(key, refresh)
+                yield index, self._mark_stale(entry.data)
+
+        if not missing:
+            return
+
+        todo: asyncio.Queue = asyncio.Queue()
+        for key in missing:
+            todo.put_nowait(key)
+        done: asyncio.Queue = asyncio.Queue(maxsize=settings.STREAM_BUFFER_SIZE)
+
+        async def worker() -> None:
+            while not todo.empty():
+                key = todo.get_nowait()
+                location = locations[missing[key][0]]
+                try:
+                    result = await self._coalesce(
+                        key,
+                        functools.partial(fetch_one, location, key, pending_writes),
+                    )
+                except httpx.HTTPError as e:
+                    logger.error(f"Upstream request failed for {key}: {e}")
+                    result = {
+                        "success": False,
+                        "error": "Upstream request failed",
+                        "status_code": 502,
+                    }
+                except Exception:
+                    logger.exception(f"Failed to load {key}")
+                    result = {
+                        "success": False,
+                        "error": "Internal error",
+                        "status_code": 500,
+                    }
+                await done.put((key, result))
+
+        concurrency = min(settings.BATCH_UPSTREAM_CONCURRENCY, len(missing))
+        workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+        try:
+            for _ in range(len(missing)):
+                key, result = await done.get()
+                for index in missing[key]:
+                    yield index, result
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def _count_hit(self, cache_key: str) -> None:
+        """Count a lookup towards the pre-warm top-N, keeping the counter bounded"""
+        if not settings.PREWARM_ENABLED:
+            return
+        self.key_hits[cache_key] += 1
+        limit = settings.PREWARM_TOP_N * KEY_HITS_LIMIT
+        if len(self.key_hits) > limit:
+            self.key_hits = Counter(dict(self.key_hits.most_common(limit // 2)))
+
+    def _known_invalid(self, cache_key: str) -> bool:
+        """
+        Whether the negative filter rejects a free-text query.
+
+        Gazetteer ids and coordinates are never checked, so a filter false
+        positive can only hit names the upstream has to resolve itself.
+        """
+        key_part = cache_key.partition(":")[2]
+        if key_part.startswith("q:") and key_part in self.negative:
+            self.negative_filter_hits += 1
+            return True
+        return False
+
+    def _is_negative(self, entry: CacheEntry, now: float) -> bool:
+        """Whether a cache hit is a remembered 404 (never pre-warmed)"""
+        if entry.data.get("success") is False and entry.is_fresh(now):
+            self.negative_cache_hits += 1
+            return True
+        return False
+
+    async def _not_found(self, cache_key: str, error: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Remember upstream 404s so the query is not sent again.
+
+        Only "not found" is cached; rate limits and 5xx are transient and
+        go back to the upstream on the next request.
+        """
+        if error.get("status_code") != 404 or settings.NEGATIVE_CACHE_TTL <= 0:
+            return error
+        self.negative_cached += 1
+        self.key_hits.pop(cache_key, None)  # not worth pre-warming
+        key_part = cache_key.partition(":")[2]
+        if key_part.startswith("q:"):
+            self.negative.add(key_part)
+        entry = await self.cache.set(cache_key, error, ttl=settings.NEGATIVE_CACHE_TTL)
+        return entry.data
+
+    @staticmethod
+    def _not_found_error() -> Dict[str, Any]:
+        return {"success": False, "error": "city not found", "status_code": 404}
+
+    def negative_stats(self) -> Dict[str, Any]:
+        """Negative cache and filter counters; hits are upstream calls saved"""
+        return {
+            "cached": self.negative_cached,
+            "cache_hits": self.negative_cache_hits,
+            "filter_hits": self.negative_filter_hits,
+            "upstream_calls_saved": self.negative_cache_hits
+            + self.negative_filter_hits,
+            "filter": self.negative.stats(),
+        }
 
-        return results
+    def _mark_stale(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy of cached data flagged as stale for the response headers"""
+        self.stale_served += 1
+        return {**data, "stale": True}
+
+    def _refresh_in_background(
+        self, cache_key: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> None:
+        """Refresh a cache entry without making the caller wait"""
+        if self.singleflight.is_running(cache_key):
+            return
+
+        self.background_refreshes += 1
+        task = asyncio.create_task(self._coalesce(cache_key, fetch))
+        self._background.add(task)
+        task.add_done_callback(self._on_refresh_done)
+
+    def _on_refresh_done(self, task: asyncio.Task) -> None:
+        self._background.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Background refresh failed: {task.exception()}")
+
+    async def purge(self, city: str, country_code: Optional[str] = None) -> List[str]:
+        """Drop a city's cached results from every tier on every replica"""
+        keys = [self.cache_key(kind, city, country_code) for kind in self._fetchers]
+        for key in keys:
+            await self.cache.invalidate(key)
+        return keys
+
+    async def refresh(self, cache_key: str) -> Dict[str, Any]:
+        """Fetch a cache key from upstream now, e.g. to pre-warm it"""
+        kind, _, key_part = cache_key.partition(":")
+        fetch = self._fetchers[kind]
+        location = self._location_for_key(key_part)
+        return await self._coalesce(
+            cache_key, functools.partial(fetch, location, cache_key)
+        )
+
+    async def close(self, timeout: float = 0.0) -> None:
+        """
+        Stop background work, letting in-flight upstream fetches finish.
+
+        Fetches still running after ``timeout`` seconds are cancelled.
+        """
+        await self.negative.stop()
+        await self.batcher.close()
+        await self.history.close()
+        pending = set(self._background) | set(self.singleflight.tasks())
+        if pending and timeout > 0:
+            logger.info(f"Draining {len(pending)} in-flight upstream fetches")
+            _, pending = await asyncio.wait(pending, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _coalesce(
+        self, cache_key: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """Run at most one upstream fetch per cache key at a time"""
+        return await self.singleflight.do(
+            cache_key, lambda: self._fetch_with_lock(cache_key, fetch)
+        )
+
+    async def _fetch_with_lock(
+        self, cache_key: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Dict[str, Any]:
+        """
+        Extend coalescing across workers and replicas with a Redis lock.
+
+        The lock holder fetches; everyone else polls the cache for its result
+        and only fetches themselves if the holder does not deliver in time.
+        """
+        if not settings.DISTRIBUTED_LOCK_ENABLED:
+            return await fetch()
+
+        lock_name = f"lock:{cache_key}"
+        token = await self.redis_service.acquire_lock(
+            lock_name, settings.DISTRIBUTED_LOCK_TTL
+        )
+        if token is not None:
+            try:
+                return await fetch()
+            finally:
+                await self.redis_service.release_lock(lock_name, token)
+
+        self.lock_waits += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.DISTRIBUTED_LOCK_WAIT
+        while loop.time() < deadline:
+            await asyncio.sleep(settings.DISTRIBUTED_LOCK_POLL_INTERVAL)
+            entry = await self.cache.get(cache_key)
+            if entry is not None and entry.is_fresh(time.time()):
+                self.lock_wait_hits += 1
+                return entry.data
+
+        logger.warning(f"Timed out waiting on lock for {cache_key}, fetching")
+        return await fetch()
+
+    def coalescing_stats(self) -> Dict[str, int]:
+        """Counters for coalesced upstream fetches and stale serving"""
+        stats = self.singleflight.stats()
+        stats["lock_waits"] = self.lock_waits
+        stats["lock_wait_hits"] = self.lock_wait_hits
+        stats["stale_served"] = self.stale_served
+        stats["background_refreshes"] = self.background_refreshes
+        return stats
+
+    def cache_key(
+        self, kind: str, city: str, country_code: Optional[str] = None
+    ) -> str:
+        """Cache key for a lookup, e.g. ``cache_key("weather", "London,GB")``"""
+        return f"{kind}:{self._resolve(city, country_code)[0]}"
+
+    def _locate(
+        self,
+        city: Optional[str] = None,
+        country_code: Optional[str] = None,
+        lat: Optional[float] = None,
+        lon: Optional[float] = None,
+    ) -> Tuple[str, Location]:
+        """Cache key suffix and upstream location for a city or coordinates"""
+        if lat is not None and lon is not None:
+            return self._resolve_coordinates(lat, lon)
+        if city is None:
+            raise ValueError("Either city or both lat and lon are required")
+        return self._resolve(city, country_code)
+
+    def _resolve_coordinates(self, lat: float, lon: float) -> Tuple[str, Location]:
+        """
+        Map coordinates to a bounded set of cache keys.
+
+        Points within GEO_SNAP_RADIUS_KM of a gazetteer city share that
+        city's entry (``id:2643743``). Anything else shares one entry per
+        geohash cell (``geo:gcpvj``), fetched for the centre of the cell.
+        """
+        city = self.city_index.nearest(lat, lon, settings.GEO_SNAP_RADIUS_KM)
+        if city is not None:
+            return f"id:{city.id}", {"q": self._build_query(city.name, city.country)}
+
+        cell = geohash_encode(lat, lon, settings.GEO_PRECISION)
+        return f"geo:{cell}", self._cell_location(cell)
+
+    @staticmethod
+    def _cell_location(cell: str) -> Location:
+        lat, lon = geohash_decode(cell)
+        return {"lat": round(lat, 4), "lon": round(lon, 4)}
+
+    def _gazetteer_city(self, cache_key: str) -> Optional[City]:
+        """The gazetteer city a ``<kind>:id:<n>`` cache key refers to"""
+        _, kind, value = cache_key.split(":", 2)
+        return self.city_index.get(int(value)) if kind == "id" else None
+
+    def _resolve(
+        self, city: str, country_code: Optional[str] = None
+    ) -> Tuple[str, Location]:
+        """
+        Map a user query to a cache key suffix and an OpenWeatherMap location.
+
+        Case, whitespace, Unicode form, diacritics and country codes are
+        normalized first, so equivalent spellings share one cache entry.
+        Cities in the gazetteer are keyed by their id (``id:2643743``) and
+        queried by their canonical name; others are keyed by the normalized
+        text (``q:smallville,us``).
+        """
+        name, country = split_query(city, country_code)
+        country = normalize_country(country)
+
+        match = self.city_index.resolve(name, country)
+        if match is not None:
+            query = self._build_query(match.name, match.country)
+            return f"id:{match.id}", {"q": query}
+
+        key_part = normalize_text(name)
+        if country:
+            key_part = f"{key_part},{country.lower()}"
+        return f"q:{key_part}", {"q": self._build_query(name, country)}
+
+    def _location_for_key(self, key_part: str) -> Location:
+        """Upstream location for a cache key suffix produced by _locate"""
+        kind, _, value = key_part.partition(":")
+        if kind == "id":
+            city = self.city_index.get(int(value))
+            if city is not None:
+                return {"q": self._build_query(city.name, city.country)}
+            raise KeyError(f"Unknown city id {value}")
+        if kind == "geo":
+            return self._cell_location(value)
+        return {"q": value}
+
+    @staticmethod
+    def _build_query(city: str, country_code: Optional[str] = None) -> str:
+        """OpenWeatherMap ``q`` parameter, also used in cache keys"""
+        if country_code:
+            return f"{city},{country_code}"
+        return city
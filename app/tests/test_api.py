@@ -1,9 +1,13 @@
+import json
+import time
 from unittest.mock import AsyncMock, patch
 
 import pytest
 from fastapi.testclient import TestClient
 
+from app.core.config import settings
 from app.main import app
+from app.services.cache_service import CacheEntry
 
 
 @pytest.fixture
@@ -20,6 +24,25 @@ def test_health_check(client):
     data = response.json()
     assert data["status"] == "healthy"
     assert "version" in data
+    assert "http_pool" in data
+
+
+@patch(
+    "app.services.weather_service.WeatherService.get_current_weather",
+    new_callable=AsyncMock,
+)
+def test_metrics_use_route_templates(mock_get_weather, client):
+    """Test the metrics endpoint labels requests by route, not by city"""
+    mock_get_weather.return_value = {"success": False, "error": "city not found"}
+    client.get("/api/weather?city=Nowhere-In-Particular")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    body = response.text
+    assert "weatherpy_http_request_duration_seconds_bucket" in body
+    assert 'route="/api/weather"' in body
+    assert "Nowhere-In-Particular" not in body
+    assert "weatherpy_cache_l2_hits" in body
 
 
 @patch(
@@ -115,3 +138,169 @@ def test_get_forecast(mock_get_forecast, client):
     assert "forecast" in data
     assert len(data["forecast"]) == 2
     assert data["forecast"][0]["temperature"] == 19.2
+
+
+@patch(
+    "app.services.weather_service.WeatherService.get_current_weather_batch",
+    new_callable=AsyncMock,
+)
+def test_get_weather_batch(mock_get_batch, client):
+    """Test the batch weather endpoint reports per-item errors"""
+    mock_get_batch.return_value = [
+        {
+            "success": True,
+            "city": "London",
+            "country": "GB",
+            "weather": {
+                "description": "few clouds",
+                "icon": "02d",
+                "temperature": 18.5,
+                "feels_like": 17.9,
+                "humidity": 65,
+                "pressure": 1013,
+                "wind_speed": 3.6,
+                "clouds": 20,
+            },
+            "timestamp": 1619712000,
+            "timezone": 3600,
+        },
+        {"success": False, "error": "city not found", "status_code": 404},
+    ]
+
+    response = client.post(
+        "/api/weather/batch",
+        json={"cities": [{"city": "London", "country_code": "GB"}, {"city": "Nope"}]},
+    )
+
+    assert response.status_code == 200
+    results = response.json()["results"]
+    assert results[0]["success"] is True
+    assert results[0]["data"]["city"] == "London"
+    assert results[1]["success"] is False
+    assert results[1]["status_code"] == 404
+    assert results[1]["query"]["city"] == "Nope"
+
+
+@patch("app.services.weather_service.WeatherService.stream_forecast_batch")
+def test_stream_forecast_batch_ndjson(mock_stream, client):
+    """Test the streaming batch endpoint emits one NDJSON line per city"""
+
+    async def results():
+        yield 1, {"success": False, "error": "city not found", "status_code": 404}
+        yield 0, {
+            "success": True,
+            "city": "London",
+            "country": "GB",
+            "forecast": [],
+            "timezone": 0,
+        }
+
+    mock_stream.return_value = results()
+
+    with client.stream(
+        "POST",
+        "/api/forecast/batch/stream",
+        json={"cities": [{"city": "London"}, {"city": "Nope"}]},
+    ) as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+
+    assert [line["index"] for line in lines] == [1, 0]
+    assert lines[0]["status_code"] == 404
+    assert lines[1]["data"]["city"] == "London"
+
+
+@patch(
+    "app.services.weather_service.WeatherService.get_current_weather",
+    new_callable=AsyncMock,
+)
+def test_cache_hit_served_from_stored_bytes(mock_get_weather, client):
+    """Test cache hits are sent as their stored JSON bytes"""
+    entry = CacheEntry({"success": True, "city": "London"}, 2e9, 2e9)
+    entry._body = b'{"success":true,"city":"London","from":"cache"}'
+    mock_get_weather.return_value = entry.data
+
+    response = client.get("/api/weather?city=London")
+
+    assert response.status_code == 200
+    assert response.json()["from"] == "cache"
+
+
+@patch(
+    "app.services.weather_service.WeatherService.get_current_weather",
+    new_callable=AsyncMock,
+)
+def test_cache_hit_revalidates_with_etag(mock_get_weather, client):
+    """Test cache hits carry an ETag and a matching If-None-Match gets a 304"""
+    now = time.time()
+    entry = CacheEntry({"success": True, "city": "London"}, now + 300, now + 900)
+    mock_get_weather.return_value = entry.data
+
+    response = client.get("/api/weather?city=London")
+    etag = response.headers["ETag"]
+    assert etag == entry.etag
+    assert "max-age=299" in response.headers["Cache-Control"]
+    assert "stale-while-revalidate=600" in response.headers["Cache-Control"]
+
+    response = client.get(
+        "/api/weather?city=London", headers={"If-None-Match": f'"other", W/{etag}'}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == etag
+
+
+@patch(
+    "app.services.weather_service.WeatherService.get_forecast",
+    new_callable=AsyncMock,
+)
+def test_cache_hit_served_compressed(mock_get_forecast, client):
+    """Test large cache hits are sent precompressed with their own ETag"""
+    now = time.time()
+    entry = CacheEntry({"success": True, "list": ["x" * 2000]}, now + 60, now + 90)
+    mock_get_forecast.return_value = entry.data
+
+    response = client.get(
+        "/api/forecast?city=London", headers={"Accept-Encoding": "gzip"}
+    )
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["ETag"] == entry.etag[:-1] + '-gzip"'
+    assert response.content == entry.body
+
+
+def test_autocomplete_cities(client):
+    """Test city autocomplete ignores accents and ranks by population"""
+    response = client.get("/api/cities/autocomplete?q=sao&limit=3")
+    assert response.status_code == 200
+    suggestions = response.json()["suggestions"]
+    assert suggestions[0]["name"] == "Sao Paulo"
+    assert suggestions[0]["country"] == "BR"
+
+
+def test_weather_requires_both_coordinates(client):
+    """Test lat without lon is rejected"""
+    response = client.get("/api/weather?lat=51.5")
+    assert response.status_code == 400
+
+
+@patch(
+    "app.services.weather_service.WeatherService.purge",
+    new_callable=AsyncMock,
+)
+def test_cache_purge_requires_the_admin_token(mock_purge, client):
+    """The purge endpoint is off without a token and checks it when set"""
+    assert client.delete("/admin/cache?city=London").status_code == 404
+
+    mock_purge.return_value = ["weather:id:2643743", "forecast:id:2643743"]
+    with patch.object(settings, "ADMIN_TOKEN", "secret"):
+        headers = {"Authorization": "Bearer wrong"}
+        response = client.delete("/admin/cache?city=London", headers=headers)
+        assert response.status_code == 403
+
+        headers = {"Authorization": "Bearer secret"}
+        response = client.delete("/admin/cache?city=London", headers=headers)
+    assert response.json() == {"purged": mock_purge.return_value}
+    mock_purge.assert_awaited_once_with("London", None)
@@ -0,0 +1,38 @@
+import argparse
+
+import pytest
+
+from benchmarks.fake_owm import FakeOpenWeatherMap, gazetteer
+from benchmarks.run import SCENARIOS, run_scenario, running_app
+
+
+@pytest.mark.asyncio
+async def test_herd_scenario_fetches_upstream_once():
+    """The benchmark harness runs end to end and sees coalescing"""
+    args = argparse.Namespace(
+        endpoint="weather", requests=30, concurrency=10, keys=5, alloc_sample=2, seed=1
+    )
+    fake = FakeOpenWeatherMap(latency=0.01)
+
+    async with running_app(fake) as app:
+        result = await run_scenario(app, fake, SCENARIOS["herd"], args)
+
+    assert result["errors"] == 0
+    assert result["upstream_calls"] == 1
+    assert result["p50_ms"] <= result["p99_ms"]
+
+
+@pytest.mark.asyncio
+async def test_gazetteer_scenario_uses_group_calls():
+    """Concurrent misses for known cities reach the fake as group calls"""
+    args = argparse.Namespace(
+        endpoint="weather", requests=20, concurrency=20, keys=20, alloc_sample=0, seed=1
+    )
+    fake = FakeOpenWeatherMap(latency=0.01, cities=gazetteer())
+
+    async with running_app(fake) as app:
+        result = await run_scenario(app, fake, SCENARIOS["gazetteer"], args)
+
+    assert result["errors"] == 0
+    assert fake.calls["group"] >= 1
+    assert fake.calls["weather"] == 0
@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+import pytest
+from fakeredis import aioredis
+
+from app.services.cache_service import CacheEntry, CacheService
+from app.services.memory_cache import MemoryCache
+from app.services.redis_service import RedisService
+
+
+def test_memory_cache_evicts_least_recently_used():
+    """Entries beyond the size bound are evicted in LRU order"""
+    cache = MemoryCache(max_entries=2, max_bytes=1024, ttl=60)
+    cache.set("a", 1, size=1)
+    cache.set("b", 2, size=1)
+    cache.get("a")
+    cache.set("c", 3, size=1)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_memory_cache_bounded_by_bytes_and_ttl():
+    """Byte budget and per-entry TTL are both enforced"""
+    cache = MemoryCache(max_entries=100, max_bytes=10, ttl=60)
+    cache.set("a", "x", size=6)
+    cache.set("b", "y", size=6)
+    assert cache.get("a") is None
+    assert cache.current_bytes == 6
+
+    cache.set("c", "z", size=1, ttl=0)
+    assert cache.get("c") is None
+
+
+@pytest.mark.asyncio
+async def test_l2_hit_fills_l1():
+    """A Redis hit is served from memory on the next read"""
+    redis_service = RedisService()
+    cache = CacheService(redis_service)
+    calls = []
+
+    now = time.time()
+    stored = CacheEntry({"city": "London"}, now + 30, now + 60).to_dict()
+
+    async def get_with_siblings(keys, suffixes):
+        calls.extend(keys)
+        return [(stored, {})]
+
+    redis_service.get_with_siblings = get_with_siblings
+
+    assert (await cache.get("weather:London")).data == {"city": "London"}
+    assert (await cache.get("weather:London")).data == {"city": "London"}
+    assert calls == ["weather:London"]
+    assert cache.stats()["l1"]["hits"] == 1
+    assert cache.stats()["l2"]["hits"] == 1
+
+
+def test_legacy_payload_is_read_as_stale():
+    """Entries written before the envelope format are served, then refreshed"""
+    entry = CacheEntry.from_dict({"city": "London"})
+    assert entry.data == {"city": "London"}
+    assert not entry.is_fresh(time.time())
+
+
+def test_xfetch_refreshes_only_near_expiry():
+    """Early refresh never fires far from expiry and always fires past it"""
+    now = time.time()
+    entry = CacheEntry({}, fresh_until=now + 300, expires_at=now + 900, delta=0.1)
+    assert not entry.should_refresh_early(now, beta=1.0)
+    assert entry.should_refresh_early(now + 300, beta=1.0)
+    assert not entry.should_refresh_early(now + 300, beta=0)
+
+
+def test_views_are_built_once_per_entry():
+    """Derived payloads are memoized and carry their own encoded body"""
+    entry = CacheEntry(data={"n": 1}, fresh_until=1.0, expires_at=2.0)
+    builds = []
+
+    def build(data):
+        builds.append(data)
+        return {"doubled": data["n"] * 2}
+
+    first = entry.view("doubled", build)
+    second = entry.view("doubled", build)
+
+    assert first is second
+    assert len(builds) == 1
+    assert first.entry.body == b'{"doubled":2}'
+
+
+def test_etag_survives_the_envelope():
+    """Entries read back from Redis keep the ETag they were stored with"""
+    entry = CacheEntry({"city": "London"}, fresh_until=1.0, expires_at=2.0)
+    stored = entry.to_dict()
+    restored = CacheEntry.from_dict(stored)
+    restored._body = b"never hashed"
+    assert restored.etag == entry.etag == stored["etag"]
+
+
+@pytest.mark.asyncio
+async def test_invalidation_reaches_other_replicas():
+    """A purge on one replica drops the key from every replica's L1"""
+    client = aioredis.FakeRedis()
+    replicas = []
+    for _ in range(2):
+        redis_service = RedisService()
+        redis_service.redis_client = client
+        redis_service.available.set()
+        cache = CacheService(redis_service)
+        await cache.start()
+        replicas.append(cache)
+    first, second = replicas
+
+    await first.set("weather:id:1", {"temp": 1})
+    assert await second.get("weather:id:1") is not None
+    assert second.memory.peek("weather:id:1") is not None
+    await asyncio.sleep(0.05)  # let the listeners subscribe
+
+    await first.invalidate("weather:id:1")
+    for _ in range(100):
+        if second.memory.peek("weather:id:1") is None:
+            break
+        await asyncio.sleep(0.01)
+    assert second.memory.peek("weather:id:1") is None
+    assert await second.get("weather:id:1") is None
+
+    for cache in replicas:
+        await cache.stop()
@@ -0,0 +1,40 @@
+from unittest.mock import patch
+
+from app.services.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+
+def test_opens_on_failure_rate_and_recovers():
+    """The breaker opens past the failure rate and closes after good probes"""
+    breaker = CircuitBreaker("test", min_calls=4, failure_rate=0.5, half_open_calls=2)
+    clock = [1000.0]
+
+    with patch("app.services.circuit_breaker.time.monotonic", lambda: clock[0]):
+        breaker.record_success()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == CLOSED
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert not breaker.allow()
+
+        clock[0] += breaker.open_seconds
+        assert breaker.allow() and breaker.allow()
+        assert breaker.state == HALF_OPEN
+        assert not breaker.allow()  # only two probes at a time
+        breaker.record_success()
+        breaker.record_success()
+        assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens():
+    """A failure while half-open opens the breaker again"""
+    breaker = CircuitBreaker("test", min_calls=1, failure_rate=1.0)
+    clock = [1000.0]
+
+    with patch("app.services.circuit_breaker.time.monotonic", lambda: clock[0]):
+        breaker.record_failure()
+        clock[0] += breaker.open_seconds
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state == OPEN
+        assert breaker.stats()["opened"] == 2
@@ -0,0 +1,36 @@
+import pytest
+
+from app.core.config import settings
+from app.services.city_index import CityIndex, normalize_text, split_query
+
+
+@pytest.fixture(scope="module")
+def index():
+    return CityIndex.load(settings.CITY_INDEX_PATH)
+
+
+def test_normalize_text_folds_case_accents_and_spacing():
+    """Equivalent spellings normalize to the same key"""
+    assert normalize_text(" São  Paulo") == normalize_text("SAO PAULO") == "sao paulo"
+
+
+def test_split_query_reads_inline_country_code():
+    """ "City,CC" input is split unless a country code is passed separately"""
+    assert split_query("London,GB") == ("London", "GB")
+    assert split_query("London,GB", "CA") == ("London,GB", "CA")
+    assert split_query("Washington, D.C.") == ("Washington, D.C.", None)
+
+
+def test_resolve_prefers_country_then_population(index):
+    """Ambiguous names resolve to the most populous match in the country"""
+    assert index.resolve("london").country == "GB"
+    assert index.resolve("London", "CA").country == "CA"
+    assert index.resolve("Muenchen").name == "Munich"
+    assert index.resolve("Atlantis") is None
+
+
+def test_complete_matches_prefixes_and_typos(index):
+    """Autocomplete finds prefixes and close misspellings"""
+    assert "Paris" in [city.name for city in index.complete("par")]
+    assert "Barcelona" in [city.name for city in index.complete("barcelna")]
+    assert index.complete("") == []
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from app.services.codec import CODECS, CacheCodec
+
+PAYLOAD = {"data": {"city": "London", "temperature": 18.5}, "fresh_until": 1.5}
+
+
+@pytest.mark.parametrize("name", sorted(CODECS))
+def test_round_trip(name):
+    """Every available codec decodes what it encodes"""
+    codec = CacheCodec(name)
+    assert codec.decode(codec.encode(PAYLOAD)) == PAYLOAD
+
+
+def test_reads_legacy_json_entries():
+    """Plain JSON written before codec framing is still readable"""
+    assert CacheCodec("orjson").decode(json.dumps(PAYLOAD).encode()) == PAYLOAD
+
+
+def test_reads_entries_from_another_codec():
+    """Entries are decoded by the codec that wrote them, not the configured one"""
+    written = CacheCodec("json").encode(PAYLOAD)
+    assert CacheCodec("orjson").decode(written) == PAYLOAD
+
+
+def test_large_entries_are_compressed():
+    """Entries over the threshold are zlib-compressed"""
+    payload = {"forecast": [PAYLOAD] * 100}
+    codec = CacheCodec("json", compress_threshold=1024)
+    encoded = codec.encode(payload)
+
+    assert len(encoded) < len(json.dumps(payload))
+    assert codec.decode(encoded) == payload
+
+
+def test_unknown_codec_falls_back_to_json():
+    """Selecting an unavailable codec falls back to json"""
+    assert CacheCodec("does-not-exist").codec.name == "json"
@@ -0,0 +1,82 @@
+import gzip
+from unittest.mock import patch
+
+import pytest
+from fakeredis import aioredis
+from fastapi import FastAPI, Response
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.services.cache_service import CacheService
+from app.services.compression import GZipMiddleware, negotiate
+from app.services.redis_service import RedisService, sibling_key
+
+
+def test_negotiate_respects_q_values_and_size():
+    """Refused or tiny responses stay identity; otherwise an accepted encoding"""
+    with patch.multiple(
+        settings, COMPRESSION_ENCODINGS=["gzip"], COMPRESSION_MIN_SIZE=100
+    ):
+        assert negotiate("gzip, deflate", 100) == "gzip"
+        assert negotiate("br;q=1.0, *;q=0.5", 100) == "gzip"
+        assert negotiate("gzip;q=0", 100) is None
+        assert negotiate("gzip", 99) is None
+        assert negotiate(None, 100) is None
+
+
+@pytest.mark.asyncio
+async def test_compressed_body_is_stored_next_to_the_payload():
+    """Another worker reads the compressed body instead of compressing again"""
+    client = aioredis.FakeRedis()
+    redis_service = RedisService()
+    redis_service.redis_client = client
+    data = {"success": True, "items": ["x" * 10] * 200}
+
+    with patch.multiple(
+        settings, COMPRESSION_ENCODINGS=["gzip"], COMPRESSION_MIN_SIZE=100
+    ):
+        await CacheService(redis_service).set("forecast:id:1", data)
+        stored = await client.get(sibling_key("forecast:id:1", "gzip"))
+
+        entry = await CacheService(redis_service).get("forecast:id:1")
+        assert entry is not None
+        with patch("app.services.cache_service.compress") as compress:
+            body = entry.encoded("gzip")
+        compress.assert_not_called()
+        assert gzip.decompress(body) == entry.body
+        assert stored.startswith(entry.etag.encode())
+
+        # A body left over from another payload is ignored
+        await client.set(sibling_key("forecast:id:1", "gzip"), b'"old"stale')
+        entry = await CacheService(redis_service).get("forecast:id:1")
+        assert entry._encoded == {}
+
+
+def test_gzip_middleware_negotiates_and_tags_the_representation():
+    """Dynamic bodies are gzipped only when accepted, under their own ETag"""
+    gzip_app = FastAPI()
+    gzip_app.add_middleware(GZipMiddleware)
+    body = b"x" * 2048
+
+    @gzip_app.get("/dynamic")
+    async def dynamic():
+        return Response(body, headers={"ETag": '"abc"'})
+
+    @gzip_app.get("/precompressed")
+    async def precompressed():
+        headers = {"ETag": '"abc-gzip"', "Content-Encoding": "gzip"}
+        return Response(gzip.compress(body), headers=headers)
+
+    with patch.object(settings, "COMPRESSION_MIN_SIZE", 100):
+        client = TestClient(gzip_app)
+        refused = client.get("/dynamic", headers={"Accept-Encoding": "gzip;q=0"})
+        accepted = client.get("/dynamic", headers={"Accept-Encoding": "gzip"})
+        stored = client.get("/precompressed", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in refused.headers
+    assert refused.headers["etag"] == '"abc"'
+    assert accepted.headers["content-encoding"] == "gzip"
+    assert accepted.headers["etag"] == '"abc-gzip"'
+    assert accepted.content == body
+    assert stored.headers["etag"] == '"abc-gzip"'
+    assert stored.content == body
@@ -0,0 +1,108 @@
+import time
+from unittest.mock import patch
+
+import pytest
+
+from app.core.config import settings
+from app.services.cache_service import CacheService
+from app.services.codec import CacheCodec
+from app.services.disk_cache import DiskCache
+from app.services.redis_service import RedisService
+
+
+def make_cache(directory, max_bytes=1 << 20):
+    return DiskCache(str(directory), max_bytes, CacheCodec("json"))
+
+
+def append(path, data):
+    with open(path, "ab") as log:
+        log.write(data)
+
+
+@pytest.mark.asyncio
+async def test_entries_survive_a_restart(tmp_path):
+    """Values written before close are read back after reopening"""
+    cache = make_cache(tmp_path)
+    assert await cache.open()
+    cache.put("weather:id:1", {"temp": 1}, time.time() + 60)
+    cache.put("weather:id:2", {"temp": 2}, time.time() - 1)
+    cache.put("weather:id:3", {"temp": 3}, time.time() + 60)
+    cache.delete("weather:id:3")
+    assert await cache.get("weather:id:1") == {"temp": 1}
+    await cache.close()
+
+    cache = make_cache(tmp_path)
+    assert await cache.open()
+    assert await cache.get("weather:id:1") == {"temp": 1}
+    assert await cache.get("weather:id:2") is None
+    assert await cache.get("weather:id:3") is None
+    assert [key for key, _ in await cache.recent(10)] == ["weather:id:1"]
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_torn_write_is_discarded(tmp_path):
+    """A partial record at the end of the log is dropped on open"""
+    cache = make_cache(tmp_path)
+    await cache.open()
+    cache.put("a", {"n": 1}, time.time() + 60)
+    await cache.close()
+    append(cache.path, b"\x00\x01partial")
+
+    cache = make_cache(tmp_path)
+    await cache.open()
+    assert await cache.get("a") == {"n": 1}
+    cache.put("b", {"n": 2}, time.time() + 60)
+    await cache.close()
+
+    cache = make_cache(tmp_path)
+    await cache.open()
+    assert await cache.get("b") == {"n": 2}
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_compaction_bounds_the_log(tmp_path):
+    """Rewrites keep the log under budget, favoring later expiry"""
+    cache = make_cache(tmp_path, max_bytes=2000)
+    await cache.open()
+    for n in range(50):
+        cache.put(f"k{n}", {"n": n, "pad": "x" * 50}, time.time() + 60 + n)
+    await cache.close()
+
+    assert cache.stats()["compactions"] >= 1
+    assert cache.stats()["bytes"] <= 2000
+    cache = make_cache(tmp_path, max_bytes=2000)
+    await cache.open()
+    assert await cache.get("k49") == {"n": 49, "pad": "x" * 50}
+    assert await cache.get("k0") is None
+    await cache.close()
+
+
+@pytest.mark.asyncio
+async def test_each_process_gets_its_own_log(tmp_path):
+    """A locked log is skipped, so workers never share a file"""
+    first, second = make_cache(tmp_path), make_cache(tmp_path)
+    await first.open()
+    await second.open()
+    assert first.path != second.path
+    await first.close()
+    await second.close()
+
+
+@pytest.mark.asyncio
+async def test_served_from_disk_while_redis_is_down(tmp_path):
+    """Without Redis, reads fall back to disk and restarts warm L1"""
+    overrides = {"DISK_CACHE_ENABLED": True, "DISK_CACHE_DIR": str(tmp_path)}
+    with patch.multiple(settings, **overrides):
+        cache = CacheService(RedisService())
+        await cache.start()
+        await cache.set("weather:id:1", {"city": "London"})
+        cache.memory.clear()
+        assert (await cache.get("weather:id:1")).data == {"city": "London"}
+        await cache.stop()
+
+        cache = CacheService(RedisService())
+        await cache.start()
+        assert len(cache.memory) == 1
+        await cache.stop()
@@ -0,0 +1,76 @@
+import pytest
+
+from app.services.forecast import (
+    build_columns,
+    daily,
+    parse_fields,
+    rows_payload,
+    to_rows,
+)
+
+
+def owm_item(dt: int, temp: float, description: str = "clear sky") -> dict:
+    return {
+        "dt": dt,
+        "main": {
+            "temp": temp,
+            "feels_like": temp - 1,
+            "humidity": 60,
+            "pressure": 1012,
+        },
+        "weather": [{"description": description, "icon": "01d"}],
+        "wind": {"speed": 2.5},
+        "clouds": {"all": 10},
+        "dt_txt": "",
+    }
+
+
+# 2021-04-29 21:00 UTC onwards, every 3 hours
+ITEMS = [owm_item(1619730000 + i * 10800, 10.0 + i) for i in range(6)]
+
+
+def test_columns_intern_repeated_strings():
+    """Descriptions and icons are stored once and referenced by code"""
+    columns = build_columns(ITEMS + [owm_item(1619794800, 9.0, "light rain")])
+    assert columns["descriptions"] == ["clear sky", "light rain"]
+    assert columns["description"] == [0] * 6 + [1]
+    assert columns["temperature"][:2] == [10.0, 11.0]
+
+
+def test_rows_match_forecast_items():
+    """Rows carry the UTC date and time of each time step"""
+    rows = to_rows(build_columns(ITEMS), ["temperature"])
+    assert rows[0] == {
+        "date": "2021-04-29",
+        "time": "21:00:00",
+        "timestamp": 1619730000,
+        "temperature": 10.0,
+    }
+
+
+def test_daily_groups_by_local_day():
+    """Days are split in local time, here UTC+3"""
+    days = daily(build_columns(ITEMS), 3 * 3600, ["temperature", "description"])
+    assert [day["date"] for day in days] == ["2021-04-30"]
+    assert days[0]["temperature"] == {"min": 10.0, "max": 15.0, "mean": 12.5}
+    assert days[0]["description"] == "clear sky"
+
+    utc_days = daily(build_columns(ITEMS), 0, ["temperature"])
+    assert [day["samples"] for day in utc_days] == [1, 5]
+
+
+def test_legacy_row_entries_are_converted():
+    """Forecasts cached as rows still render"""
+    legacy = rows_payload(
+        {"city": "X", "country": "GB", "timezone": 0, "columns": build_columns(ITEMS)}
+    )
+    rendered = rows_payload(legacy)
+    assert rendered["forecast"] == legacy["forecast"]
+
+
+def test_parse_fields_rejects_unknown_names():
+    """Field selections are de-duplicated and validated"""
+    assert parse_fields("temperature, humidity") == ["temperature", "humidity"]
+    assert parse_fields(None) is None
+    with pytest.raises(ValueError):
+        parse_fields("temperature,snow")
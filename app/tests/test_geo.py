@@ -0,0 +1,22 @@
+from app.core.config import settings
+from app.services.city_index import CityIndex
+from app.services.geo import geohash_decode, geohash_encode, haversine_km
+
+
+def test_geohash_round_trip():
+    """Encoding matches the reference geohash and decodes to the cell centre"""
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    lat, lon = geohash_decode("u4pruydqqvj")
+    assert abs(lat - 57.64911) < 1e-5 and abs(lon - 10.40744) < 1e-5
+
+
+def test_haversine_km():
+    """London to Paris is about 344 km"""
+    assert 340 < haversine_km(51.5074, -0.1278, 48.8566, 2.3522) < 348
+
+
+def test_nearest_city_within_radius():
+    """Coordinates snap to the closest city only within the radius"""
+    index = CityIndex.load(settings.CITY_INDEX_PATH)
+    assert index.nearest(51.51, -0.09, 10).name == "London"
+    assert index.nearest(0.0, 0.0, 10) is None
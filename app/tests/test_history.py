@@ -0,0 +1,101 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fakeredis import aioredis
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.history import HistoryStore
+from app.services.redis_service import RedisService
+
+
+class SlowRedis(aioredis.FakeRedis):
+    async def zrangebyscore(self, *args, **kwargs):
+        await asyncio.sleep(1)
+
+
+def observation(timestamp: int, temperature: float) -> dict:
+    weather = {"temperature": temperature, "humidity": 50, "pressure": 1000}
+    return {
+        "timestamp": timestamp,
+        "weather": {**weather, "wind_speed": 2.5, "clouds": 40},
+    }
+
+
+@pytest.mark.asyncio
+async def test_rollups_update_incrementally():
+    """Points roll up per hour and day; repeated observations count once"""
+    redis_service = RedisService()
+    redis_service.redis_client = aioredis.FakeRedis()
+    history = HistoryStore(redis_service)
+    day = int(time.time()) // 86400 * 86400 - 86400
+
+    for timestamp, temperature in [
+        (day + 60, 10.0),
+        (day + 600, 14.0),
+        (day + 600, 14.0),  # fetched again by another worker
+        (day + 3600 + 60, 20.0),
+    ]:
+        history.record("id:1", observation(timestamp, temperature))
+        await history.close()
+
+    hours = await history.query("id:1", "hour", day, day + 86400)
+    assert [(h["start"], h["samples"]) for h in hours] == [
+        (day, 2),
+        (day + 3600, 1),
+    ]
+    assert hours[0]["temperature"] == {"min": 10.0, "max": 14.0, "mean": 12.0}
+
+    (summary,) = await history.query("id:1", "day", day, day)
+    assert summary["samples"] == 3
+    assert summary["temperature"] == {"min": 10.0, "max": 20.0, "mean": 14.67}
+    assert history.stats()["duplicates"] == 1
+
+
+@pytest.mark.asyncio
+async def test_history_calls_are_bounded_by_the_operation_deadline():
+    """A hung Redis fails reads and writes in time instead of piling them up"""
+
+    async def hang(*args, **kwargs):
+        await asyncio.sleep(1)
+
+    redis_service = RedisService()
+    redis_service.redis_client = SlowRedis()
+    redis_service.deadline = 0.01
+    history = HistoryStore(redis_service)
+
+    assert await asyncio.wait_for(history.query("id:1", "hour", 0, 1), 0.5) is None
+    with patch("redis.asyncio.client.Pipeline.execute", hang):
+        history.record("id:1", observation(int(time.time()), 10.0))
+        await asyncio.wait_for(history.close(), 0.5)
+
+    assert history.stats()["errors"] == 1
+    assert redis_service.deadline_exceeded == 2
+
+
+@patch(
+    "app.services.weather_service.WeatherService.get_history",
+    new_callable=AsyncMock,
+)
+def test_history_endpoint(mock_get_history):
+    """The endpoint validates its range and reports an unavailable store"""
+    with TestClient(app) as client:
+        response = client.get("/api/history?city=London&start=20&end=10")
+        assert response.status_code == 400
+
+        mock_get_history.return_value = {
+            "success": False,
+            "error": "History is temporarily unavailable",
+            "status_code": 503,
+        }
+        assert client.get("/api/history?city=London").status_code == 503
+
+        mock_get_history.return_value = {
+            "success": True,
+            "resolution": "day",
+            "points": [],
+        }
+        response = client.get("/api/history?city=London&resolution=day")
+        assert response.json() == {"success": True, "resolution": "day", "points": []}
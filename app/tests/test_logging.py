@@ -0,0 +1,39 @@
+import json
+import logging
+import queue
+
+from fastapi.testclient import TestClient
+
+from app.core.logging import REQUEST_ID, JsonFormatter, QueueHandler
+from app.main import app
+
+
+def test_records_are_formatted_by_the_listener():
+    """Queued records keep their arguments and carry the request id"""
+    handler = QueueHandler(queue.Queue(1))
+    token = REQUEST_ID.set("abc123")
+    try:
+        for n in range(2):
+            handler.handle(
+                logging.makeLogRecord(
+                    {"name": "weatherpy", "msg": "Retrieved %s", "args": (n,)}
+                )
+            )
+    finally:
+        REQUEST_ID.reset(token)
+
+    record = handler.queue.get_nowait()
+    assert record.args == (0,) and handler.dropped == 1
+    line = json.loads(JsonFormatter().format(record))
+    assert line["message"] == "Retrieved 0"
+    assert line["request_id"] == "abc123"
+
+
+def test_request_id_is_echoed():
+    """Safe client ids are kept; others are replaced"""
+    with TestClient(app) as client:
+        response = client.get("/health", headers={"X-Request-ID": "req-42"})
+        assert response.headers["x-request-id"] == "req-42"
+
+        response = client.get("/health", headers={"X-Request-ID": "bad id\t"})
+        assert len(response.headers["x-request-id"]) == 32
@@ -0,0 +1,27 @@
+from app.core.metrics import Counter, Histogram, Registry
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Histogram buckets are cumulative and end with +Inf, _sum and _count"""
+    registry = Registry()
+    latency = registry.register(
+        Histogram("test_seconds", "Test latency", ("stage",), buckets=(0.1, 1.0))
+    )
+    latency.labels("upstream").observe(0.05)
+    latency.labels("upstream").observe(0.5)
+    latency.labels("upstream").observe(5)
+
+    body = registry.render()
+    assert 'test_seconds_bucket{stage="upstream",le="0.1"} 1' in body
+    assert 'test_seconds_bucket{stage="upstream",le="1.0"} 2' in body
+    assert 'test_seconds_bucket{stage="upstream",le="+Inf"} 3' in body
+    assert 'test_seconds_count{stage="upstream"} 3' in body
+
+
+def test_counter_renders_total_suffix():
+    """Counters are exposed with a _total suffix and escaped labels"""
+    registry = Registry()
+    requests = registry.register(Counter("test_requests", "Requests", ("route",)))
+    requests.labels('/a"b').inc()
+
+    assert 'test_requests_total{route="/a\\"b"} 1.0' in registry.render()
@@ -0,0 +1,71 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+from fakeredis import aioredis
+
+from app.core.config import settings
+from app.services.negative_filter import BloomFilter, NegativeFilter
+from app.services.redis_service import RedisService
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Every added item is found and unrelated items mostly are not"""
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for n in range(1000):
+        bloom.add(f"q:bad{n}")
+
+    assert all(f"q:bad{n}" in bloom for n in range(1000))
+    false_positives = sum(f"q:good{n}" in bloom for n in range(10000))
+    assert false_positives < 300
+
+
+@pytest.mark.asyncio
+async def test_filters_are_shared_through_redis():
+    """A key added on one worker is rejected on another after a sync"""
+    redis_service = RedisService()
+    redis_service.redis_client = aioredis.FakeRedis()
+    first, second = NegativeFilter(redis_service), NegativeFilter(redis_service)
+
+    first.add("q:asdfgh")
+    assert "q:asdfgh" in first
+    assert "q:asdfgh" not in second
+
+    await first.sync()
+    await second.sync()
+    assert "q:asdfgh" in second
+    assert "q:london" not in second
+
+
+def test_entries_expire_with_the_negative_cache():
+    """Filter generations follow NEGATIVE_CACHE_TTL, not a fixed day"""
+    with patch.object(settings, "NEGATIVE_CACHE_TTL", 300):
+        negative = NegativeFilter(RedisService())
+        negative.add("q:asdfgh")
+        assert "q:asdfgh" in negative
+
+        later = time.time() + 2 * 300
+        with patch("app.services.negative_filter.time.time", return_value=later):
+            negative._rotate()
+        assert "q:asdfgh" not in negative
+
+
+@pytest.mark.asyncio
+async def test_sync_is_bounded_by_the_operation_deadline():
+    """A hung Redis fails the sync in time and keeps the keys to push"""
+
+    async def hang(*args, **kwargs):
+        await asyncio.sleep(1)
+
+    redis_service = RedisService()
+    redis_service.redis_client = aioredis.FakeRedis()
+    redis_service.deadline = 0.01
+    negative = NegativeFilter(redis_service)
+    negative.add("q:asdfgh")
+
+    with patch("redis.asyncio.client.Pipeline.execute", hang):
+        await negative.sync()
+
+    assert redis_service.deadline_exceeded == 1
+    assert negative.stats()["pending"] == 1
@@ -0,0 +1,85 @@
+import asyncio
+import time
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fakeredis import aioredis
+
+from app.core.config import settings
+from app.services.cache_service import CacheEntry
+from app.services.http_client import HTTPClientService
+from app.services.prewarm import PrewarmScheduler
+from app.services.redis_service import RedisService
+from app.services.weather_service import WeatherService
+
+
+def make_scheduler() -> PrewarmScheduler:
+    redis_service = RedisService()
+    weather_service = WeatherService(redis_service, HTTPClientService())
+    return PrewarmScheduler(weather_service, redis_service)
+
+
+@pytest.mark.asyncio
+async def test_hot_keys_include_configured_cities():
+    """Configured cities are expanded into one key per cache kind"""
+    scheduler = make_scheduler()
+    with patch.object(settings, "PREWARM_CITIES", ["London,GB", "Paris,FR"]):
+        with patch.object(settings, "PREWARM_KINDS", ["weather", "forecast"]):
+            keys = await scheduler.hot_keys()
+
+    assert keys == [
+        "weather:q:london,gb",
+        "weather:q:paris,fr",
+        "forecast:q:london,gb",
+        "forecast:q:paris,fr",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_refreshes_only_entries_going_stale_before_next_visit():
+    """Entries fresh past the next visit are skipped"""
+    scheduler = make_scheduler()
+    memory = scheduler.weather_service.cache.memory
+    now = time.time()
+    memory.set("weather:A", CacheEntry({}, now + 500, now + 900), size=1)
+    memory.set("weather:B", CacheEntry({}, now + 100, now + 900), size=1)
+
+    assert not await scheduler._needs_refresh("weather:A", horizon=480)
+    assert await scheduler._needs_refresh("weather:B", horizon=480)
+    assert await scheduler._needs_refresh("weather:C", horizon=480)
+    # Scans are not cache traffic
+    assert memory.stats()["hits"] == memory.stats()["misses"] == 0
+    assert scheduler.weather_service.cache.stats()["l2"] == {"hits": 0, "misses": 0}
+
+
+@pytest.mark.asyncio
+async def test_no_leader_without_redis():
+    """With Redis down no replica takes pre-warm leadership"""
+    scheduler = make_scheduler()
+    assert scheduler.redis_service.redis_client is None
+    with patch.object(scheduler, "_lead", new_callable=AsyncMock) as lead:
+        task = asyncio.create_task(scheduler._leader_loop())
+        await asyncio.sleep(0.05)
+        task.cancel()
+
+    assert not scheduler.is_leader
+    lead.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_hit_count_flush_is_bounded_by_the_operation_deadline():
+    """A hung Redis cannot stall the scheduler while sharing hit counts"""
+
+    async def hang(*args, **kwargs):
+        await asyncio.sleep(1)
+
+    scheduler = make_scheduler()
+    redis_service = scheduler.redis_service
+    redis_service.redis_client = aioredis.FakeRedis()
+    redis_service.deadline = 0.01
+    scheduler.weather_service.key_hits["weather:id:1"] = 3
+
+    with patch("redis.asyncio.client.Pipeline.execute", hang):
+        await asyncio.wait_for(scheduler.flush_hits(), 0.5)
+
+    assert redis_service.deadline_exceeded == 1
@@ -0,0 +1,68 @@
+from unittest.mock import patch
+
+from fakeredis import aioredis
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.logging import RequestIdMiddleware
+from app.core.profiling import (
+    ProfileStore,
+    ProfilingMiddleware,
+    profile_token,
+    verify_token,
+)
+from app.main import app
+from app.services.redis_service import RedisService
+
+
+def test_profile_tokens_are_signed_and_expire():
+    token = profile_token("secret")
+    assert verify_token("secret", token)
+    assert not verify_token("other", token)
+    assert not verify_token("secret", profile_token("secret", ttl=-1))
+
+
+def test_signed_request_is_profiled():
+    """Only requests with a valid token are profiled, with their Redis spans"""
+    redis_service = RedisService()
+    redis_service.redis_client = aioredis.FakeRedis()
+    profiled_app = FastAPI()
+    profiled_app.state.profiles = ProfileStore(redis_service)
+    profiled_app.add_middleware(ProfilingMiddleware)
+    profiled_app.add_middleware(RequestIdMiddleware)
+
+    @profiled_app.get("/ping")
+    async def ping():
+        await redis_service.get("weather:id:1")
+        return {"ok": True}
+
+    with patch.object(settings, "PROFILING_SECRET", "secret"):
+        client = TestClient(profiled_app)
+        assert "x-profile-id" not in client.get("/ping").headers
+        headers = {"X-Profile": profile_token("secret"), "X-Request-ID": "abc"}
+        response = client.get("/ping", headers=headers)
+        # A reused request id cannot overwrite an earlier profile
+        client.get("/ping", headers=headers)
+
+    profile_id = response.headers["x-profile-id"]
+    assert profile_id != "abc"
+    profile = profiled_app.state.profiles.recent[profile_id]
+    assert profile["request_id"] == "abc"
+    assert profile["path"] == "/ping" and profile["status"] == 200
+    assert profile["totals"]["redis"]["count"] == 1
+    assert profile["totals"]["handler"]["count"] == 1
+    assert len(profiled_app.state.profiles.recent) == 2
+
+
+def test_debug_endpoints_require_a_token():
+    settings_patch = {"PROFILING_ENABLED": True, "PROFILING_SECRET": "secret"}
+    with TestClient(app) as client, patch.multiple(settings, **settings_patch):
+        assert client.get("/debug/profiles").status_code == 403
+        headers = {"X-Profile": profile_token("secret")}
+        response = client.get("/debug/profiles", headers=headers)
+        assert response.json() == {"profiles": []}
+        assert client.get("/debug/profiles/nope", headers=headers).status_code == 404
+
+    with TestClient(app) as client:
+        assert client.get("/debug/profiles").status_code == 404
@@ -0,0 +1,65 @@
+from unittest.mock import patch
+
+import pytest
+import redis.asyncio as redis
+from fakeredis import aioredis
+
+from app.core.config import settings
+from app.services.rate_limiter import RateLimiter
+from app.services.redis_service import RedisService
+
+
+@pytest.mark.asyncio
+async def test_rejects_calls_beyond_budget():
+    """Calls beyond the per-minute budget are rejected once the wait expires"""
+    limiter = RateLimiter(RedisService())
+    limiter.enabled = True
+    limiter.local[0].capacity = limiter.local[0].tokens = 2
+
+    assert await limiter.acquire(max_wait=0)
+    assert await limiter.acquire(max_wait=0)
+    assert not await limiter.acquire(max_wait=0)
+
+    stats = limiter.stats()
+    assert stats["allowed"] == 2
+    assert stats["rejected"] == 1
+    assert stats["minute_remaining"] == 0
+
+
+@pytest.mark.asyncio
+async def test_queues_until_a_token_refills():
+    """A call waits for the bucket to refill when within the deadline"""
+    limiter = RateLimiter(RedisService())
+    limiter.enabled = True
+    bucket = limiter.local[0]
+    bucket.tokens = 0
+    bucket.rate = 100.0  # one token every 10ms
+
+    assert await limiter.acquire(max_wait=1.0)
+    assert limiter.stats()["queued"] == 1
+
+
+class DownRedis(aioredis.FakeRedis):
+    async def eval(self, *args, **kwargs):
+        raise redis.ConnectionError("down")
+
+
+@pytest.mark.asyncio
+async def test_lost_redis_falls_back_to_local_buckets_once():
+    """A connection error takes Redis out of use and is logged once"""
+    redis_service = RedisService()
+    with patch.object(
+        RedisService, "_create_client", lambda self: DownRedis()
+    ), patch.object(settings, "REDIS_RECONNECT_MIN_DELAY", 10.0):
+        await redis_service.connect()
+        limiter = RateLimiter(redis_service)
+        limiter.enabled = True
+        with patch("app.services.rate_limiter.logger") as logger:
+            for _ in range(3):
+                assert await limiter.acquire(max_wait=0)
+
+    assert redis_service.redis_client is None
+    assert redis_service.stats()["errors"] == 1
+    assert limiter.local_fallback
+    logger.warning.assert_called_once()
+    await redis_service.close()
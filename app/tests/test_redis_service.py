@@ -0,0 +1,79 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+import redis.asyncio as redis
+from fakeredis import aioredis
+
+from app.core.config import settings
+from app.services.redis_service import RedisService
+
+
+class SlowRedis(aioredis.FakeRedis):
+    async def get(self, key):
+        await asyncio.sleep(1)
+
+    async def set(self, *args, **kwargs):
+        await asyncio.sleep(1)
+
+
+class FlakyRedis(aioredis.FakeRedis):
+    """Fails with a connection error until ``healthy`` is set"""
+
+    healthy = False
+
+    async def ping(self, **kwargs):
+        if not self.healthy:
+            raise redis.ConnectionError("down")
+        return await super().ping(**kwargs)
+
+
+@pytest.mark.asyncio
+async def test_slow_redis_read_is_a_miss():
+    """A read past the operation deadline returns None without disconnecting"""
+    service = RedisService()
+    service.deadline = 0.01
+    with patch.object(RedisService, "_create_client", lambda self: SlowRedis()):
+        await service.connect()
+
+    assert await service.get("weather:id:1") is None
+    assert service.stats()["deadline_exceeded"] == 1
+    assert service.stats()["available"]
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_hung_lock_call_is_bounded():
+    """Lock calls observe the deadline; strict callers do not get a token"""
+    service = RedisService()
+    service.deadline = 0.01
+    with patch.object(RedisService, "_create_client", lambda self: SlowRedis()):
+        await service.connect()
+
+    assert await service.acquire_lock("lock:a", 1) is not None
+    assert await service.acquire_lock("lock:a", 1, fail_open=False) is None
+    assert service.stats()["deadline_exceeded"] == 2
+    await service.close()
+
+
+@pytest.mark.asyncio
+async def test_reconnects_after_outage():
+    """An unreachable Redis is skipped, then restored once it answers again"""
+    service = RedisService()
+    client = FlakyRedis()
+    delays = {"REDIS_RECONNECT_MIN_DELAY": 0.01, "REDIS_RECONNECT_MAX_DELAY": 0.02}
+    with patch.object(
+        RedisService, "_create_client", lambda self: client
+    ), patch.multiple(settings, **delays):
+        await service.connect()
+        assert service.redis_client is None
+        assert await service.set("weather:id:1", {"temp": 1}) is False
+
+        client.healthy = True
+        await asyncio.wait_for(service.available.wait(), 1)
+
+    assert service.redis_client is client
+    assert service.stats()["reconnects"] == 1
+    assert await service.set("weather:id:1", {"temp": 1})
+    assert await service.get("weather:id:1") == {"temp": 1}
+    await service.close()
@@ -0,0 +1,34 @@
+from unittest.mock import patch
+
+from app.core.config import settings
+from app.server import uvicorn_options
+
+
+def test_production_options_come_from_settings():
+    """Worker count and graceful shutdown follow settings"""
+    with patch.object(settings, "DEBUG", False), patch.object(
+        settings, "WEB_WORKERS", 4
+    ), patch.object(settings, "SERVER_LOOP", "asyncio"):
+        options = uvicorn_options()
+
+    assert options["workers"] == 4
+    assert options["loop"] == "asyncio"
+    assert options["timeout_graceful_shutdown"] == int(
+        settings.GRACEFUL_SHUTDOWN_TIMEOUT
+    )
+    assert "reload" not in options
+
+
+def test_missing_accelerator_falls_back():
+    """Asking for an uninstalled uvloop falls back to asyncio"""
+    with patch.object(settings, "DEBUG", False), patch.object(
+        settings, "SERVER_LOOP", "uvloop"
+    ), patch("app.server.importlib.util.find_spec", return_value=None):
+        assert uvicorn_options()["loop"] == "asyncio"
+
+
+def test_debug_mode_reloads_in_one_process():
+    """Debug mode keeps auto-reload, which needs a single process"""
+    with patch.object(settings, "DEBUG", True):
+        options = uvicorn_options()
+    assert options["reload"] is True and "workers" not in options
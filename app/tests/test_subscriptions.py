@@ -0,0 +1,97 @@
+import json
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.redis_service import RedisService
+from app.services.subscriptions import Subscriber, SubscriptionHub
+
+LONDON = {"success": True, "city": "London", "country": "GB"}
+
+
+@pytest.mark.asyncio
+async def test_hub_fans_out_and_drops_slow_subscribers():
+    """Each update is queued once per subscriber; full queues are dropped"""
+    hub = SubscriptionHub(RedisService())
+    fast, slow = hub.connect(), hub.connect()
+    hub.subscribe(fast, ["weather:id:1"])
+    hub.subscribe(slow, ["weather:id:1", "weather:id:2"])
+    assert hub.counts() == {"weather:id:1": 2, "weather:id:2": 1}
+
+    for n in range(9):
+        await hub.publish("weather:id:1", b'{"temp":%d}' % n)
+        fast.queue.get_nowait()
+
+    assert not fast.dropped and fast.queue.empty()
+    assert slow.dropped and slow not in hub.connections
+    assert hub.counts() == {"weather:id:1": 1}
+    assert hub.stats()["dropped"] == 1
+    messages = [slow.queue.get_nowait() for _ in range(slow.queue.qsize())]
+    assert messages[-1] is None
+    assert json.loads(messages[0]) == {"key": "weather:id:1", "data": {"temp": 0}}
+
+
+@patch(
+    "app.services.weather_service.WeatherService.get_current_weather",
+    new_callable=AsyncMock,
+)
+def test_websocket_snapshot_then_updates(mock_get_weather):
+    """A subscription gets the current snapshot, then published updates"""
+    mock_get_weather.return_value = LONDON
+    with TestClient(app) as client:
+        with client.websocket_connect("/api/weather/ws") as websocket:
+            websocket.send_json({"subscribe": ["London,GB"]})
+            snapshot = websocket.receive_json()
+            assert snapshot["data"] == LONDON
+
+            client.portal.call(
+                app.state.hub.publish, snapshot["key"], b'{"city":"London"}'
+            )
+            update = websocket.receive_json()
+            assert update == {"key": snapshot["key"], "data": {"city": "London"}}
+
+            websocket.send_json({"subscribe": "London"})
+            assert websocket.receive_json()["status_code"] == 400
+
+
+@patch(
+    "app.services.weather_service.WeatherService.get_current_weather",
+    new_callable=AsyncMock,
+)
+def test_sse_subscription(mock_get_weather):
+    """SSE sends snapshots and errors, then queued updates until dropped"""
+    mock_get_weather.side_effect = [
+        LONDON,
+        {"success": False, "error": "City not found", "status_code": 404},
+    ]
+    subscriber = Subscriber(buffer=8)
+    subscriber.queue.put_nowait(b'{"key":"weather:id:1","data":{}}')
+    subscriber.queue.put_nowait(None)
+    with TestClient(app) as client, patch.object(
+        SubscriptionHub, "connect", return_value=subscriber
+    ):
+        response = client.get("/api/weather/subscribe?city=London&city=Nowhere")
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [
+        frame.split("\n")
+        for frame in response.text.strip().split("\n\n")
+        if not frame.startswith(":")
+    ]
+    assert [lines[0] for lines in events] == [
+        "event: update",
+        "event: error",
+        "event: update",
+        "event: end",
+    ]
+    assert json.loads(events[1][1].removeprefix("data: "))["status_code"] == 404
+    assert not subscriber.keys
+
+
+def test_subscription_city_limit():
+    """Too many cities in one subscription is a 400"""
+    with TestClient(app) as client:
+        query = "&".join(f"city=c{n}" for n in range(21))
+        assert client.get(f"/api/weather/subscribe?{query}").status_code == 400
@@ -0,0 +1,171 @@
+import asyncio
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services.group_batcher import GroupBatcher
+from app.services.http_client import HTTPClientService
+from app.services.rate_limiter import RateLimiter
+from app.services.redis_service import RedisService
+from app.services.upstream import UpstreamClient
+
+
+def make_upstream(handler) -> UpstreamClient:
+    """Build an UpstreamClient whose HTTP client is served by ``handler``"""
+    http_client = HTTPClientService()
+    http_client.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    upstream = UpstreamClient(http_client, RateLimiter(RedisService()))
+    upstream.rate_limiter.enabled = False
+    return upstream
+
+
+@pytest.mark.asyncio
+async def test_non_json_error_body_becomes_error_result():
+    """An HTML error page is reported, not raised"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(404, text="<html>Not Found</html>")
+
+    data, error = await make_upstream(handler).get_json("weather", {"q": "x"})
+
+    assert data is None
+    assert error == {
+        "success": False,
+        "error": "<html>Not Found</html>",
+        "status_code": 404,
+    }
+
+
+@pytest.mark.asyncio
+async def test_server_errors_are_retried():
+    """5xx responses are retried with backoff until one succeeds"""
+    statuses = [503, 502, 200]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(statuses.pop(0), json={"ok": True})
+
+    upstream = make_upstream(handler)
+    with patch.object(settings, "UPSTREAM_RETRY_BACKOFF", 0.001):
+        data, error = await upstream.get_json("weather", {"q": "x"})
+
+    assert data == {"ok": True} and error is None
+    assert upstream.retried == 2
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_fails_fast():
+    """While the breaker is open no request is sent"""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(500, json={"message": "boom"})
+
+    upstream = make_upstream(handler)
+    upstream.retries = 0
+    upstream.breaker.min_calls = 2
+    for _ in range(2):
+        await upstream.get_json("weather", {"q": "x"})
+
+    _, error = await upstream.get_json("weather", {"q": "x"})
+
+    assert len(calls) == 2
+    assert error["status_code"] == 503
+    assert upstream.stats()["breaker"]["state"] == "open"
+
+
+@pytest.mark.asyncio
+async def test_cancelled_probe_is_given_back():
+    """A half-open probe cancelled mid-request does not block later probes"""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.params["q"] == "slow":
+            await asyncio.sleep(1)
+        return httpx.Response(200, json={"ok": True})
+
+    upstream = make_upstream(handler)
+    breaker = upstream.breaker
+    breaker.half_open_calls = 1
+    breaker.open_seconds = 0
+    breaker._open()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(upstream.get_json("weather", {"q": "slow"}), 0.01)
+    assert breaker.state == "half_open"
+
+    data, error = await upstream.get_json("weather", {"q": "fast"})
+    assert data == {"ok": True} and error is None
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_slow_request_is_hedged():
+    """A second attempt is sent once the first outlasts the hedge delay"""
+    delays = [1.0, 0.0]
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(delays.pop(0))
+        return httpx.Response(200, json={"ok": True})
+
+    upstream = make_upstream(handler)
+    upstream.hedge_enabled = True
+    upstream.hedge_threshold = 0.01
+
+    data, _ = await asyncio.wait_for(upstream.get_json("weather", {"q": "x"}), 0.5)
+
+    assert data == {"ok": True}
+    assert upstream.hedged == 1 and upstream.hedge_wins == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_share_a_group_call():
+    """Distinct ids merge into one group call; unmatched ids are fetched singly"""
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url)
+        if request.url.path.endswith("/group"):
+            items = [
+                {"id": 1, "name": "One", "sys": {"country": "GB", "timezone": 0}},
+                {"id": 2, "name": "Two", "sys": {"country": "US", "timezone": 0}},
+            ]
+            return httpx.Response(200, json={"cnt": 2, "list": items})
+        return httpx.Response(200, json={"id": 3, "name": "Three"})
+
+    batcher = GroupBatcher(make_upstream(handler), {"units": "metric"})
+    results = await asyncio.gather(
+        batcher.get(1, "GB", {"q": "One,GB"}),
+        batcher.get(1, "GB", {"q": "One,GB"}),
+        batcher.get(2, "FR", {"q": "Two,FR"}),
+        batcher.get(3, "DE", {"q": "Three,DE"}),
+    )
+
+    assert [data["name"] for data, _ in results] == ["One", "One", "Three", "Three"]
+    assert [url.path.rsplit("/", 1)[-1] for url in requests] == [
+        "group",
+        "weather",
+        "weather",
+    ]
+    assert requests[0].params["id"] == "1,2,3"
+    assert batcher.stats()["batched"] == 1
+    assert batcher.stats()["fallbacks"] == 2
+
+
+@pytest.mark.asyncio
+async def test_rejected_group_call_disables_batching():
+    """A key without group access falls back to single calls for good"""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.path.endswith("/group"):
+            return httpx.Response(401, json={"message": "Invalid API key"})
+        return httpx.Response(200, json={"name": request.url.params["q"]})
+
+    batcher = GroupBatcher(make_upstream(handler), {})
+    results = await asyncio.gather(
+        batcher.get(1, "GB", {"q": "One"}), batcher.get(2, "GB", {"q": "Two"})
+    )
+
+    assert [data["name"] for data, _ in results] == ["One", "Two"]
+    assert not batcher.enabled
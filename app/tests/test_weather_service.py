@@ -0,0 +1,261 @@
+import asyncio
+import time
+from unittest.mock import patch
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.services.cache_service import CacheEntry
+from app.services.http_client import HTTPClientService
+from app.services.redis_service import RedisService
+from app.services.weather_service import WeatherService
+
+OWM_WEATHER = {
+    "name": "London",
+    "sys": {"country": "GB"},
+    "weather": [{"description": "few clouds", "icon": "02d"}],
+    "main": {"temp": 18.5, "feels_like": 17.9, "humidity": 65, "pressure": 1013},
+    "wind": {"speed": 3.6},
+    "clouds": {"all": 20},
+    "dt": 1619712000,
+    "timezone": 3600,
+}
+
+
+def make_service(handler) -> WeatherService:
+    """Build a WeatherService whose HTTP client is served by ``handler``"""
+    http_client = HTTPClientService()
+    http_client.client = httpx.AsyncClient(
+        transport=httpx.MockTransport(handler),
+        event_hooks={"request": [http_client._on_request]},
+    )
+    return WeatherService(redis_service=RedisService(), http_client=http_client)
+
+
+@pytest.mark.asyncio
+async def test_current_weather_uses_shared_client():
+    """Every upstream call goes through the one shared client"""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.params["q"])
+        return httpx.Response(200, json=OWM_WEATHER)
+
+    service = make_service(handler)
+    first = await service.get_current_weather("London")
+    await service.get_current_weather("Paris", "FR")
+
+    assert first["city"] == "London"
+    assert first["weather"]["temperature"] == 18.5
+    assert calls == ["London", "Paris,FR"]
+    assert service.http_client.stats()["requests_sent"] == 2
+    await service.http_client.close()
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_are_coalesced():
+    """Concurrent misses for one city share a single upstream fetch"""
+    calls = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.params["q"])
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=OWM_WEATHER)
+
+    service = make_service(handler)
+    results = await asyncio.gather(
+        *(service.get_current_weather("London") for _ in range(10))
+    )
+
+    assert len(calls) == 1
+    assert all(result["city"] == "London" for result in results)
+    assert service.coalescing_stats()["coalesced"] == 9
+    await service.http_client.close()
+
+
+@pytest.mark.asyncio
+async def test_stale_entry_served_while_refreshing():
+    """A stale entry is returned at once and refreshed in the background"""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.params["q"])
+        return httpx.Response(200, json=OWM_WEATHER)
+
+    service = make_service(handler)
+    now = time.time()
+    stale = CacheEntry({"city": "Old London"}, now - 1, now + 60)
+    service.cache.memory.set(service.cache_key("weather", "London"), stale, size=1)
+
+    result = await service.get_current_weather("London")
+    assert result == {"city": "Old London", "stale": True}
+
+    await asyncio.gather(*service._background)
+    assert calls == ["London"]
+    assert (await service.get_current_weather("London"))["city"] == "London"
+    await service.http_client.close()
+
+
+@pytest.mark.asyncio
+async def test_batch_fetches_each_distinct_miss_once():
+    """Batch lookups dedupe keys and serve cached entries without fetching"""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.params["q"])
+        if request.url.params["q"] == "Nowhere":
+            return httpx.Response(404, json={"message": "city not found"})
+        return httpx.Response(200, json=OWM_WEATHER)
+
+    service = make_service(handler)
+    await service.get_current_weather("London")
+
+    results = await service.get_current_weather_batch(
+        [("London", None), ("Paris", "FR"), ("Paris", "FR"), ("Nowhere", None)]
+    )
+
+    assert calls == ["London", "Paris,FR", "Nowhere"]
+    assert [result["success"] for result in results] == [True, True, True, False]
+    assert results[3]["status_code"] == 404
+    await service.http_client.close()
+
+
+@pytest.mark.asyncio
+async def test_stream_yields_cache_hits_first():
+    """Streaming batches emit cached cities before upstream fetches resolve"""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.01)
+        return httpx.Response(200, json=OWM_WEATHER)
+
+    service = make_service(handler)
+    await service.get_current_weather("London")
+
+    stream = service.stream_current_weather_batch(
+        [("Paris", "FR"), ("Rome", "IT"), ("London", None)]
+    )
+    indexes = [index async for index, _ in stream]
+
+    assert indexes[0] == 2
+    assert sorted(indexes) == [0, 1, 2]
+    await service.http_client.close()
+
+
+@pytest.mark.asyncio
+async def test_stale_served_when_rate_limited():
+    """With the budget spent, stale data is served instead of an error"""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.params["q"])
+        return httpx.Response(200, json=OWM_WEATHER)
+
+    service = make_service(handler)
+    service.rate_limiter.enabled = True
+    service.rate_limiter.max_wait = 0
+    for bucket in service.rate_limiter.local:
+        bucket.tokens = 0
+
+    now = time.time()
+    stale = CacheEntry({"city": "Old London"}, now - 1, now + 60)
+    service.cache.memory.set(service.cache_key("weather", "London"), stale, size=1)
+
+    with patch.object(settings, "CACHE_STALE_WHILE_REVALIDATE", False):
+        result = await service.get_current_weather("London")
+        missing = await service.get_current_weather("Paris")
+
+    assert result == {"city": "Old London", "stale": True}
+    assert missing["status_code"] == 503
+    assert calls == []
+    await service.http_client.close()
+
+
+@pytest.mark.asyncio
+async def test_nearby_coordinates_share_one_grid_cell():
+    """Points in one geohash cell share a cache key and one upstream fetch"""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append((request.url.params["lat"], request.url.params["lon"]))
+        return httpx.Response(200, json=OWM_WEATHER)
+
+    service = make_service(handler)
+    with patch.object(settings, "DISTRIBUTED_LOCK_ENABLED", False):
+        await service.get_current_weather(lat=47.6101, lon=-122.2015)
+        await service.get_current_weather(lat=47.6112, lon=-122.2003)
+
+    assert service._locate(lat=47.6101, lon=-122.2015)[0] == "geo:c23ng"
+    assert len(calls) == 1
+    await service.http_client.close()
+
+
+@pytest.mark.asyncio
+async def test_close_drains_in_flight_fetches():
+    """Shutdown waits for a running upstream fetch and caches its result"""
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, json=OWM_WEATHER)
+
+    service = make_service(handler)
+    request = asyncio.create_task(service.get_current_weather("London"))
+    await asyncio.sleep(0.01)
+    request.cancel()  # the client went away, the fetch keeps going
+
+    await service.close(timeout=1.0)
+
+    entry = await service.cache.get(service.cache_key("weather", "London"))
+    assert entry is not None and entry.data["city"] == "London"
+    await service.http_client.close()
+
+
+@pytest.mark.asyncio
+async def test_not_found_is_cached_but_server_errors_are_not():
+    """404s are answered locally afterwards; 5xx go back to the upstream"""
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        city = request.url.params["q"]
+        calls.append(city)
+        if city == "Asdfgh":
+            return httpx.Response(404, json={"cod": "404", "message": "city not found"})
+        return httpx.Response(503, json={"message": "busy"})
+
+    with patch.object(settings, "UPSTREAM_RETRIES", 0):
+        service = make_service(handler)
+        for _ in range(3):
+            assert (await service.get_current_weather("Asdfgh"))["status_code"] == 404
+        await service.get_current_weather("Busytown")
+        await service.get_current_weather("Busytown")
+
+    # Repeats are rejected by the filter before any cache lookup
+    assert calls == ["Asdfgh", "Busytown", "Busytown"]
+    stats = service.negative_stats()
+    assert stats["cached"] == 1
+    assert stats["filter_hits"] == 2
+    assert stats["upstream_calls_saved"] == 2
+
+    # Without the filter, the short-lived cache entry answers
+    service.negative.enabled = False
+    assert (await service.get_current_weather("asdfgh"))["status_code"] == 404
+    assert service.negative_stats()["cache_hits"] == 1
+    assert len(calls) == 3
+    assert "weather:q:asdfgh" not in service.key_hits
+    await service.http_client.close()
+
+
+@pytest.mark.asyncio
+async def test_key_hits_are_counted_only_for_prewarm_and_bounded():
+    """Without pre-warming nothing is kept; with it the counter stays small"""
+    service = make_service(lambda request: httpx.Response(200, json=OWM_WEATHER))
+
+    for i in range(20):
+        await service.get_current_weather(f"Nowhere {i}")
+    assert not service.key_hits
+
+    with patch.multiple(settings, PREWARM_ENABLED=True, PREWARM_TOP_N=2):
+        for i in range(20):
+            await service.get_current_weather(f"Nowhere {i}")
+    assert 0 < len(service.key_hits) <= 8
+    await service.http_client.close()
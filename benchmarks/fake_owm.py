@@ -0,0 +1,217 @@
+"""
+Local stand-in for the OpenWeatherMap API.
+
+Serves ``/data/2.5/weather``, ``/data/2.5/forecast`` and ``/data/2.5/group``
+with responses in the upstream shape, after a configurable delay and with
+a configurable error rate and payload size. Use it in-process through
+``httpx.ASGITransport(FakeOpenWeatherMap().app)`` or run it standalone:
+
+    python -m benchmarks.fake_owm --port 9001 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from app.core.config import settings
+from app.services.city_index import CityIndex
+
+STEP_SECONDS = 3 * 3600
+DESCRIPTIONS = [
+    ("clear sky", "01d"),
+    ("few clouds", "02d"),
+    ("scattered clouds", "03d"),
+    ("light rain", "10d"),
+]
+
+
+class FakeOpenWeatherMap:
+    """Configurable fake upstream that counts the calls it receives"""
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        forecast_items: int = 40,
+        padding: int = 0,
+        seed: int = 0,
+        cities: Optional[Dict[int, Tuple[str, str]]] = None,
+    ):
+        """
+        ``latency`` plus up to ``jitter`` seconds is added to every call;
+        ``error_rate`` of calls answer 500. ``forecast_items`` sets the
+        forecast length and ``padding`` adds that many bytes to each body.
+        ``cities`` maps the ids group calls may ask for to (name, country).
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.forecast_items = forecast_items
+        self.padding = "x" * padding
+        self.random = random.Random(seed)
+        self.cities = cities or {}
+        self.calls: Counter = Counter()
+        self.app = Starlette(
+            routes=[
+                Route("/data/2.5/weather", self.weather),
+                Route("/data/2.5/forecast", self.forecast),
+                Route("/data/2.5/group", self.group),
+            ]
+        )
+
+    def reset(self) -> None:
+        """Forget counted calls"""
+        self.calls.clear()
+
+    async def _delay(self) -> bool:
+        """Sleep for the configured latency; False if this call should fail"""
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+        return self.random.random() >= self.error_rate
+
+    @staticmethod
+    def _place(request: Request) -> Dict[str, Any]:
+        params = request.query_params
+        if "q" in params:
+            name, _, country = params["q"].partition(",")
+            return {"name": name, "country": country or "XX", "lat": 0.0, "lon": 0.0}
+        return {
+            "name": f"Cell {params.get('lat')},{params.get('lon')}",
+            "country": "XX",
+            "lat": float(params.get("lat", 0)),
+            "lon": float(params.get("lon", 0)),
+        }
+
+    async def weather(self, request: Request) -> JSONResponse:
+        self.calls["weather"] += 1
+        if not await self._delay():
+            return JSONResponse({"cod": 500, "message": "Internal error"}, 500)
+
+        return JSONResponse({**self._current(self._place(request)), "timezone": 3600})
+
+    async def group(self, request: Request) -> JSONResponse:
+        """Current weather for the known ids in ``id``; unknown ids are left out"""
+        self.calls["group"] += 1
+        if not await self._delay():
+            return JSONResponse({"cod": 500, "message": "Internal error"}, 500)
+
+        items = []
+        for value in request.query_params.get("id", "").split(","):
+            if not value.isdigit() or int(value) not in self.cities:
+                continue
+            name, country = self.cities[int(value)]
+            item = self._current(
+                {"name": name, "country": country, "lat": 0.0, "lon": 0.0}
+            )
+            # Group items carry the UTC offset under sys
+            item["sys"]["timezone"] = 3600
+            items.append({"id": int(value), **item})
+        return JSONResponse({"cnt": len(items), "list": items})
+
+    def _current(self, place: Dict[str, Any]) -> Dict[str, Any]:
+        """A current-weather body for ``place``, without the top-level timezone"""
+        temp = round(self.random.uniform(-10, 35), 2)
+        description, icon = self.random.choice(DESCRIPTIONS)
+        return {
+            "coord": {"lat": place["lat"], "lon": place["lon"]},
+            "name": place["name"],
+            "sys": {"country": place["country"]},
+            "weather": [{"description": description, "icon": icon}],
+            "main": {
+                "temp": temp,
+                "feels_like": temp - 1.5,
+                "humidity": self.random.randint(20, 100),
+                "pressure": self.random.randint(980, 1040),
+            },
+            "wind": {"speed": round(self.random.uniform(0, 15), 2)},
+            "clouds": {"all": self.random.randint(0, 100)},
+            "dt": int(time.time()),
+            "padding": self.padding,
+        }
+
+    async def forecast(self, request: Request) -> JSONResponse:
+        self.calls["forecast"] += 1
+        if not await self._delay():
+            return JSONResponse({"cod": "500", "message": "Internal error"}, 500)
+
+        place = self._place(request)
+        start = int(time.time()) // STEP_SECONDS * STEP_SECONDS
+        items: List[Dict[str, Any]] = []
+        for step in range(self.forecast_items):
+            dt = start + step * STEP_SECONDS
+            temp = round(self.random.uniform(-10, 35), 2)
+            description, icon = self.random.choice(DESCRIPTIONS)
+            items.append(
+                {
+                    "dt": dt,
+                    "main": {
+                        "temp": temp,
+                        "feels_like": temp - 1.5,
+                        "humidity": self.random.randint(20, 100),
+                        "pressure": self.random.randint(980, 1040),
+                    },
+                    "weather": [{"description": description, "icon": icon}],
+                    "wind": {"speed": round(self.random.uniform(0, 15), 2)},
+                    "clouds": {"all": self.random.randint(0, 100)},
+                    "dt_txt": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(dt)),
+                }
+            )
+        return JSONResponse(
+            {
+                "city": {
+                    "name": place["name"],
+                    "country": place["country"],
+                    "timezone": 3600,
+                },
+                "list": items,
+                "padding": self.padding,
+            }
+        )
+
+
+def gazetteer(path: str = settings.CITY_INDEX_PATH) -> Dict[int, Tuple[str, str]]:
+    """(name, country) by id for every city in a gazetteer file"""
+    index = CityIndex.load(path)
+    return {
+        city.id: (city.name, city.country)
+        for city in (index.city(row) for row in range(len(index)))
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9001)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--forecast-items", type=int, default=40)
+    parser.add_argument("--padding", type=int, default=0)
+    args = parser.parse_args()
+
+    import uvicorn
+
+    fake = FakeOpenWeatherMap(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        forecast_items=args.forecast_items,
+        padding=args.padding,
+        cities=gazetteer(),
+    )
+    print(f"Point OPENWEATHER_API_URL at http://{args.host}:{args.port}/data/2.5")
+    uvicorn.run(fake.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""
+Benchmark the WeatherPy API against a fake upstream and an in-memory Redis.
+
+Runs the real FastAPI app in-process, with OpenWeatherMap replaced by
+benchmarks.fake_owm and Redis by fakeredis, and reports throughput,
+latency percentiles, upstream calls and memory allocated per request for
+each scenario. Results are saved as JSON so runs can be compared:
+
+    python -m benchmarks.run --requests 2000 --concurrency 50
+    python -m benchmarks.run --compare before.json after.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import platform
+import random
+import subprocess
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import AsyncExitStack, asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Tuple
+from unittest.mock import patch
+
+import httpx
+
+from app.core.config import settings
+
+from .fake_owm import FakeOpenWeatherMap, gazetteer
+
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+FAKE_API_URL = "http://fake-owm/data/2.5"
+# Box around Munich: points near the city snap to it, the rest to grid cells
+COORDINATE_BOX = ((47.9, 48.6), (11.0, 12.2))
+
+
+class Scenario:
+    """A named request mix and whether it starts from an empty cache"""
+
+    def __init__(
+        self,
+        name: str,
+        description: str,
+        paths: Callable[[str, int, int, random.Random], List[str]],
+        cold: bool = True,
+        prefill: bool = False,
+    ):
+        self.name = name
+        self.description = description
+        self.paths = paths
+        self.cold = cold
+        self.prefill = prefill
+
+
+def gazetteer_paths(endpoint: str, n: int, keys: int, rng: random.Random) -> List[str]:
+    """Random picks among the first ``keys`` gazetteer cities"""
+    cities = list(gazetteer().values())[:keys]
+    return [
+        f"/api/{endpoint}?city={name},{country}"
+        for name, country in (rng.choice(cities) for _ in range(n))
+    ]
+
+
+SCENARIOS = {
+    scenario.name: scenario
+    for scenario in (
+        Scenario(
+            "cold",
+            "every request is the first lookup of its city",
+            lambda endpoint, n, keys, rng: [
+                f"/api/{endpoint}?city=Cold City {i}" for i in range(n)
+            ],
+        ),
+        Scenario(
+            "warm",
+            "requests cycle over already cached cities",
+            lambda endpoint, n, keys, rng: [
+                f"/api/{endpoint}?city=Warm City {i % keys}" for i in range(n)
+            ],
+            prefill=True,
+        ),
+        Scenario(
+            "herd",
+            "every request asks for the same uncached city at once",
+            lambda endpoint, n, keys, rng: [f"/api/{endpoint}?city=Herd City"] * n,
+        ),
+        Scenario(
+            "distinct",
+            "random coordinates around one metro area, empty cache",
+            lambda endpoint, n, keys, rng: [
+                f"/api/{endpoint}?lat={rng.uniform(*COORDINATE_BOX[0]):.5f}"
+                f"&lon={rng.uniform(*COORDINATE_BOX[1]):.5f}"
+                for _ in range(n)
+            ],
+        ),
+        Scenario(
+            "gazetteer",
+            "many distinct known cities, empty cache (group calls)",
+            gazetteer_paths,
+        ),
+    )
+}
+
+
+@asynccontextmanager
+async def running_app(fake: FakeOpenWeatherMap) -> AsyncIterator[Any]:
+    """The real app with its upstream and Redis replaced by stand-ins"""
+    from fakeredis import aioredis
+
+    overrides = {
+        "OPENWEATHER_API_URL": FAKE_API_URL,
+        "OPENWEATHER_API_KEY": "benchmark",
+        # fakeredis has no Lua, which the shared rate limiter and lock need
+        "RATE_LIMIT_ENABLED": False,
+        "DISTRIBUTED_LOCK_ENABLED": False,
+        "PREWARM_ENABLED": False,
+    }
+    async with AsyncExitStack() as stack:
+        stack.enter_context(patch.multiple(settings, **overrides))
+        stack.enter_context(
+            patch(
+                "app.services.redis_service.RedisService._create_client",
+                lambda service: aioredis.FakeRedis(),
+            )
+        )
+        from app.main import app, lifespan
+
+        await stack.enter_async_context(lifespan(app))
+        http_client = app.state.http_client
+        await http_client.client.aclose()
+        http_client.client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=fake.app),
+            event_hooks={"request": [http_client._on_request]},
+        )
+        # Keep request logging out of the measurements
+        for name in ("weatherpy", "httpx"):
+            logging.getLogger(name).setLevel(logging.WARNING)
+        yield app
+
+
+async def clear_caches(app: Any) -> None:
+    """Empty both cache tiers"""
+    await app.state.redis.redis_client.flushdb()
+    if app.state.weather.cache.memory is not None:
+        app.state.weather.cache.memory.clear()
+
+
+async def send_all(
+    client: httpx.AsyncClient, paths: List[str], concurrency: int
+) -> Tuple[List[float], Counter, float]:
+    """Send ``paths`` with ``concurrency`` clients; latencies, statuses, wall"""
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    pending = iter(paths)
+
+    async def worker() -> None:
+        for path in pending:
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - started
+
+
+async def allocations_per_request(client: httpx.AsyncClient, paths: List[str]) -> float:
+    """
+    Mean KiB of memory allocated at peak while serving one request.
+
+    Requests are sent one at a time with tracemalloc on, so each peak is
+    attributable to a single request (including the in-process client).
+    """
+    if not paths:
+        return 0.0
+    tracemalloc.start()
+    try:
+        total = 0
+        for path in paths:
+            baseline = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            await client.get(path)
+            total += tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+    return round(total / len(paths) / 1024, 2)
+
+
+def percentile(ordered: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list, in milliseconds"""
+    if not ordered:
+        return 0.0
+    rank = max(math.ceil(fraction * len(ordered)) - 1, 0)
+    return round(ordered[rank] * 1000, 3)
+
+
+async def run_scenario(
+    app: Any,
+    fake: FakeOpenWeatherMap,
+    scenario: Scenario,
+    args: argparse.Namespace,
+) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    paths = scenario.paths(args.endpoint, args.requests, args.keys, rng)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://weatherpy"
+    ) as client:
+        if scenario.cold:
+            await clear_caches(app)
+        if scenario.prefill:
+            await send_all(client, list(dict.fromkeys(paths)), args.concurrency)
+
+        fake.reset()
+        latencies, statuses, wall = await send_all(client, paths, args.concurrency)
+        upstream_calls = sum(fake.calls.values())
+
+        # Measure allocations on a fresh sample of the same request mix
+        sample = scenario.paths(
+            args.endpoint, args.alloc_sample, args.keys, random.Random(args.seed + 1)
+        )
+        if scenario.cold:
+            await clear_caches(app)
+        if scenario.prefill:
+            await send_all(client, list(dict.fromkeys(sample)), args.concurrency)
+        alloc_kib = await allocations_per_request(client, sample)
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        "description": scenario.description,
+        "requests": len(paths),
+        "concurrency": args.concurrency,
+        "rps": round(len(paths) / wall, 1),
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": percentile(latencies, 1.0),
+        "errors": errors,
+        "upstream_calls": upstream_calls,
+        "alloc_kib_per_request": alloc_kib,
+    }
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    fake = FakeOpenWeatherMap(
+        latency=args.upstream_latency,
+        jitter=args.upstream_jitter,
+        error_rate=args.upstream_error_rate,
+        forecast_items=args.forecast_items,
+        padding=args.padding,
+        seed=args.seed,
+        cities=gazetteer(),
+    )
+    results: Dict[str, Any] = {}
+    async with running_app(fake) as app:
+        for name in args.scenarios:
+            results[name] = await run_scenario(app, fake, SCENARIOS[name], args)
+            print(format_result(name, results[name]))
+    return {"meta": metadata(args), "scenarios": results}
+
+
+def metadata(args: argparse.Namespace) -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": commit,
+        "python": platform.python_version(),
+        "args": {k: v for k, v in vars(args).items() if k != "compare"},
+    }
+
+
+def format_result(name: str, result: Dict[str, Any]) -> str:
+    return (
+        f"{name:<9} {result['rps']:>9.1f} rps  "
+        f"p50 {result['p50_ms']:>8.2f} ms  p95 {result['p95_ms']:>8.2f} ms  "
+        f"p99 {result['p99_ms']:>8.2f} ms  upstream {result['upstream_calls']:>6}  "
+        f"errors {result['errors']:>5}  "
+        f"alloc {result['alloc_kib_per_request']:>7.1f} KiB"
+    )
+
+
+COMPARED = (
+    "rps",
+    "p50_ms",
+    "p95_ms",
+    "p99_ms",
+    "upstream_calls",
+    "alloc_kib_per_request",
+)
+
+
+def compare(before_path: str, after_path: str) -> str:
+    """Side-by-side table of two saved runs"""
+    before = json.loads(Path(before_path).read_text())["scenarios"]
+    after = json.loads(Path(after_path).read_text())["scenarios"]
+    lines = [
+        f"{'scenario':<9} {'metric':<22} {'before':>10} {'after':>10} {'change':>8}"
+    ]
+    for name in before.keys() & after.keys():
+        for metric in COMPARED:
+            old, new = before[name][metric], after[name][metric]
+            change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+            lines.append(f"{name:<9} {metric:<22} {old:>10} {new:>10} {change:>8}")
+    return "\n".join(lines)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--scenarios",
+        type=lambda value: value.split(","),
+        default=list(SCENARIOS),
+        help=f"comma-separated, from {', '.join(SCENARIOS)}",
+    )
+    parser.add_argument(
+        "--endpoint", choices=["weather", "forecast"], default="weather"
+    )
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument(
+        "--keys", type=int, default=100, help="cities in 'warm' and 'gazetteer'"
+    )
+    parser.add_argument("--alloc-sample", type=int, default=100)
+    parser.add_argument("--upstream-latency", type=float, default=0.05)
+    parser.add_argument("--upstream-jitter", type=float, default=0.02)
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--forecast-items", type=int, default=40)
+    parser.add_argument("--padding", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="results file (default: results/<time>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"))
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    return args
+
+
+def main() -> None:
+    args = parse_args()
+    if args.compare:
+        print(compare(*args.compare))
+        return
+
+    report = asyncio.run(run(args))
+    output = (
+        Path(args.output)
+        if args.output
+        else (RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}.json")
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Saved results to {output}")
+
+
+if __name__ == "__main__":
+    main()